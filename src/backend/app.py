@@ -1,20 +1,59 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 import os
+import json
+import time
+import logging
 import yt_dlp
-import requests
 import re
 from utils.transcriptUtils import transcriptUtils
+from utils.metadataCache import metadataCache
+from utils.corpusIndex import corpusIndex
 from utils.videoUtils import videoUtils
+from utils.transcriptCache import transcriptCache, SOURCE_YOUTUBE, SOURCE_WHISPER
+from utils.semanticIndex import EMBEDDING_MODEL
+from utils.modelUtils import lazyModel, registry, warm_up, timed, memory_status
+from utils.jobUtils import jobManager
+from utils.concurrencyUtils import workspace, singleFlight
+from utils.metricsUtils import DOWNLOAD_SECONDS, REQUEST_SECONDS, observe, render
+from utils.logUtils import configure_logging
+from utils.httpCache import httpCache
+from utils.modelServer import MODEL_SERVER, modelClient, remoteEngine
 from flask_cors import CORS
-import whisper
-import shutil
 import torch
 
+logger = logging.getLogger("vidify")
+
 COOKIES_FILE = "cookies.txt"
 
-print("Loading Whisper model")
-WHISPER_MODEL = whisper.load_model("tiny")
-WHISPER_MODEL.to("cuda" if torch.cuda.is_available() else "cpu")
+# Decode videos straight from YouTube while they download, instead of saving them first
+STREAM_VIDEO = os.environ.get("STREAM_VIDEO", "0") == "1"
+
+# Seconds an ETag of a result computed from the video alone (table of contents, adaptive search) stays valid
+VIDEO_ETAG_TTL = int(os.environ.get("VIDEO_ETAG_TTL", 24 * 3600))
+
+# Models to load in the background at startup (comma-separated names, or "all").
+# Every other model is loaded when a request first needs it.
+MODEL_WARMUP = [name.strip() for name in os.environ.get("MODEL_WARMUP", "").split(",") if name.strip()]
+
+
+def load_whisper():
+    import whisper
+
+    logger.info("Loading Whisper model")
+    model = whisper.load_model("tiny")
+    return model.to("cuda" if torch.cuda.is_available() else "cpu")
+
+
+WHISPER_MODEL = lazyModel("whisper", load_whisper)
+
+# How /object_search finds objects: in the video's visual index, or with a coarse-to-fine scan
+SEARCH_MODES = ("index", "adaptive")
+
+# How /transcript_search matches captions: by the query's words, or by its meaning
+TRANSCRIPT_SEARCH_MODES = ("keyword", "semantic")
+
+# Most hits /corpus_search returns
+CORPUS_MAX_RESULTS = 100
 
 # Regular expression for validating YouTube URLs
 YOUTUBE_URL_PATTERN = (
@@ -22,6 +61,23 @@ YOUTUBE_URL_PATTERN = (
 )
 
 
+def stream_source(info):
+    """
+    Picks the media stream of a video from the information yt-dlp resolved for it.
+
+    Args:
+        info (dict): The result of extract_info for a single video
+
+    Returns:
+        Optional[dict]: The {"url", "headers"} of the video stream, or None if there is none.
+    """
+    # Formats that yt-dlp would merge list their parts separately
+    for fmt in [info] + info.get("requested_formats", []):
+        if fmt.get("url") and fmt.get("vcodec") != "none":
+            return {"url": fmt["url"], "headers": fmt.get("http_headers") or {}}
+    return None
+
+
 def is_valid_youtube_url(url):
     """
     Validates if the provided URL is a valid YouTube video URL.
@@ -37,19 +93,189 @@ def is_valid_youtube_url(url):
     return bool(re.match(YOUTUBE_URL_PATTERN, url))
 
 
+def get_video_id(url):
+    """
+    Extracts the 11-character video ID from a YouTube video URL.
+
+    Args:
+        url (str): The YouTube video URL
+
+    Returns:
+        Optional[str]: The video ID if the URL contains one, None otherwise
+    """
+    if not url:
+        return None
+    match = re.search(r"(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})", url)
+    return match.group(1) if match else None
+
+
+def parse_keywords(values):
+    """
+    Collects search keywords given as repeated parameters or separated by commas.
+
+    Args:
+        values ([str]): The raw keyword parameter values
+
+    Returns:
+        [str]: The keywords
+    """
+    return [k.strip() for value in values if value for k in value.split(",") if k.strip()]
+
+
+def format_toc(results):
+    """
+    Formats a table of contents for a response.
+
+    Args:
+        results ({str: [float]}): Timestamps of each found object
+
+    Returns:
+        [dict]: An {"object", "timestamps"} entry for each object
+    """
+    return [{"object": obj, "timestamps": time} for obj, time in results.items()]
+
+
+def format_event(event, fmt):
+    """
+    Serializes a streaming event.
+
+    Args:
+        event (dict): The event, with a "type" key
+        fmt (str): "ndjson" for one JSON object per line, or "sse" for server-sent events
+
+    Returns:
+        str: The serialized event
+    """
+    data = json.dumps(event)
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def stream_response(events, fmt):
+    """
+    Creates a streaming response that sends events as they are produced.
+
+    Args:
+        events (Iterator[dict]): The events
+        fmt (str): "ndjson" or "sse"
+
+    Returns:
+        flask.Response: The streaming response
+    """
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(
+        stream_with_context(format_event(event, fmt) for event in events),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def log_response(endpoint, response, status):
+    """
+    Logs the outcome of a request. The full response is only logged at debug level,
+    large tables of contents are expensive to serialize.
+
+    Args:
+        endpoint (str): The endpoint
+        response (dict): The response
+        status (int): The status code
+
+    Returns: None
+    """
+    results = response.get("results")
+    logger.info(
+        response.get("message"),
+        extra={"endpoint": endpoint, "status": status, "results": len(results) if results is not None else None},
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Response", extra={"endpoint": endpoint, "response": response})
+
+
 def create_app():
+    configure_logging()
     app = Flask(__name__)
     CORS(app)
 
-    app.whisper_model = WHISPER_MODEL
-    app.transcript_utils = transcriptUtils()
-    app.video_utils = videoUtils()
+    app.startup_timings = {}
+    with timed(app.startup_timings, "create_app"):
+        app.whisper_model = WHISPER_MODEL
+        # With a model server on the node, this worker loads no models of its own
+        app.model_server = modelClient(MODEL_SERVER) if MODEL_SERVER else None
+        with timed(app.startup_timings, "transcript_utils"):
+            app.metadata_cache = metadataCache(cookiefile=COOKIES_FILE)
+            app.transcript_cache = transcriptCache()
+            app.transcript_utils = transcriptUtils(
+                remoteEngine(app.model_server) if app.model_server else None,
+                metadata=app.metadata_cache,
+                cache_dir=app.transcript_cache.cache_dir,
+            )
+            app.corpus = corpusIndex()
+        with timed(app.startup_timings, "video_utils"):
+            app.video_utils = videoUtils()
+        app.jobs = jobManager()
+        app.http_cache = httpCache()
+        app.flights = singleFlight()
+
+    app.warmup = list(registry) if "all" in MODEL_WARMUP else MODEL_WARMUP
+    if app.model_server:
+        app.warmup = []
+    if app.warmup:
+        warm_up(app.warmup)
+
+    @app.before_request
+    def start_timer():
+        g.start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        # Labelled with the route pattern, so every video shares one series
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.labels(endpoint=endpoint, method=request.method, status=response.status_code).observe(
+            time.perf_counter() - g.start
+        )
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        data, content_type = render()
+        return Response(data, mimetype=content_type)
 
     @app.route("/", methods=["GET"])
     def home():
         Flask.redirect("/toc")
 
+    """Versions of the artifacts a result is computed from, so its ETag is known before the view runs.
+    A video's frames never change, so results computed from the video alone only depend on the request.
+
+    Args: None
+
+    Returns:
+        Optional[str]: The version, or None if the request is invalid or the artifacts don't exist yet.
+    """
+
+    def video_version():
+        if not is_valid_youtube_url(request.args.get("yt_url")):
+            return None
+        # The models and sampling settings, and a period after which the video is assumed to have changed
+        return f"{app.video_utils.version()}:{int(time.time() // VIDEO_ETAG_TTL)}"
+
+    def index_version():
+        if request.args.get("mode", "index") != "index" or not video_version():
+            return video_version()
+        created = app.video_utils.frame_index.created(get_video_id(request.args.get("yt_url")))
+        return None if created is None else f"{app.video_utils.version()}:index:{created}"
+
+    def transcript_version():
+        if not video_version():
+            return None
+        created = app.transcript_cache.created(get_video_id(request.args.get("yt_url")))
+        if created is None:
+            return None
+        return f"{created}:{EMBEDDING_MODEL}" if request.args.get("mode") == "semantic" else str(created)
+
     @app.route("/toc", methods=["GET"])
+    @app.http_cache.cached(version=video_version)
     def toc():
         try:
             yt_url = request.args.get("yt_url")
@@ -64,37 +290,21 @@ def create_app():
                 ), 400
 
             # TODO: authentication
-            filename = get_video(yt_url)
-
-            if not filename:
-                result = {"message": "Not able to download the video.", "results": None}
-
-                return jsonify(result), 404
-            else:
-                results = app.video_utils.find_objects(filename)
-                formatted_results = [
-                    {"object": obj, "timestamps": time} for obj, time in results.items()
-                ]
-                response = {
-                    "message": "Table of contents created successfully.",
-                    "results": formatted_results,
-                }
-                print(response)
+            response, status = run_toc(yt_url)
+            log_response("/toc", response, status)
 
-                os.remove(filename)
-                if os.path.exists(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}"):
-                    shutil.rmtree(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}")
-
-                return jsonify(response), 200
+            return jsonify(response), status
         except Exception as e:
-            print("An exception occured.")
+            logger.exception("Request failed", extra={"path": request.path})
             return jsonify({"message": "Internal server error", "error": str(e)}), 500
 
     @app.route("/object_search", methods=["GET"])
+    @app.http_cache.cached(version=index_version)
     def object_search():
         try:
             yt_url = request.args.get("yt_url")
-            keyword = request.args.get("keyword")
+            keywords = parse_keywords(request.args.getlist("keyword"))
+            mode = request.args.get("mode", "index")
 
             # Validate the YouTube URL
             if not is_valid_youtube_url(yt_url):
@@ -104,52 +314,128 @@ def create_app():
                         "results": None,
                     }
                 ), 400
-            elif not keyword:
+            elif not keywords:
                 return jsonify(
                     {
                         "message": "Invalid search term. Please provide a keyword.",
                         "results": None,
                     }
                 ), 400
+            elif mode not in SEARCH_MODES:
+                return jsonify(
+                    {
+                        "message": "Invalid mode. Please provide either index or adaptive.",
+                        "results": None,
+                    }
+                ), 400
 
             # TODO: authentication
-            filename = get_video(yt_url)
+            response, status = run_object_search(yt_url, keywords, mode=mode)
+            log_response("/object_search", response, status)
 
-            if not filename:
-                result = {"message": "Not able to download the video.", "results": None}
-
-                return jsonify(result), 404
-            else:
-                results = app.video_utils.search_video(filename, keyword)
+            return jsonify(response), status
+        except Exception as e:
+            logger.exception("Request failed", extra={"path": request.path})
+            return jsonify({"message": "Internal server error", "error": str(e)}), 500
 
-                if not results:
-                    result = {"message": "Object not found.", "results": None}
+    @app.route("/toc/stream", methods=["GET"])
+    @app.route("/object_search/stream", methods=["GET"])
+    def stream_search():
+        yt_url = request.args.get("yt_url")
+        keywords = parse_keywords(request.args.getlist("keyword"))
+        fmt = request.args.get("format", "ndjson")
+        max_matches = request.args.get("max_matches")
+        is_toc = request.path.startswith("/toc")
+
+        # Validate the YouTube URL
+        if not is_valid_youtube_url(yt_url):
+            return jsonify(
+                {
+                    "message": "Invalid YouTube URL. Please provide a valid YouTube video URL.",
+                    "results": None,
+                }
+            ), 400
+        elif not is_toc and not keywords:
+            return jsonify(
+                {
+                    "message": "Invalid search term. Please provide a keyword.",
+                    "results": None,
+                }
+            ), 400
+        elif fmt not in ("ndjson", "sse") or (max_matches and not max_matches.isdigit()):
+            return jsonify(
+                {
+                    "message": "Invalid format or max_matches. Please provide ndjson or sse and a number.",
+                    "results": None,
+                }
+            ), 400
+
+        if is_toc:
+            events = stream_scan(yt_url, app.video_utils.iter_objects, int(max_matches or 0))
+        else:
+            events = stream_object_search(yt_url, keywords, int(max_matches or 0))
+
+        return stream_response(events, fmt)
+
+    @app.route("/jobs", methods=["POST"])
+    def submit_job():
+        params = request.get_json(silent=True) or request.form
+        yt_url = params.get("yt_url")
+        task = params.get("task")
+        keyword = params.get("keyword") or []
+        keywords = parse_keywords(keyword if isinstance(keyword, list) else [keyword])
+        mode = params.get("mode", "index")
+
+        # Validate the YouTube URL
+        if not is_valid_youtube_url(yt_url):
+            return jsonify(
+                {
+                    "message": "Invalid YouTube URL. Please provide a valid YouTube video URL.",
+                    "job_id": None,
+                }
+            ), 400
 
-                    os.remove(filename)
-                    if os.path.exists(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}"):
-                        shutil.rmtree(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}")
+        if task == "toc":
+            job_id = app.jobs.submit(task, lambda progress: run_toc(yt_url, progress))
+        elif task == "object_search":
+            if not keywords:
+                return jsonify(
+                    {
+                        "message": "Invalid search term. Please provide a keyword.",
+                        "job_id": None,
+                    }
+                ), 400
+            elif mode not in SEARCH_MODES:
+                return jsonify(
+                    {
+                        "message": "Invalid mode. Please provide either index or adaptive.",
+                        "job_id": None,
+                    }
+                ), 400
+            job_id = app.jobs.submit(task, lambda progress: run_object_search(yt_url, keywords, progress, mode))
+        else:
+            return jsonify(
+                {
+                    "message": "Invalid task. Please provide either toc or object_search.",
+                    "job_id": None,
+                }
+            ), 400
 
-                    return jsonify(result), 404
+        if not job_id:
+            return jsonify({"message": "Too many jobs. Please try again later.", "job_id": None}), 503
 
-                formatted_results = [
-                    {"object": keyword, "timestamps": time} for time in results
-                ]
-                response = {
-                    "message": "Object found successfully.",
-                    "results": formatted_results,
-                }
-                print(response)
+        return jsonify({"message": "Job submitted successfully.", "job_id": job_id}), 202
 
-                os.remove(filename)
-                if os.path.exists(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}"):
-                    shutil.rmtree(f"temp/frames/{os.path.splitext(os.path.basename(filename))[0]}")
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id):
+        job = app.jobs.get(job_id)
+        if not job:
+            return jsonify({"message": "Job not found.", "job_id": job_id}), 404
 
-                return jsonify(response), 200
-        except Exception as e:
-            print("An exception occured.")
-            return jsonify({"message": "Internal server error", "error": str(e)}), 500
+        return jsonify(job), 200
 
     @app.route("/transcript_search", methods=["GET"])
+    @app.http_cache.cached(version=transcript_version)
     def transcript_search():
         try:
             yt_url = request.args.get("yt_url")
@@ -164,157 +450,552 @@ def create_app():
                 ), 400
 
             keyword = request.args.get("keyword")
-            transcript = get_transcript(yt_url)
-
-            if not transcript:
-                file = app.transcript_utils.create_transcript(yt_url, transcript, app.whisper_model)
-                if not file:
-                    result = {
-                        "message": "Not able to fetch transcript.",
+            mode = request.args.get("mode", "keyword")
+            if mode not in TRANSCRIPT_SEARCH_MODES:
+                return jsonify(
+                    {
+                        "message": "Invalid mode. Please provide either keyword or semantic.",
                         "results": None,
                     }
-                    print(result)
+                ), 400
+            video_id = get_video_id(yt_url)
 
-                    return jsonify(result), 404
-                else:
-                    file = os.path.basename(file)
-                    results = app.transcript_utils.search_transcript(file, keyword)
-                    formatted_results = [
-                        {"timestamp": r[0], "text": r[1]} for r in results
-                    ]
-                    response = {
-                        "message": "Transcript downloaded successfully.",
-                        "results": formatted_results,
-                    }
-                    print(response)
+            for _ in range(2):
+                # Repeat searches are served from the cache without touching the network or Whisper,
+                # concurrent first searches for the same video share one download
+                cached = app.transcript_cache.get(video_id) or app.flights.do(
+                    ("transcript", video_id), lambda: fetch_transcript(yt_url, video_id)
+                )
 
-                    os.remove("temp/subtitles/" + file)
+                if not cached:
+                    break
 
-                    return jsonify(response), 200
-            else:
-                results = app.transcript_utils.search_transcript(transcript, keyword)
-                formatted_results = [{"timestamp": r[0], "text": r[1]} for r in results]
-                response = {
-                    "message": "Transcript downloaded successfully.",
-                    "results": formatted_results,
+                if mode == "semantic":
+                    results = app.transcript_utils.semantic_search(cached["file"], keyword)
+                else:
+                    results = app.transcript_utils.search_transcript(cached["file"], keyword)
+                if results is not None:
+                    break
+                # Another worker evicted the transcript after it was looked up. Its entry is dropped by
+                # the next lookup, which finds the file missing, and the transcript is fetched again.
+                logger.warning("Transcript was evicted during a search", extra={"video_id": video_id})
+
+            if not cached or results is None:
+                result = {
+                    "message": "Not able to fetch transcript.",
+                    "results": None,
                 }
-                print(response)
+                log_response("/transcript_search", result, 404)
 
-                os.remove("temp/subtitles/" + transcript)
+                return jsonify(result), 404
 
-                return jsonify(response), 200
+            if mode == "semantic":
+                formatted_results = [{"timestamp": r[0], "text": r[1], "score": r[2]} for r in results]
+            else:
+                formatted_results = [{"timestamp": r[0], "text": r[1]} for r in results]
+            response = {
+                "message": "Transcript downloaded successfully.",
+                "source": cached["source"],
+                "results": formatted_results,
+            }
+            log_response("/transcript_search", response, 200)
+
+            return jsonify(response), 200
         except yt_dlp.utils.DownloadError as e:
-            print("An exception occured.")
-            print(e)
+            logger.warning("Transcript download failed", extra={"error": str(e)})
             return jsonify(
                 {"message": "Not able to fetch transcript.", "error": str(e)}
             ), 404
         except Exception as e:
-            print("An exception occured.")
-            print(e)
+            logger.exception("Request failed", extra={"path": request.path})
             return jsonify({"message": "Internal  error", "error": str(e)}), 500
 
+    @app.route("/corpus_search", methods=["GET"])
+    def corpus_search():
+        query = request.args.get("q") or request.args.get("keyword")
+        video_ids = request.args.getlist("video_id")
+
+        try:
+            k = int(request.args.get("k", 20))
+        except ValueError:
+            k = 0
+        if not query or not 0 < k <= CORPUS_MAX_RESULTS:
+            return jsonify(
+                {
+                    "message": f"Invalid search. Please provide a query q and a k between 1 and {CORPUS_MAX_RESULTS}.",
+                    "results": None,
+                }
+            ), 400
+
+        start = time.perf_counter()
+        results = app.corpus.search(query, k, video_ids)
+        response = {
+            "message": "Corpus searched successfully.",
+            "results": results,
+            "milliseconds": round((time.perf_counter() - start) * 1000, 2),
+        }
+        log_response("/corpus_search", response, 200)
+        return jsonify(response), 200
+
+    @app.route("/corpus", methods=["POST"])
+    def add_corpus():
+        params = request.get_json(silent=True) or {}
+        yt_urls = params.get("yt_urls") or request.form.getlist("yt_url")
+
+        if not yt_urls or not all(is_valid_youtube_url(yt_url) for yt_url in yt_urls):
+            return jsonify(
+                {
+                    "message": "Invalid YouTube URL. Please provide a list of valid YouTube video URLs.",
+                    "job_id": None,
+                }
+            ), 400
+
+        job_id = app.jobs.submit("corpus", lambda progress: build_corpus(yt_urls, progress))
+        if not job_id:
+            return jsonify({"message": "Too many jobs. Please try again later.", "job_id": None}), 503
+
+        return jsonify({"message": "Job submitted successfully.", "job_id": job_id}), 202
+
+    @app.route("/corpus/<video_id>", methods=["DELETE"])
+    def remove_corpus(video_id):
+        if not app.corpus.remove(video_id):
+            return jsonify({"message": "Video not in corpus.", "video_id": video_id}), 404
+
+        return jsonify({"message": "Video removed from corpus.", "video_id": video_id}), 200
+
     @app.route("/health", methods=["GET"])
     def health_check():
         return jsonify({"status": "OK"}), 200
 
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        # Totals since startup
+        return jsonify(
+            {
+                "frames": app.video_utils.get_counters(),
+                "metadata": app.metadata_cache.status(),
+                "corpus": app.corpus.status(),
+            }
+        ), 200
+
+    @app.route("/ready", methods=["GET"])
+    def readiness_check():
+        if app.model_server:
+            # The models live in the node's model server
+            try:
+                models = app.model_server.call("status")
+            except ConnectionError as e:
+                return jsonify({"status": "Model server unavailable", "error": str(e)}), 503
+            return jsonify({"status": "OK", "model_server": MODEL_SERVER, "models": models}), 200
+
+        # Ready once every model requested for warm-up is loaded, other models load on demand
+        warming = [name for name in app.warmup if name in registry and not registry[name].loaded]
+        return jsonify(
+            {
+                "status": "Warming up" if warming else "OK",
+                "models": {name: model.status() for name, model in registry.items()},
+                "memory": memory_status(),
+                "startup": app.startup_timings,
+            }
+        ), 503 if warming else 200
+
+    """Creates the table of contents of a video.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        progress (Callable, optional): Called as progress(frames_done, frames_total, partial_results).
+
+    Returns:
+        (dict, int): The response and its status code.
+    """
+
+    def run_toc(yt_url, progress=None):
+        # Concurrent requests for the same video share one download and one scan
+        return app.flights.do(("toc", get_video_id(yt_url)), lambda: create_toc(yt_url, progress))
+
+    def create_toc(yt_url, progress):
+        with workspace() as workdir:
+            video = get_video(yt_url, workdir)
+
+            if not video:
+                return {"message": "Not able to download the video.", "results": None}, 404
+
+            results = app.video_utils.find_objects(video, progress)
+
+        return {
+            "message": "Table of contents created successfully.",
+            "results": format_toc(results),
+        }, 200
+
+    """Searches a video for objects.
+    The video is only downloaded and scanned the first time it is searched,
+    later keywords are answered from its visual index.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        keywords ([str]): The objects to look for.
+        progress (Callable, optional): Called as progress(frames_done, frames_total, partial_results).
+        mode (str): "index" to search the video's visual index, "adaptive" for a coarse-to-fine scan.
+
+    Returns:
+        (dict, int): The response and its status code.
+    """
+
+    def run_object_search(yt_url, keywords, progress=None, mode="index"):
+        if mode == "adaptive":
+            return run_adaptive_search(yt_url, keywords, progress)
+
+        video_id = get_video_id(yt_url)
+
+        for attempt in range(2):
+            # Concurrent searches of a new video share one download and one indexing run
+            if not app.video_utils.frame_index.has(video_id):
+                indexed = app.flights.do(("index", video_id), lambda: index_video(yt_url, video_id, progress))
+
+                if not indexed:
+                    return {"message": "Not able to download the video.", "results": None}, 404
+
+            try:
+                results = app.video_utils.search_index(video_id, keywords)
+                break
+            except FileNotFoundError:
+                # Another worker evicted the index after the check, it is built again
+                if attempt:
+                    raise
+                logger.warning("Frame index was evicted during a search", extra={"video_id": video_id})
+
+        if not any(results.values()):
+            return {"message": "Object not found.", "results": None}, 404
+
+        formatted_results = [
+            {"object": keyword, "timestamps": time}
+            for keyword, times in results.items()
+            for time in times
+        ]
+        return {
+            "message": "Object found successfully.",
+            "results": formatted_results,
+        }, 200
+
+    """Searches a video for objects with a coarse-to-fine scan.
+    Returns the intervals in which each object is visible instead of single timestamps.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        keywords ([str]): The objects to look for.
+        progress (Callable, optional): Called as progress(frames_done, frames_total, None).
+
+    Returns:
+        (dict, int): The response and its status code.
+    """
+
+    def run_adaptive_search(yt_url, keywords, progress=None):
+        stats = {}
+        with workspace() as workdir:
+            video = get_video(yt_url, workdir)
+
+            if not video:
+                return {"message": "Not able to download the video.", "results": None}, 404
+
+            results = app.video_utils.adaptive_search_video(video, keywords, progress, stats)
+
+        if not any(results.values()):
+            return {"message": "Object not found.", "results": None, "frames_scored": stats["frames_scored"]}, 404
+
+        formatted_results = [
+            {"object": keyword, "start": start, "end": end}
+            for keyword, intervals in results.items()
+            for start, end in intervals
+        ]
+        return {
+            "message": "Object found successfully.",
+            "results": formatted_results,
+            "frames_scored": stats["frames_scored"],
+        }, 200
+
+    """Downloads a video and builds its visual index.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        video_id (str): The YouTube video ID.
+        progress (Callable, optional): Called as progress(frames_done, frames_total, None).
+
+    Returns:
+        bool: True if the video is indexed, False if it could not be downloaded.
+    """
+
+    def index_video(yt_url, video_id, progress=None):
+        if app.video_utils.frame_index.has(video_id):
+            return True
+
+        with workspace() as workdir:
+            video = get_video(yt_url, workdir)
+
+            if not video:
+                return False
+
+            app.video_utils.index_video(video, video_id, progress)
+        return True
+
+    """Streams the events of a frame scan while it runs.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        scan (Callable[[str], Iterator[dict]]): Scans a downloaded video and yields match and progress events.
+        max_matches (int): Stop scanning after this many matches, 0 to scan the whole video.
+
+    Returns:
+        Iterator[dict]: Status, match, progress, error and done events.
+            The done event reports the frames the sampling strategy decoded and selected.
+    """
+
+    def stream_scan(yt_url, scan, max_matches=0):
+        with workspace() as workdir:
+            yield {"type": "status", "message": "Downloading video."}
+            video = get_video(yt_url, workdir)
+
+            if not video:
+                yield {"type": "error", "message": "Not able to download the video."}
+                return
+
+            events = scan(video)
+            matches = 0
+            frames_done = 0
+            stats = {}
+            try:
+                for event in events:
+                    if event["type"] == "stats":
+                        # Reported with the done event
+                        stats = {k: v for k, v in event.items() if k != "type"}
+                        continue
+                    yield event
+                    if event["type"] == "progress":
+                        frames_done = event["frames_done"]
+                    elif event["type"] == "match":
+                        matches += 1
+                        if matches == max_matches:
+                            break
+            except Exception as e:
+                logger.exception("Scan failed")
+                yield {"type": "error", "message": "Internal server error", "error": str(e)}
+                return
+            finally:
+                # Stops the frame extraction if the scan ended early or the client went away
+                events.close()
+
+        yield {"type": "done", "matches": matches, "frames_done": frames_done, "sampling": stats}
+
+    """Streams the matches of an object search.
+    Indexed videos are answered from the index, others are scanned frame by frame.
+
+    Args:
+        yt_url (str): The YouTube video URL.
+        keywords ([str]): The objects to look for.
+        max_matches (int): Stop after this many matches, 0 for all.
+
+    Returns:
+        Iterator[dict]: Status, match, progress, error and done events. The done event has the
+            shape of stream_scan's, with frames_done and sampling None when answered from the index.
+    """
+
+    def stream_object_search(yt_url, keywords, max_matches=0):
+        video_id = get_video_id(yt_url)
+
+        results = None
+        if app.video_utils.frame_index.has(video_id):
+            try:
+                results = app.video_utils.search_index(video_id, keywords)
+            except FileNotFoundError:
+                # Another worker evicted the index after the check, the video is scanned instead
+                logger.warning("Frame index was evicted during a search", extra={"video_id": video_id})
+
+        if results is None:
+            yield from stream_scan(
+                yt_url, lambda video: app.video_utils.iter_search_video(video, keywords), max_matches
+            )
+            return
+        matches = sorted((timestamp, keyword) for keyword, times in results.items() for timestamp in times)
+        if max_matches:
+            matches = matches[:max_matches]
+
+        for timestamp, keyword in matches:
+            yield {"type": "match", "object": keyword, "timestamp": timestamp}
+        yield {"type": "done", "matches": len(matches), "frames_done": None, "sampling": None}
+
     """Downloads the raw YouTube video.
+    With STREAM_VIDEO set, nothing is downloaded: the video's stream is returned
+    and ffmpeg decodes it while it arrives.
 
     Args:
         url (str): The YouTube video URL.
+        output_dir (str): The request's workspace the video is saved to.
 
     Returns:
-        Optional[str]: The file name in which the video is stored if available, else None.
+        Optional[str | dict]: The file name in which the video is stored, or its stream, if available, else None.
     """
 
-    def get_video(url):
-        output_dir = "temp/video"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = "temp/video/%(title)s.%(ext)s"
+    def get_video(url, output_dir):
+        if STREAM_VIDEO:
+            return get_video_stream(url)
+
+        output_path = f"{output_dir}/video.%(ext)s"
         ydl_opts = {
             "outtmpl": output_path,
             "format": "worst",
-            "cookiefile": COOKIES_FILE,
         }
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                info = ydl.sanitize_info(info)
+            with observe(DOWNLOAD_SECONDS, kind="video"):
+                info = app.metadata_cache.process(url, ydl_opts, download=True)
 
-                filename = ydl.prepare_filename(info)
+            downloads = info.get("requested_downloads") or [{}]
+            filename = downloads[0].get("filepath") or info.get("_filename")
 
-                new_filename = filename.replace(" ", "_")
-                if os.path.exists(filename) and new_filename != filename:
-                    os.rename(filename, new_filename)
-                    filename = new_filename
-
-            if os.path.exists(filename):
-                print("Download successful")
+            if filename and os.path.exists(filename):
+                logger.info("Download successful", extra={"url": url})
                 return filename
             else:
-                print("Download failed")
+                logger.warning("Download failed", extra={"url": url})
                 return None
         except Exception as e:
-            print(f"Download failed. Exception: {e}")
+            logger.warning("Download failed", extra={"url": url, "error": str(e)})
             return None
 
-    """Fetches the transcript for a YouTube video.
+    """Resolves the stream of a YouTube video without downloading it.
 
     Args:
         url (str): The YouTube video URL.
-        lang (str, optional): The language code for the transcript. Defaults to "en".
 
     Returns:
-        Optional[str]: The transcript text if available, else None.
+        Optional[dict]: The {"url", "headers"} of the video stream if available, else None.
     """
 
-    def get_transcript(url, lang="en"):
-        os.makedirs("temp/subtitles", exist_ok=True)
-
+    def get_video_stream(url):
         ydl_opts = {
-            "writesubtitles": True,
-            "writeautomaticsub": True,
-            "subtitleslangs": [lang],
-            "skip_download": True,
-            "cookiefile": COOKIES_FILE,
+            "format": "worst[vcodec!=none]/worst",
         }
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(url, download=False)
-                subtitles = info_dict.get("subtitles") or info_dict.get(
-                    "automatic_captions"
-                )
+            with observe(DOWNLOAD_SECONDS, kind="stream"):
+                info = app.metadata_cache.process(url, ydl_opts, download=False)
+
+            source = stream_source(info)
+            if source:
+                logger.info("Stream resolved", extra={"url": url})
+            else:
+                logger.warning("No video stream found", extra={"url": url})
+            return source
+        except Exception as e:
+            logger.warning("Stream resolution failed", extra={"url": url, "error": str(e)})
+            return None
+
+    """Fetches a video's transcript from YouTube, or creates it with Whisper, and caches it.
+
+    Args:
+        url (str): The YouTube video URL.
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        Optional[dict]: The cache entry of the transcript, None if no transcript could be made.
+    """
+
+    def fetch_transcript(url, video_id):
+        cached = app.transcript_cache.get(video_id)
+        if cached:
+            return cached
+
+        transcript = get_transcript(url, video_id)
+        if transcript:
+            return add_to_corpus(url, video_id, app.transcript_cache.put(video_id, transcript, SOURCE_YOUTUBE))
+
+        # Named per process, so workers creating the same transcript don't write to one file. The
+        # in-process model is only loaded if the audio is transcribed in this process.
+        file = app.transcript_utils.create_transcript(
+            url, f"{video_id}.{os.getpid()}.whisper", None if app.model_server else app.whisper_model
+        )
+        if file:
+            return add_to_corpus(url, video_id, app.transcript_cache.put(video_id, file, SOURCE_WHISPER))
+        return None
+
+    """Adds a freshly fetched transcript to the corpus, so it can be found by /corpus_search.
+
+    Args:
+        url (str): The YouTube video URL.
+        video_id (str): The YouTube video ID.
+        cached (dict): The cache entry of the transcript.
+
+    Returns:
+        dict: The cache entry.
+    """
+
+    def add_to_corpus(url, video_id, cached):
+        try:
+            # Resolved already while fetching the transcript
+            title = app.metadata_cache.get(url).get("title")
+            app.corpus.add_vtt(video_id, os.path.join(app.transcript_cache.cache_dir, cached["file"]), title)
+        except Exception as e:
+            logger.warning("Could not add transcript to corpus", extra={"video": video_id, "error": str(e)})
+        return cached
+
+    """Fetches the transcripts of several videos and adds them to the corpus.
 
-                video_title = info_dict.get("title", "unknown_video")
-                transcript_url = None
+    Args:
+        yt_urls ([str]): The YouTube video URLs.
+        progress (Callable, optional): Called as progress(videos_done, videos_total, partial_results).
+
+    Returns:
+        (dict, int): The response and its status code.
+    """
 
-                for lang, subs in subtitles.items():
-                    if lang.startswith("en"):
-                        for sub in subs:
-                            if sub["ext"] == "vtt":
-                                transcript_url = sub["url"]
-                                break
+    def build_corpus(yt_urls, progress=None):
+        added, failed = [], []
+        for i, yt_url in enumerate(yt_urls):
+            video_id = get_video_id(yt_url)
+            cached = app.flights.do(("transcript", video_id), lambda: fetch_transcript(yt_url, video_id))
+            # Transcripts cached before they could be added to the corpus
+            if cached and not app.corpus.contains(video_id):
+                add_to_corpus(yt_url, video_id, cached)
+            (added if cached and app.corpus.contains(video_id) else failed).append(video_id)
+            if progress:
+                progress(i + 1, len(yt_urls), added)
+
+        response = {"message": "Corpus updated.", "added": added, "failed": failed}
+        log_response("/corpus", response, 200)
+        return response, 200
+
+    """Fetches the transcript for a YouTube video.
+
+    Args:
+        url (str): The YouTube video URL.
+        video_id (str): The YouTube video ID, used to name the downloaded file.
+        lang (str, optional): The language code for the transcript. Defaults to "en".
+
+    Returns:
+        Optional[str]: The path to the downloaded transcript if available, else None.
+    """
+
+    def get_transcript(url, video_id, lang="en"):
+        try:
+            # The same metadata serves the video and audio downloads of this video
+            transcript_url = app.metadata_cache.captions(url, lang)
 
             if transcript_url:
-                response = requests.get(transcript_url)
+                response = app.metadata_cache.fetch(transcript_url)
                 if response.status_code == 200:
-                    video_title = video_title.replace(" ", "_")
-                    with open(
-                        f"temp/subtitles/{video_title}.vtt", "w", encoding="utf-8"
-                    ) as file:
+                    # Written under a per-process name and moved into the cache afterwards
+                    path = os.path.join(app.transcript_cache.cache_dir, f"{video_id}.{os.getpid()}.part")
+                    with open(path, "w", encoding="utf-8") as file:
                         file.write(response.text)
 
-                    return f"{video_title}.vtt"
+                    return path
                 else:
-                    print("Failed to fetch transcript")
+                    logger.warning("Failed to fetch transcript", extra={"url": url, "status": response.status_code})
                     return None
             else:
-                print("Failed to fetch transcript")
+                logger.info("No transcript available", extra={"url": url})
                 return None
         except Exception as e:
-            print(f"An error occured when fetching the transcript. Exception {e}")
+            logger.warning("Failed to fetch transcript", extra={"url": url, "error": str(e)})
             return None
 
     return app
@@ -0,0 +1,115 @@
+"""Compares an optimized inference backend with the eager PyTorch models on a set of videos.
+
+Both backends see the same sampled frames. The eager detections are the reference: the script
+reports the candidate's per-frame latency, and its precision and recall on the reference labels.
+
+Usage, from src/backend:
+    python scripts/inference_parity.py video1.mp4 video2.mp4 --backend int8 --keywords person car
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frameUtils import sample_frames, batches  # noqa: E402
+from utils.videoUtils import videoUtils  # noqa: E402
+
+
+def collect_frames(videos, strategy, max_frames):
+    """The sampled frames of every video, at most max_frames in total."""
+    images = []
+    for video in videos:
+        for _, image in sample_frames(video, strategy):
+            images.append(image)
+            if len(images) == max_frames:
+                return images
+    return images
+
+
+def detect(video_utils, images):
+    """YOLO labels above the confidence threshold for every frame, and the seconds per frame."""
+    video_utils.__detect_batch__(images[:1])
+    labels = []
+    start = time.perf_counter()
+    for _, batch in batches(((None, image) for image in images), video_utils.batch_size):
+        for detections in video_utils.__detect_batch__(batch):
+            labels.append({name for name, conf in detections if conf >= video_utils.conf_thresh})
+    return labels, (time.perf_counter() - start) / max(1, len(images))
+
+
+def ground(video_utils, images, keywords):
+    """Grounding DINO keyword matches for every frame, and the seconds per frame."""
+    prompt = [keyword.lower().strip() for keyword in keywords]
+    video_utils.__ground_batch__(images[:1], prompt)
+    labels = []
+    start = time.perf_counter()
+    for _, batch in batches(((None, image) for image in images), video_utils.search_batch_size):
+        for detections in video_utils.__ground_batch__(batch, prompt):
+            labels.append(video_utils.__match_keywords__(detections, keywords, prompt))
+    return labels, (time.perf_counter() - start) / max(1, len(images))
+
+
+def agreement(reference, candidate):
+    """
+    Compares the labels found in each frame.
+
+    Args:
+        reference ([set]): Labels of each frame found by the eager model
+        candidate ([set]): Labels of each frame found by the candidate backend
+
+    Returns:
+        dict: Precision and recall over all (frame, label) pairs, and the share of frames with identical labels
+    """
+    both = sum(len(r & c) for r, c in zip(reference, candidate))
+    found = sum(len(c) for c in candidate)
+    expected = sum(len(r) for r in reference)
+    return {
+        "precision": round(both / found, 4) if found else 1.0,
+        "recall": round(both / expected, 4) if expected else 1.0,
+        "identical_frames": round(sum(r == c for r, c in zip(reference, candidate)) / max(1, len(reference)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+", help="video files of the fixture set")
+    parser.add_argument("--backend", default="int8", choices=["onnx", "int8"], help="backend compared with torch")
+    parser.add_argument("--keywords", nargs="*", default=["person", "car", "dog"], help="Grounding DINO prompt")
+    parser.add_argument("--strategy", default="scene", help="frame sampling strategy")
+    parser.add_argument("--max-frames", type=int, default=200, help="most frames compared")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="exit non-zero below this recall")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    images = collect_frames(args.videos, args.strategy, args.max_frames)
+    if not images:
+        parser.error("no frames were sampled from the videos")
+
+    # Both backends run in this process, even when VIDIFY_MODEL_SERVER is set, and keep their own models
+    reference = videoUtils(backend="torch", model_server="", model_prefix="torch_")
+    candidate = videoUtils(backend=args.backend, model_server="", model_prefix=f"{args.backend}_")
+
+    report = {"backend": candidate.backend, "frames": len(images)}
+    for model, run in (("yolo", detect), ("dino", lambda utils, frames: ground(utils, frames, args.keywords))):
+        reference_labels, reference_seconds = run(reference, images)
+        candidate_labels, candidate_seconds = run(candidate, images)
+        report[model] = {
+            "torch_seconds_per_frame": round(reference_seconds, 4),
+            "candidate_seconds_per_frame": round(candidate_seconds, 4),
+            "speedup": round(reference_seconds / candidate_seconds, 2) if candidate_seconds else None,
+            **agreement(reference_labels, candidate_labels),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    return 0 if min(report["yolo"]["recall"], report["dino"]["recall"]) >= args.min_recall else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+import os
+import mmap
+import struct
+import weakref
+import threading
+import numpy as np
+import webvtt
+from .transcriptIndex import transcriptIndex, parse_query, combine
+
+# File layout, little-endian:
+#   header           magic, numbers of captions, tokens and terms, bytes of the text and term blobs
+#   starts, ends     int64 milliseconds of every caption
+#   text offsets     int64 byte offset of every caption's text in the text blob, plus its end
+#   token captions   int64 caption of every position in the transcript's token stream
+#   term offsets     int64 byte offset of every term in the term blob, plus its end
+#   posting offsets  int64 index of every term's first position in the positions array, plus its end
+#   positions        int64 sorted token positions of every term, term after term
+#   timestamps       the start timestamp of every caption as ASCII, zero-padded to 16 bytes
+#   text blob        the caption texts as UTF-8, as written in the WebVTT file
+#   term blob        the sorted vocabulary as UTF-8
+# All captions form one token stream, so phrases spanning captions match as well. UTF-8 byte
+# order is code point order, so the term blob is sorted for binary search.
+MAGIC = b"VIDIFYT2"
+HEADER = struct.Struct("<8sQQQQQ")
+# Search results carry the formatted timestamps, which are stored so they needn't be formatted per hit
+TIMESTAMP_DTYPE = "S16"
+BINARY_SUFFIX = ".vtb"
+
+# The binary transcripts mapped by this process, by absolute path. Windows can't replace or remove
+# a mapped file, so they are unmapped first, see release.
+mapped = {}
+mapped_lock = threading.Lock()
+
+
+def milliseconds(timestamp):
+    """
+    Converts a WebVTT timestamp to milliseconds.
+
+    Args:
+        timestamp (str): "HH:MM:SS.mmm" or "MM:SS.mmm"
+
+    Returns:
+        int: The number of milliseconds
+    """
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return round(seconds * 1000)
+
+
+def timestamp(ms):
+    """
+    Formats milliseconds as a WebVTT timestamp.
+
+    Args:
+        ms (int): The number of milliseconds
+
+    Returns:
+        str: "HH:MM:SS.mmm"
+    """
+    seconds, ms = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}.{ms:03}"
+
+
+def write_binary(path, cues):
+    """
+    Writes captions in the binary transcript format. The file is written under a temporary
+    name and renamed, so readers never see a partial file.
+
+    Args:
+        path (str): Path of the binary transcript
+        cues ([(int, int, str)]): (start ms, end ms, text) of each caption, in order
+
+    Returns:
+        int: The number of captions written
+    """
+    cues = list(cues)
+    # The positional index supplies the postings
+    index = transcriptIndex((timestamp(start), text) for start, _, text in cues)
+
+    texts = [text.encode("utf-8") for _, _, text in cues]
+    terms = [term.encode("utf-8") for term in index.vocabulary]
+    postings = [index.postings[term] for term in index.vocabulary]
+
+    text_offsets = np.cumsum([0] + [len(text) for text in texts], dtype="<i8")
+    term_offsets = np.cumsum([0] + [len(term) for term in terms], dtype="<i8")
+    posting_offsets = np.cumsum([0] + [len(positions) for positions in postings], dtype="<i8")
+    positions = np.fromiter(
+        (position for positions in postings for position in positions), dtype="<i8", count=int(posting_offsets[-1])
+    )
+
+    part = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(part, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, len(cues), len(index.token_caption), len(terms), int(text_offsets[-1]), int(term_offsets[-1])
+        ))
+        file.write(np.array([start for start, _, _ in cues], dtype="<i8").tobytes())
+        file.write(np.array([end for _, end, _ in cues], dtype="<i8").tobytes())
+        file.write(text_offsets.tobytes())
+        file.write(np.array(index.token_caption, dtype="<i8").tobytes())
+        file.write(term_offsets.tobytes())
+        file.write(posting_offsets.tobytes())
+        file.write(positions.tobytes())
+        file.write(np.array(index.starts, dtype=TIMESTAMP_DTYPE).tobytes())
+        file.write(b"".join(texts))
+        file.write(b"".join(terms))
+    release(path)
+    try:
+        os.replace(part, path)
+    except OSError:
+        os.remove(part)
+        raise
+    return len(cues)
+
+
+def release(path):
+    """
+    Unmaps a binary transcript in this process before the file is replaced or removed. A transcript
+    that is being searched is unmapped when the search finishes; a released transcript maps the
+    file again the next time it is used.
+
+    Args:
+        path (str): Path of the binary transcript
+
+    Returns: None
+    """
+    with mapped_lock:
+        transcripts = list(mapped.pop(os.path.abspath(path), ()))
+    for transcript in transcripts:
+        transcript.close()
+
+
+def convert_vtt(vtt_path, path):
+    """
+    Converts a WebVTT transcript to the binary format. This is the only time the WebVTT file is parsed.
+
+    Args:
+        vtt_path (str): Path of the .vtt file
+        path (str): Path of the binary transcript
+
+    Returns:
+        int: The number of captions written
+    """
+    return write_binary(
+        path,
+        ((milliseconds(caption.start), milliseconds(caption.end), caption.text) for caption in webvtt.read(vtt_path)),
+    )
+
+
+class binaryTranscript:
+
+    """Class constructor
+    A transcript in the binary format, memory-mapped read-only. Captions are read and searched
+    in place, so worker processes share the file's pages instead of each holding parsed captions.
+    Transcripts shared between threads are used within `with transcript:`, so release can't unmap
+    them in the middle of a search.
+
+    Args:
+        path (str): Path of the binary transcript.
+
+    Returns: None
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.lock = threading.Lock()
+        self.users = 0
+        self.closing = False
+        self.buffer = None
+        self.__map__()
+
+    def __enter__(self):
+        with self.lock:
+            if self.buffer is None:
+                self.__map__()
+            self.users += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.users -= 1
+            if self.closing and not self.users:
+                self.__unmap__()
+
+    """Unmap the file, or once the transcript's current users are done with it.
+
+    Args: None
+
+    Returns: None
+    """
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+            if not self.users:
+                self.__unmap__()
+
+    def __map__(self):
+        with open(self.path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with mapped_lock:
+            mapped.setdefault(self.path, weakref.WeakSet()).add(self)
+
+        if len(self.buffer) < HEADER.size or self.buffer[:len(MAGIC)] != MAGIC:
+            self.buffer.close()
+            self.buffer = None
+            raise ValueError(f"Not a binary transcript: {self.path}")
+        _, count, tokens, terms, text_bytes, term_bytes = HEADER.unpack_from(self.buffer)
+
+        offset = HEADER.size
+        arrays = []
+        for length in (count, count, count + 1, tokens, terms + 1, terms + 1, tokens):
+            arrays.append(np.frombuffer(self.buffer, dtype="<i8", count=length, offset=offset))
+            offset += 8 * length
+        (self.starts, self.ends, self.text_offsets, self.token_caption,
+         self.term_offsets, self.posting_offsets, self.positions) = arrays
+
+        self.timestamps = np.frombuffer(self.buffer, dtype=TIMESTAMP_DTYPE, count=count, offset=offset)
+        offset += self.timestamps.itemsize * count
+
+        self.text_start = offset
+        self.terms = memoryview(self.buffer)[offset + text_bytes:offset + text_bytes + term_bytes]
+
+    def __unmap__(self):
+        self.closing = False
+        if self.buffer is None:
+            return
+        # The arrays and the view borrow the mapping, so they go first
+        self.terms.release()
+        self.starts = self.ends = self.text_offsets = self.token_caption = None
+        self.term_offsets = self.posting_offsets = self.positions = self.timestamps = self.terms = None
+        buffer, self.buffer = self.buffer, None
+        try:
+            buffer.close()
+        except BufferError:
+            # Still exported elsewhere, unmapped when that is collected
+            pass
+
+    def __len__(self):
+        return len(self.starts)
+
+    """The text of a caption, as written in the WebVTT file.
+
+    Args:
+        i (int): Number of the caption.
+
+    Returns:
+        str: The text.
+    """
+
+    def text(self, i):
+        start, end = self.text_offsets[i:i + 2].tolist()
+        return self.buffer[self.text_start + start:self.text_start + end].decode("utf-8")
+
+    def timestamp(self, i):
+        return self.timestamps[i].decode("ascii")
+
+    """The texts of several captions, stripped.
+
+    Args:
+        numbers (np.ndarray): Numbers of the captions.
+
+    Returns:
+        [str]: The texts.
+    """
+
+    def __texts__(self, numbers):
+        base = self.text_start
+        starts = self.text_offsets[numbers].tolist()
+        ends = self.text_offsets[numbers + 1].tolist()
+        return [self.buffer[base + start:base + end].decode("utf-8").strip() for start, end in zip(starts, ends)]
+
+    """All captions, for consumers that need every one of them, e.g. embedding.
+
+    Args: None
+
+    Returns:
+        [(str, str)]: (start timestamp, text) of each caption, in order.
+    """
+
+    def captions(self):
+        return [(self.timestamp(i), self.text(i)) for i in range(len(self))]
+
+    def __term__(self, i):
+        return bytes(self.terms[self.term_offsets[i]:self.term_offsets[i + 1]])
+
+    def __bisect__(self, word):
+        # First term not smaller than word
+        low, high = 0, len(self.term_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.__term__(middle) < word:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    """Positions of a single query term. A trailing * turns the term into a prefix match.
+
+    Args:
+        term (str): A normalized query token, optionally ending with *.
+
+    Returns:
+        np.ndarray: Sorted token positions at which the term occurs.
+    """
+
+    def __positions__(self, term):
+        word = term.rstrip("*").encode("utf-8")
+        i = self.__bisect__(word)
+        terms = len(self.term_offsets) - 1
+
+        if not term.endswith("*"):
+            if i < terms and self.__term__(i) == word:
+                return self.positions[self.posting_offsets[i]:self.posting_offsets[i + 1]]
+            return self.positions[:0]
+
+        # The terms with the prefix are next to each other in the vocabulary
+        end = i
+        while end < terms and self.__term__(end).startswith(word):
+            end += 1
+        return np.sort(self.positions[self.posting_offsets[i]:self.posting_offsets[end]])
+
+    """Find a phrase of one or more terms, as transcriptIndex does: starting from the rarest
+    term, the other terms are checked at their offsets from it, so the cost follows the hits.
+
+    Args:
+        terms ([str]): Consecutive query terms.
+
+    Returns:
+        {int: int}: First caption of each match mapped to the last caption the match spans.
+    """
+
+    def __phrase__(self, terms):
+        postings = [self.__positions__(term) for term in terms]
+        if not all(len(positions) for positions in postings):
+            return {}
+
+        rarest = min(range(len(terms)), key=lambda k: len(postings[k]))
+        starts = postings[rarest] - rarest
+        starts = starts[(starts >= 0) & (starts + len(terms) <= len(self.token_caption))]
+        for k, positions in enumerate(postings):
+            if k == rarest or not len(starts):
+                continue
+            found = np.searchsorted(positions, starts + k)
+            valid = found < len(positions)
+            valid[valid] = positions[found[valid]] == starts[valid] + k
+            starts = starts[valid]
+
+        matches = {}
+        firsts = self.token_caption[starts].tolist()
+        lasts = self.token_caption[starts + len(terms) - 1].tolist()
+        for first, last in zip(firsts, lasts):
+            matches[first] = max(matches.get(first, first), last)
+        return matches
+
+    """Search the transcript, with the syntax and results of transcriptIndex.search.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        [(str, str)]: (start timestamp, text) of every matching caption, in order. The text of a
+            phrase match spanning several captions is joined together.
+    """
+
+    def search(self, query):
+        matches = combine(
+            [[self.__phrase__(terms) if terms else {} for terms in clauses] for clauses in parse_query(query)]
+        )
+        if not matches:
+            return []
+
+        firsts = np.array([first for first, _ in matches], dtype=np.int64)
+        timestamps = [stamp.decode("ascii") for stamp in self.timestamps[firsts].tolist()]
+        # Most matches lie within one caption; the texts of longer ones are joined
+        texts = self.__texts__(firsts)
+        for n, (first, last) in enumerate(matches):
+            if last > first:
+                texts[n] = " ".join(self.__texts__(np.arange(first, last + 1)))
+        return list(zip(timestamps, texts))
+
+    """Export the transcript as WebVTT. Timings and texts are written exactly as stored.
+
+    Args:
+        path (str): Path of the .vtt file.
+
+    Returns: None
+    """
+
+    def to_vtt(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("WEBVTT\n\n")
+            for i in range(len(self)):
+                file.write(f"{timestamp(self.starts[i])} --> {timestamp(self.ends[i])}\n{self.text(i)}\n\n")
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+WORK_DIR = "temp/work"
+
+
+@contextmanager
+def workspace(work_dir=WORK_DIR):
+    """
+    Creates a private directory for the files of one request, removed with
+    everything in it when the request is done.
+
+    Args:
+        work_dir (str): Directory the workspaces are created in
+
+    Returns:
+        str: Path to the workspace
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    path = tempfile.mkdtemp(dir=work_dir)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class singleFlight:
+
+    """Class constructor
+    Coalesces concurrent calls with the same key: the first caller runs the function,
+    callers arriving while it runs wait and share its result (or exception).
+
+    Args: None
+
+    Returns: None
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    """Run a function once for all concurrent callers with the same key.
+
+    Args:
+        key (Hashable): Identifies the work, e.g. (task, video_id).
+        func (Callable[[], Any]): The work.
+
+    Returns:
+        Any: The result of func.
+    """
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+
+        if leader:
+            try:
+                call["result"] = func()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call["done"].set()
+        else:
+            call["done"].wait()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
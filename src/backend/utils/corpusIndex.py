@@ -0,0 +1,284 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import webvtt
+
+logger = logging.getLogger(__name__)
+
+CORPUS_DIR = os.environ.get("CORPUS_DIR", "temp/corpus")
+# Videos are spread over this many SQLite databases, searched in parallel
+CORPUS_SHARDS = int(os.environ.get("CORPUS_SHARDS", 8))
+# Consecutive captions are indexed together as passages of about this many seconds
+PASSAGE_SECONDS = 30
+# Words of context around the matches in a snippet
+SNIPPET_TOKENS = 16
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def seconds(timestamp):
+    """
+    Converts a WebVTT timestamp to seconds.
+
+    Args:
+        timestamp (str): "HH:MM:SS.mmm" or "MM:SS.mmm"
+
+    Returns:
+        float: The number of seconds
+    """
+    total = 0.0
+    for part in timestamp.split(":"):
+        total = total * 60 + float(part)
+    return total
+
+
+def passages(captions, length=PASSAGE_SECONDS):
+    """
+    Joins consecutive captions into passages, so the short lines of automatic captions
+    are ranked with their context.
+
+    Args:
+        captions ([(str, str)]): (start timestamp, text) of each caption, in order
+        length (float): Seconds after which a new passage starts
+
+    Returns:
+        [(str, str)]: (start timestamp, text) of each passage
+    """
+    result = []
+    start, texts = None, []
+    for timestamp, text in captions:
+        text = text.strip()
+        if not text:
+            continue
+        if start is not None and seconds(timestamp) - seconds(start) >= length:
+            result.append((start, " ".join(texts)))
+            start, texts = None, []
+        if start is None:
+            start = timestamp
+        texts.append(text)
+    if texts:
+        result.append((start, " ".join(texts)))
+    return result
+
+
+def fts_query(query):
+    """
+    Translates a transcript search query to an FTS5 expression. Words next to each other form a
+    phrase, phrases are combined with AND and OR, and a word ending with * matches as a prefix,
+    as in transcriptIndex.search. Every word is quoted, so no input is read as FTS5 syntax.
+
+    Args:
+        query (str): The search query, e.g. "machine learning OR neural net*"
+
+    Returns:
+        Optional[str]: The FTS5 expression, None if the query has no words.
+    """
+    alternatives = []
+    for alternative in re.split(r"\s+OR\s+", query.strip()):
+        clauses = []
+        for clause in re.split(r"\s+AND\s+", alternative):
+            phrase = []
+            for word, star in re.findall(r"([^\s*]+)(\*?)", clause):
+                tokens = TOKEN_PATTERN.findall(word.casefold())
+                if not tokens:
+                    continue
+                # A prefix can only follow the last word of an FTS5 phrase
+                if star:
+                    if phrase:
+                        clauses.append('"' + " ".join(phrase) + '"')
+                    clauses.append('"' + " ".join(tokens) + '"*')
+                    phrase = []
+                else:
+                    phrase.extend(tokens)
+            if phrase:
+                clauses.append('"' + " ".join(phrase) + '"')
+        if clauses:
+            alternatives.append("(" + " AND ".join(clauses) + ")")
+    return " OR ".join(alternatives) or None
+
+
+class corpusIndex:
+
+    """Class constructor
+    Ranked full-text search over the transcripts of many videos. Every video's captions are
+    stored as passages in one of several SQLite FTS5 shards, chosen by the video ID, and ranked
+    with BM25. Videos can be added and removed one at a time, and several worker processes can
+    share the index.
+
+    Args:
+        corpus_dir (str): Directory the shard databases are kept in.
+        shards (int): Number of shards. Changing it requires rebuilding the corpus.
+
+    Returns: None
+    """
+
+    def __init__(self, corpus_dir=CORPUS_DIR, shards=CORPUS_SHARDS):
+        self.corpus_dir = corpus_dir
+        self.shards = shards
+        self.executor = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="corpus")
+
+        os.makedirs(self.corpus_dir, exist_ok=True)
+        for shard in range(self.shards):
+            with self.__connect__(shard) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS videos (
+                        video_id TEXT PRIMARY KEY,
+                        title TEXT,
+                        passages INTEGER NOT NULL,
+                        added REAL NOT NULL
+                    )"""
+                )
+                # Case and accents are folded by the tokenizer, for documents and queries alike
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+                    "video_id UNINDEXED, start UNINDEXED, text, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+
+    @contextmanager
+    def __connect__(self, shard):
+        conn = sqlite3.connect(os.path.join(self.corpus_dir, f"shard-{shard}.db"), timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def __shard__(self, video_id):
+        # Stable across processes, unlike hash()
+        return zlib.crc32(video_id.encode()) % self.shards
+
+    """Add a video's transcript to the corpus, replacing an earlier version of it.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+        captions ([(str, str)]): (start timestamp, text) of each caption, in order.
+        title (str, optional): Title of the video.
+
+    Returns:
+        int: The number of passages indexed.
+    """
+
+    def add(self, video_id, captions, title=None):
+        rows = passages(captions)
+        with self.__connect__(self.__shard__(video_id)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM passages WHERE video_id = ?", (video_id,))
+                conn.executemany(
+                    "INSERT INTO passages (video_id, start, text) VALUES (?, ?, ?)",
+                    [(video_id, start, text) for start, text in rows],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO videos (video_id, title, passages, added) VALUES (?, ?, ?, ?)",
+                    (video_id, title, len(rows), time.time()),
+                )
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        logger.info("Video added to corpus", extra={"video": video_id, "passages": len(rows)})
+        return len(rows)
+
+    """Add a video's transcript file to the corpus.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+        path (str): Path to the .vtt file.
+        title (str, optional): Title of the video.
+
+    Returns:
+        int: The number of passages indexed.
+    """
+
+    def add_vtt(self, video_id, path, title=None):
+        return self.add(video_id, [(caption.start, caption.text) for caption in webvtt.read(path)], title)
+
+    """Remove a video from the corpus.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+
+    Returns:
+        bool: True if the video was in the corpus.
+    """
+
+    def remove(self, video_id):
+        with self.__connect__(self.__shard__(video_id)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM passages WHERE video_id = ?", (video_id,))
+            removed = conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,)).rowcount
+            conn.execute("COMMIT")
+        return removed > 0
+
+    def contains(self, video_id):
+        with self.__connect__(self.__shard__(video_id)) as conn:
+            return conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def __search_shard__(self, shard, expression, k, video_ids):
+        sql = (
+            f"SELECT video_id, start, snippet(passages, 2, '[', ']', '...', {SNIPPET_TOKENS}), bm25(passages) "
+            "FROM passages WHERE passages MATCH ?"
+        )
+        params = [expression]
+        if video_ids:
+            sql += f" AND video_id IN ({', '.join('?' * len(video_ids))})"
+            params += video_ids
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(k)
+
+        with self.__connect__(shard) as conn:
+            rows = conn.execute(sql, params).fetchall()
+            ids = sorted({row[0] for row in rows})
+            titles = dict(conn.execute(
+                f"SELECT video_id, title FROM videos WHERE video_id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()) if ids else {}
+        return [(video_id, titles.get(video_id), start, snippet, score) for video_id, start, snippet, score in rows]
+
+    """Search the transcripts of all videos in the corpus.
+
+    Args:
+        query (str): The search query, with the syntax of transcriptIndex.search.
+        k (int): Number of hits returned.
+        video_ids ([str], optional): Only search these videos, e.g. the videos of a playlist.
+
+    Returns:
+        [dict]: {"video_id", "title", "timestamp", "snippet", "score"} of the best passages,
+            best first. Matches in the snippet are enclosed in square brackets.
+    """
+
+    def search(self, query, k=20, video_ids=None):
+        expression = fts_query(query or "")
+        if not expression or k <= 0:
+            return []
+
+        shards = range(self.shards)
+        if video_ids:
+            video_ids = list(video_ids)
+            shards = sorted({self.__shard__(video_id) for video_id in video_ids})
+
+        # Every shard returns its own top k, the best k of those are the overall top k
+        futures = [self.executor.submit(self.__search_shard__, shard, expression, k, video_ids) for shard in shards]
+        rows = [row for future in futures for row in future.result()]
+        rows.sort(key=lambda row: row[4])
+
+        return [
+            # bm25() is lower for better matches
+            {"video_id": video_id, "title": title, "timestamp": start, "snippet": snippet, "score": round(-score, 4)}
+            for video_id, title, start, snippet, score in rows[:k]
+        ]
+
+    def status(self):
+        videos = passages_total = 0
+        for shard in range(self.shards):
+            with self.__connect__(shard) as conn:
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(passages), 0) FROM videos").fetchone()
+            videos += count
+            passages_total += total
+        return {"videos": videos, "passages": passages_total, "shards": self.shards}
@@ -0,0 +1,339 @@
+import io
+import os
+import math
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+from .frameUtils import batches, prefetch
+from .modelUtils import lazyModel
+from .metricsUtils import observe_inference
+
+INDEX_DIR = "temp/cache/frames"
+INDEX_DB = "temp/cache/frames.db"
+CLIP_MODEL = os.environ.get("CLIP_MODEL", "openai/clip-vit-base-patch32")
+# Number of frames embedded in one forward pass
+CLIP_BATCH_SIZE = int(os.environ.get("CLIP_BATCH_SIZE", 32))
+# Size bound for all indexes together and the maximum age of an index
+FRAME_INDEX_MAX_BYTES = int(os.environ.get("FRAME_INDEX_MAX_BYTES", 2 * 1024 ** 3))
+FRAME_INDEX_TTL = int(os.environ.get("FRAME_INDEX_TTL", 7 * 24 * 3600))
+
+
+class frameIndex:
+
+    """Class constructor
+    A per-video visual index: one CLIP image embedding per selected frame, plus a JPEG copy of
+    the frame so that a detector can re-check the best candidates without the video.
+    Each video is stored as a directory under index_dir/<video_id>. Like transcriptCache, the
+    indexes are listed in a SQLite database shared by the worker processes, which evicts expired
+    and least recently used indexes beyond max_bytes.
+
+    Args:
+        device (str): Device the CLIP model runs on.
+        index_dir (str): Directory in which the indexes are stored.
+        batch_size (int): Number of frames embedded in one forward pass.
+        db_path (str): Path to the SQLite metadata database.
+        max_bytes (int): Total size of the indexes before the least recently used are evicted.
+        ttl (int): Number of seconds after which an index expires.
+
+    Returns: None
+    """
+
+    def __init__(self, device="cpu", index_dir=INDEX_DIR, batch_size=CLIP_BATCH_SIZE, db_path=INDEX_DB,
+                 max_bytes=FRAME_INDEX_MAX_BYTES, ttl=FRAME_INDEX_TTL):
+        self.device = device
+        self.index_dir = index_dir
+        self.batch_size = batch_size
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        with self.__connect__() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS frame_indexes (
+                    video_id TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+
+        self.clip = lazyModel("clip", self.__load_clip__)
+
+    @contextmanager
+    def __connect__(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def __load_clip__(self):
+        from transformers import CLIPModel, CLIPProcessor
+
+        return CLIPProcessor.from_pretrained(CLIP_MODEL), CLIPModel.from_pretrained(CLIP_MODEL).to(self.device).eval()
+
+    @property
+    def CLIPprocessor(self):
+        return self.clip.get()[0]
+
+    @property
+    def CLIPmodel(self):
+        return self.clip.get()[1]
+
+    """Embed frames with CLIP.
+
+    Args:
+        images ([np.ndarray]): RGB frames.
+
+    Returns:
+        np.ndarray: L2-normalized float32 embeddings, one row per frame.
+    """
+
+    def __embed_images__(self, images):
+        import torch
+
+        start = time.perf_counter()
+        inputs = self.CLIPprocessor(images=images, return_tensors="pt").to(self.device)
+        with torch.no_grad():
+            features = self.CLIPmodel.get_image_features(**inputs)
+        features = torch.nn.functional.normalize(features, dim=-1)
+        observe_inference("clip", time.perf_counter() - start, len(images))
+        return features.cpu().numpy().astype(np.float32)
+
+    """Embed text queries with CLIP.
+
+    Args:
+        texts ([str]): The queries.
+
+    Returns:
+        np.ndarray: L2-normalized float32 embeddings, one row per query.
+    """
+
+    def __embed_texts__(self, texts):
+        import torch
+
+        inputs = self.CLIPprocessor(text=[f"a photo of a {t}" for t in texts], return_tensors="pt", padding=True)
+        with torch.no_grad():
+            features = self.CLIPmodel.get_text_features(**inputs.to(self.device))
+        return torch.nn.functional.normalize(features, dim=-1).cpu().numpy().astype(np.float32)
+
+    def __video_dir__(self, video_id):
+        return os.path.join(self.index_dir, video_id)
+
+    """Check whether a video has been indexed. Marks the index as used.
+
+    Args:
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        bool: True if the index exists and has not expired.
+    """
+
+    def has(self, video_id):
+        now = time.time()
+        with self.__connect__() as conn:
+            row = conn.execute("SELECT created FROM frame_indexes WHERE video_id = ?", (video_id,)).fetchone()
+            if not row:
+                return False
+
+            if now - row[0] > self.ttl or not self.__complete__(video_id):
+                self.__drop__(conn, video_id)
+                return False
+
+            conn.execute("UPDATE frame_indexes SET accessed = ? WHERE video_id = ?", (now, video_id))
+        return True
+
+    """Look up when a video's index was built. Read-only: the index is not marked as used,
+    e.g. when only a cache validator is derived from it.
+
+    Args:
+        video_id (str): The YouTube video ID.
+
+    Returns:
+        Optional[float]: The build time if the index exists and has not expired, else None.
+    """
+
+    def created(self, video_id):
+        with self.__connect__() as conn:
+            row = conn.execute("SELECT created FROM frame_indexes WHERE video_id = ?", (video_id,)).fetchone()
+        if not row or time.time() - row[0] > self.ttl or not self.__complete__(video_id):
+            return None
+        return row[0]
+
+    def __complete__(self, video_id):
+        # Another worker may be removing it; a partly removed index is gone as well
+        files = ("embeddings.npy", "timestamps.npy", "offsets.npy", "frames.bin")
+        return all(os.path.exists(os.path.join(self.__video_dir__(video_id), file)) for file in files)
+
+    """Embed and store every frame of a video. The JPEG copies are written to disk as the
+    frames arrive, so only the embeddings are held in memory.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        frames (Iterator[(float, np.ndarray)]): Timestamped RGB frames.
+        progress (Callable, optional): Called after every batch as progress(frames_done, frames_total, None).
+
+    Returns:
+        int: Number of indexed frames.
+    """
+
+    def build(self, video_id, frames, progress=None):
+        timestamps, embeddings, offsets = [], [], [0]
+
+        # Written to a temporary directory and renamed, so readers never see a partial index
+        os.makedirs(self.index_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.index_dir)
+        try:
+            with open(os.path.join(temp_dir, "frames.bin"), "wb") as blob:
+                for batch_timestamps, images in prefetch(batches(frames, self.batch_size)):
+                    embeddings.append(self.__embed_images__(images))
+                    timestamps.extend(batch_timestamps)
+                    for image in images:
+                        buffer = io.BytesIO()
+                        Image.fromarray(image).save(buffer, format="JPEG", quality=90)
+                        blob.write(buffer.getbuffer())
+                        offsets.append(offsets[-1] + buffer.getbuffer().nbytes)
+
+                    if progress:
+                        progress(len(timestamps), None, None)
+
+            np.save(os.path.join(temp_dir, "timestamps.npy"), np.array(timestamps, dtype=np.float64))
+            np.save(
+                os.path.join(temp_dir, "embeddings.npy"),
+                np.concatenate(embeddings) if embeddings else np.zeros((0, 0), np.float32),
+            )
+            np.save(os.path.join(temp_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+            size = sum(entry.stat().st_size for entry in os.scandir(temp_dir))
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        now = time.time()
+        with self.__connect__() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM frame_indexes WHERE video_id = ?", (video_id,)).fetchone():
+                    # Another worker finished indexing the same video first
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                else:
+                    # Left behind by an index whose entry is gone
+                    shutil.rmtree(self.__video_dir__(video_id), ignore_errors=True)
+                    os.replace(temp_dir, self.__video_dir__(video_id))
+                    conn.execute(
+                        "INSERT INTO frame_indexes (video_id, size, created, accessed) VALUES (?, ?, ?, ?)",
+                        (video_id, size, now, now),
+                    )
+                    self.__evict__(conn, now, keep=video_id)
+            except Exception:
+                conn.execute("ROLLBACK")
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                raise
+            conn.execute("COMMIT")
+
+        if progress:
+            progress(len(timestamps), len(timestamps), None)
+        return len(timestamps)
+
+    def __drop__(self, conn, video_id):
+        conn.execute("DELETE FROM frame_indexes WHERE video_id = ?", (video_id,))
+        shutil.rmtree(self.__video_dir__(video_id), ignore_errors=True)
+
+    """Drop expired indexes, then the least recently used ones until the indexes fit in max_bytes.
+
+    Args:
+        conn (sqlite3.Connection): Connection with an open write transaction.
+        now (float): Current time.
+        keep (str): Video ID that must not be evicted (the index that was just added).
+
+    Returns: None
+    """
+
+    def __evict__(self, conn, now, keep=None):
+        for (video_id,) in conn.execute(
+            "SELECT video_id FROM frame_indexes WHERE created < ?", (now - self.ttl,)
+        ).fetchall():
+            self.__drop__(conn, video_id)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM frame_indexes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT video_id, size FROM frame_indexes WHERE video_id != ? ORDER BY accessed ASC", (keep,)
+        ).fetchall()
+        for video_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.__drop__(conn, video_id)
+            total -= size
+
+    """Rank the indexed frames of a video against text queries. Another worker can evict the index
+    after has(); reading it then raises FileNotFoundError, like frames does.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        queries ([str]): The objects a user is looking for.
+        top_k (int): Least number of best frames returned per query.
+        min_score (float): Frames with a lower cosine similarity are never returned.
+        top_fraction (float): Share of the video's frames returned per query when it exceeds top_k,
+            so long videos get as many candidates per minute as short ones.
+
+    Returns:
+        {str: [(int, float, float)]}: (frame number, timestamp, score) of the best frames
+            for each query, best first.
+    """
+
+    def query(self, video_id, queries, top_k, min_score=0.0, top_fraction=0.0):
+        path = self.__video_dir__(video_id)
+        embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        timestamps = np.load(os.path.join(path, "timestamps.npy"))
+        if not len(timestamps):
+            return {query: [] for query in queries}
+
+        features = self.__embed_texts__(queries)
+
+        # One matrix product scores every frame against every query
+        scores = np.asarray(embeddings) @ features.T
+
+        ranked = {}
+        for q, query in enumerate(queries):
+            column = scores[:, q]
+            k = min(max(top_k, math.ceil(top_fraction * len(column))), len(column))
+            if k <= 0:
+                ranked[query] = []
+                continue
+            best = np.argpartition(-column, k - 1)[:k]
+            best = best[np.argsort(-column[best])]
+            ranked[query] = [
+                (int(i), float(timestamps[i]), float(column[i])) for i in best if column[i] >= min_score
+            ]
+        return ranked
+
+    """Load stored frames of a video.
+
+    Args:
+        video_id (str): The YouTube video ID.
+        numbers ([int]): Frame numbers, as returned by query.
+
+    Returns:
+        [np.ndarray]: The RGB frames.
+    """
+
+    def frames(self, video_id, numbers):
+        path = self.__video_dir__(video_id)
+        offsets = np.load(os.path.join(path, "offsets.npy"))
+
+        images = []
+        with open(os.path.join(path, "frames.bin"), "rb") as blob:
+            for i in numbers:
+                blob.seek(offsets[i])
+                jpeg = blob.read(int(offsets[i + 1] - offsets[i]))
+                images.append(np.asarray(Image.open(io.BytesIO(jpeg)).convert("RGB")))
+        return images
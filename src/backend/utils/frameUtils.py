@@ -0,0 +1,450 @@
+import os
+import re
+import queue
+import threading
+import ffmpeg
+import numpy as np
+from PIL import Image
+from .metricsUtils import FRAME_EXTRACTION_SECONDS, FRAMES_SELECTED, timed_iter
+
+# Selects the first frame and every frame that differs from the previous one by more than 30%
+SCENE_FILTER = "select='eq(n\\,0)+gt(scene\\,0.3)'"
+
+SHOWINFO_PATTERN = re.compile(r"\bn:\s*\d+\s+pts:\s*-?\d+\s+pts_time:([\d\.]+).*?\ss:(\d+)x(\d+)")
+# ffmpeg's summary of an input stream, printed at the verbose log level
+DECODED_PATTERN = re.compile(r"Input stream #\d+:\d+ \(video\):.*?(\d+) frames decoded")
+
+# How frames are picked from a video:
+#   scene      every frame decoded at full resolution and scored against the previous one
+#   keyframes  only keyframes are decoded; no scoring unless a threshold is set
+#   fps        frames sampled at a fixed rate; no scoring unless a threshold is set
+#   scene_low  scored on a stream downscaled to at most SCENE_WIDTH; the selected frames are then
+#              decoded again at full resolution for the models
+STRATEGIES = ("scene", "keyframes", "fps", "scene_low")
+FRAME_STRATEGY = os.environ.get("FRAME_STRATEGY", "scene")
+# Minimum scene change for a frame to be selected, None for the strategy's default
+FRAME_THRESHOLD = float(os.environ["FRAME_THRESHOLD"]) if os.environ.get("FRAME_THRESHOLD") else None
+DEFAULT_THRESHOLDS = {"scene": 0.3, "keyframes": 0, "fps": 0, "scene_low": 0.3}
+# Sampling rate of the fps strategy and frame width of the scene_low strategy
+SAMPLE_FPS = float(os.environ.get("SAMPLE_FPS", 1))
+SCENE_WIDTH = int(os.environ.get("SCENE_WIDTH", 320))
+# Most frames selected per minute of video, 0 for no limit
+FRAMES_PER_MINUTE = float(os.environ.get("FRAMES_PER_MINUTE", 0))
+# Most frames one full-resolution pass of scene_low selects; its select expression grows with every frame
+FULL_PASS_FRAMES = 400
+# Frames whose 64-bit difference hashes differ in at most this many bits are near-duplicates, -1 to disable
+DEDUP_DISTANCE = int(os.environ.get("DEDUP_DISTANCE", 4))
+
+
+def input_video(video, **options):
+    """
+    Creates the ffmpeg input of a video file or media stream.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream
+        **options: Further options of the input
+
+    Returns:
+        ffmpeg.nodes.FilterableStream: The ffmpeg input
+    """
+    if isinstance(video, str):
+        return ffmpeg.input(video, **options)
+
+    # Reconnect if the server drops the connection partway through the stream
+    options.update(reconnect=1, reconnect_streamed=1, reconnect_delay_max=5)
+    headers = video.get("headers")
+    if headers:
+        options["headers"] = "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+    return ffmpeg.input(video["url"], **options)
+
+
+def scene_filter(threshold):
+    """
+    Creates the select filter that keeps the first frame and every scene change.
+
+    Args:
+        threshold (float): Minimum scene change between 0 and 1, 0 to keep every frame
+
+    Returns:
+        Optional[str]: The ffmpeg filter, or None if every frame is kept
+    """
+    if threshold <= 0:
+        return None
+    return f"select='eq(n\\,0)+gt(scene\\,{threshold})'"
+
+
+def sample_frames(video, strategy=FRAME_STRATEGY, threshold=FRAME_THRESHOLD, fps=SAMPLE_FPS,
+                  width=SCENE_WIDTH, per_minute=FRAMES_PER_MINUTE, stats=None):
+    """
+    Streams the frames of a video that a sampling strategy selects, see STRATEGIES.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream
+        strategy (str): One of STRATEGIES
+        threshold (float, optional): Minimum scene change between 0 and 1, None for the strategy's default
+        fps (float): Frames per second sampled by the fps strategy
+        width (int): Frame width of the scene_low strategy
+        per_minute (float): Most frames selected per minute of video, 0 for no limit
+        stats (dict, optional): Filled with the strategy and the number of frames decoded and selected
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The timestamp in seconds and an HxWx3 uint8 RGB array
+            for each selected frame, in order
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown frame strategy: {strategy}")
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[strategy]
+
+    filters = []
+    input_options = {}
+    if strategy == "keyframes":
+        input_options["skip_frame"] = "nokey"
+    elif strategy == "fps":
+        filters.append(f"fps={fps}")
+    elif strategy == "scene_low":
+        # Never upscaled, smaller videos are scored as they are
+        filters.append(f"scale=w='min(iw\\,{width})':h=-2")
+    select = scene_filter(threshold)
+    if select:
+        filters.append(select)
+
+    if stats is not None:
+        stats.update(strategy=strategy, frames_decoded=0, frames_selected=0)
+
+    frames = stream_frames(video, ",".join(filters) or None, input_options, stats)
+    if per_minute > 0:
+        frames = limit_rate(frames, per_minute)
+    if strategy == "scene_low":
+        # Only the timestamps of the downscaled stream are kept
+        frames = full_resolution(video, frames, stats)
+    frames = timed_iter(frames, FRAME_EXTRACTION_SECONDS, strategy=strategy)
+
+    selected = 0
+    try:
+        for frame in frames:
+            selected += 1
+            if stats is not None:
+                stats["frames_selected"] += 1
+            yield frame
+    finally:
+        frames.close()
+        FRAMES_SELECTED.labels(strategy=strategy).observe(selected)
+
+
+def limit_rate(frames, per_minute):
+    """
+    Drops frames that follow the previous kept frame too closely,
+    so that no more than about per_minute frames are kept per minute.
+
+    Args:
+        frames (Iterator[(float, np.ndarray)]): Timestamped frames
+        per_minute (float): Most frames kept per minute
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The kept frames
+    """
+    gap = 60 / per_minute
+    last = None
+    for timestamp, image in frames:
+        if last is None or timestamp - last >= gap:
+            last = timestamp
+            yield timestamp, image
+
+
+def full_resolution(video, frames, stats=None, pass_frames=FULL_PASS_FRAMES):
+    """
+    Decodes the frames at the timestamps of other frames, e.g. of a downscaled stream, again at full
+    resolution. One ffmpeg pass selects all of them, or up to pass_frames at a time for long videos.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream
+        frames (Iterator[(float, np.ndarray)]): Timestamped frames
+        stats (dict, optional): The frames the passes decode are added to its "frames_decoded"
+        pass_frames (int): Most frames selected by one pass
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The frames at the same timestamps as HxWx3 uint8 RGB arrays at full resolution
+    """
+    # Added to stats after the frames are exhausted, so it doesn't race with their own count
+    decoded = {"frames_decoded": 0}
+    try:
+        timestamps = []
+        for timestamp, _ in frames:
+            timestamps.append(timestamp)
+            if len(timestamps) == pass_frames:
+                yield from select_timestamps(video, timestamps, decoded)
+                timestamps = []
+        if timestamps:
+            yield from select_timestamps(video, timestamps, decoded)
+        if stats is not None:
+            stats["frames_decoded"] = stats.get("frames_decoded", 0) + decoded["frames_decoded"]
+    finally:
+        if hasattr(frames, "close"):
+            frames.close()
+
+
+def select_timestamps(video, timestamps, stats=None):
+    """
+    Decodes the frames at the given timestamps in one pass. The pass seeks to the first of them
+    and stops after the last, so only that stretch of the video is read.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream
+        timestamps ([float]): Timestamps of frames as stream_frames reports them, in order
+        stats (dict, optional): The frames the pass decodes are added to its "frames_decoded"
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The timestamp and an HxWx3 uint8 RGB array of each frame
+    """
+    # Timestamps are rounded to milliseconds
+    select = "select='" + "+".join(f"lt(abs(t-{timestamp})\\,0.0005)" for timestamp in timestamps) + "'"
+    start = max(0.0, timestamps[0] - 0.0005)
+    input_options = {"t": timestamps[-1] - start + 0.1}
+    if start:
+        # copyts keeps the timestamps of the whole video after the seek
+        input_options.update(ss=start, copyts=None)
+
+    yield from stream_frames(video, select, input_options, stats)
+
+
+def sample_window(video, start, duration, fps):
+    """
+    Streams frames at a fixed rate from one stretch of a video. ffmpeg seeks to the
+    stretch, so the rest of the video is not decoded.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream
+        start (float): Start of the stretch in seconds
+        duration (float): Length of the stretch in seconds
+        fps (float): Frames per second sampled
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The timestamp in seconds from the start of the video
+            and an HxWx3 uint8 RGB array for each frame, in order
+    """
+    # Timestamps restart at 0 after seeking
+    for timestamp, image in stream_frames(video, f"fps={fps}", {"ss": start, "t": duration}):
+        yield round(start + timestamp, 3), image
+
+
+def merge_intervals(intervals, max_gap=0):
+    """
+    Merges time intervals that overlap or lie at most max_gap apart.
+
+    Args:
+        intervals ([(float, float)]): (start, end) of each interval, in any order
+        max_gap (float): Largest gap in seconds bridged between two intervals
+
+    Returns:
+        [(float, float)]: The merged intervals, in order
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def stream_frames(video, select=SCENE_FILTER, input_options=None, stats=None):
+    """
+    Decodes the selected frames of a video straight from ffmpeg's stdout as raw RGB,
+    without writing any images to disk. Frames are read one at a time, so memory stays
+    bounded by the consumer's window instead of the length of the video.
+
+    The timestamp and size of each frame are taken from the showinfo filter on stderr,
+    which is read on a separate thread so neither pipe can fill up and stall ffmpeg.
+
+    Args:
+        video (str | dict): Path of a video file, or {"url", "headers"} of a media stream.
+            A stream is decoded while it downloads, so early frames are ready before the last bytes arrive.
+        select (str, optional): The ffmpeg filters that select the frames, None for all frames
+        input_options (dict, optional): Options of the ffmpeg input, e.g. {"skip_frame": "nokey"}
+        stats (dict, optional): The number of frames ffmpeg decoded is added to its "frames_decoded"
+
+    Returns:
+        Iterator[(float, np.ndarray)]: The timestamp in seconds and an HxWx3 uint8 RGB array
+            for each selected frame, in order
+    """
+    process = (
+        input_video(video, **(input_options or {}))
+        .output(
+            "pipe:",
+            format="rawvideo",
+            pix_fmt="rgb24",
+            vf=f"{select},showinfo" if select else "showinfo",
+            fps_mode="vfr",
+        )
+        # The verbose log level adds the number of decoded frames to the summary
+        .global_args("-v", "verbose")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    frame_info = queue.Queue()
+    stderr_tail = []
+
+    def read_stderr():
+        for line in process.stderr:
+            line = line.decode("utf-8", errors="ignore")
+            match = SHOWINFO_PATTERN.search(line)
+            decoded = DECODED_PATTERN.search(line)
+            if match:
+                frame_info.put((float(match.group(1)), int(match.group(2)), int(match.group(3))))
+            elif decoded and stats is not None:
+                # Added, so the passes of one sampling share a count
+                stats["frames_decoded"] = stats.get("frames_decoded", 0) + int(decoded.group(1))
+            else:
+                stderr_tail.append(line)
+                del stderr_tail[:-20]
+        frame_info.put(None)
+
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    reader.start()
+
+    finished = False
+    try:
+        while True:
+            info = frame_info.get()
+            if info is None:
+                break
+
+            timestamp, width, height = info
+            size = width * height * 3
+            data = process.stdout.read(size)
+            if len(data) < size:
+                break
+
+            yield round(timestamp, 3), np.frombuffer(data, np.uint8).reshape(height, width, 3)
+        finished = True
+    finally:
+        if not finished:
+            # The consumer stopped early: there is no need to decode the rest of the video
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        reader.join()
+
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, "".join(stderr_tail).encode("utf-8"))
+
+
+def dhash(image, size=8):
+    """
+    Computes the difference hash of a frame: whether each pixel of a tiny grayscale
+    copy is brighter than its right neighbour. Near-identical frames get hashes that
+    differ in only a few bits.
+
+    Args:
+        image (np.ndarray): HxWx3 uint8 RGB frame
+        size (int): Side of the hash grid, the hash has size * size bits
+
+    Returns:
+        int: The hash
+    """
+    small = np.asarray(Image.fromarray(image).convert("L").resize((size + 1, size), Image.BILINEAR), np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def dedup_frames(frames, max_distance=DEDUP_DISTANCE, stats=None):
+    """
+    Collapses runs of near-duplicate frames into their first frame. A frame belongs to
+    the current run while its hash is within max_distance bits of the run's first frame.
+
+    Args:
+        frames (Iterator[(float, np.ndarray)]): Timestamped frames
+        max_distance (int): Most differing hash bits of a near-duplicate, -1 to keep every frame
+        stats (dict, optional): Its "frames_deduplicated" counts the frames collapsed into another
+
+    Returns:
+        Iterator[([float], np.ndarray)]: The timestamps of each run and its first frame
+    """
+    if stats is not None:
+        stats["frames_deduplicated"] = 0
+
+    run, image, run_hash = [], None, None
+    for timestamp, frame in frames:
+        frame_hash = dhash(frame) if max_distance >= 0 else None
+        if run and frame_hash is not None and bin(frame_hash ^ run_hash).count("1") <= max_distance:
+            run.append(timestamp)
+            if stats is not None:
+                stats["frames_deduplicated"] += 1
+            continue
+
+        if run:
+            yield run, image
+        run, image, run_hash = [timestamp], frame, frame_hash
+
+    if run:
+        yield run, image
+
+
+def batches(frames, batch_size):
+    """
+    Groups a stream of frames into batches.
+
+    Args:
+        frames (Iterator[(float, np.ndarray)]): Timestamped frames
+        batch_size (int): Number of frames per batch
+
+    Returns:
+        Iterator[([float], [np.ndarray])]: Timestamps and frames of each batch
+    """
+    timestamps, images = [], []
+    for timestamp, image in frames:
+        timestamps.append(timestamp)
+        images.append(image)
+        if len(images) == batch_size:
+            yield timestamps, images
+            timestamps, images = [], []
+
+    if images:
+        yield timestamps, images
+
+
+def prefetch(iterator, depth=1):
+    """
+    Runs an iterator in a background thread, keeping up to `depth` items ready,
+    so that producing the next item overlaps with consuming the current one.
+
+    Args:
+        iterator (Iterable): The items to produce
+        depth (int): How many items may be produced ahead of the consumer
+
+    Returns:
+        Iterator: The same items, in order
+    """
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+                if stopped.is_set():
+                    # Closing the source stops e.g. a running ffmpeg process
+                    if hasattr(iterator, "close"):
+                        iterator.close()
+                    return
+        except Exception as e:
+            items.put(e)
+        items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stopped.set()
+        while not items.empty():
+            items.get_nowait()
@@ -0,0 +1,217 @@
+import os
+import gzip
+import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    # Responses are compressed with gzip only
+    brotli = None
+
+# Cache-Control of successful result responses; results of a video rarely change
+RESULT_CACHE_CONTROL = os.environ.get("RESULT_CACHE_CONTROL", "public, max-age=3600")
+# Seconds and number of result responses kept in memory, so repeat requests are not computed again
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+# Smaller responses are sent uncompressed, compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+# Part of every ETag derived from a request; change it when results change without new inputs, e.g. new models
+RESULT_VERSION = os.environ.get("RESULT_VERSION", "1")
+
+
+def etag(body):
+    """
+    Content-hash validator of a response body.
+
+    Args:
+        body (bytes): The uncompressed body
+
+    Returns:
+        str: The quoted ETag, weak because the body may be sent compressed
+    """
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def matches(header, tag):
+    """
+    Checks an If-None-Match header against an ETag, comparing weakly.
+
+    Args:
+        header (str): The If-None-Match header, a comma-separated list of ETags or "*"
+        tag (str): The current ETag
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return tag.removeprefix("W/") in tags
+
+
+def encoding(accept_encoding):
+    """
+    Picks the content coding of a response: brotli if the client and server support it, else gzip.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header
+
+    Returns:
+        Optional[str]: "br", "gzip" or None
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def request_etag(key, state):
+    """
+    Validator of a response derived from its request, so it is known before the result is computed.
+
+    Args:
+        key (tuple): The path and sorted query parameters
+        state (str): Version of the cached artifacts the result is computed from
+
+    Returns:
+        str: The quoted weak ETag
+    """
+    return etag(repr((RESULT_VERSION, key, state)).encode())
+
+
+class httpCache:
+
+    """Class constructor
+    Adds HTTP caching to JSON result endpoints: ETags with 304 responses to If-None-Match,
+    Cache-Control headers, gzip or brotli compression of large bodies, and an in-memory cache
+    of recent successful responses keyed by URL, so a repeat request is answered without
+    computing the result again. Views with a version function get ETags derived from the
+    request before they run, so every worker answers a matching If-None-Match without computing
+    the result; other views get content-hash ETags.
+
+    Args:
+        cache_control (str): Cache-Control header of successful responses.
+        ttl (int): Seconds a response is kept in memory.
+        size (int): Number of responses kept in memory.
+        min_bytes (int): Smallest body that is compressed.
+
+    Returns: None
+    """
+
+    def __init__(self, cache_control=RESULT_CACHE_CONTROL, ttl=RESPONSE_CACHE_TTL, size=RESPONSE_CACHE_SIZE,
+                 min_bytes=COMPRESS_MIN_BYTES):
+        self.cache_control = cache_control
+        self.ttl = ttl
+        self.size = size
+        self.min_bytes = min_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    """Decorate a Flask view that returns (response, status). Used as @cached or @cached(version=...).
+
+    Args:
+        view (Callable): The view.
+        version (Callable[[], Optional[str]], optional): Called in the request context before the view,
+            returns the version of the cached artifacts the result depends on (e.g. when the video's
+            transcript was cached), or None while they don't exist yet.
+
+    Returns:
+        Callable: The view with HTTP caching.
+    """
+
+    def cached(self, view=None, version=None):
+        if view is None:
+            return functools.partial(self.cached, version=version)
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Parameter order doesn't change the result
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            state = version() if version else None
+            if state is not None:
+                tag = request_etag(key, state)
+                if matches(request.headers.get("If-None-Match"), tag):
+                    return Response(status=304, headers=self.__headers__(tag))
+
+            entry = self.__lookup__((key, state))
+            if entry is None:
+                response, status = view(*args, **kwargs)
+                if status != 200:
+                    return response, status
+                # The first request creates the artifacts
+                if version and state is None:
+                    state = version()
+                entry = {"body": response.get_data(), "mimetype": response.mimetype}
+                entry["etag"] = etag(entry["body"]) if state is None else request_etag(key, state)
+                self.__store__((key, state), entry)
+            return self.__respond__(entry)
+
+        return wrapper
+
+    def __lookup__(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["expires"] < time.time():
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def __store__(self, key, entry):
+        entry["expires"] = time.time() + self.ttl
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def __headers__(self, tag):
+        return {"ETag": tag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+    def __respond__(self, entry):
+        headers = self.__headers__(entry["etag"])
+        if matches(request.headers.get("If-None-Match"), entry["etag"]):
+            return Response(status=304, headers=headers)
+
+        body = entry["body"]
+        coding = encoding(request.headers.get("Accept-Encoding")) if len(body) >= self.min_bytes else None
+        if coding:
+            # Every coding is compressed once per cached response
+            if coding not in entry:
+                entry[coding] = brotli.compress(body, quality=5) if coding == "br" else gzip.compress(body, 6)
+            body = entry[coding]
+            headers["Content-Encoding"] = coding
+
+        return Response(body, status=200, mimetype=entry["mimetype"], headers=headers)
+
+    """Forget cached responses, e.g. after the data behind them changed.
+
+    Args:
+        path (str, optional): Only forget responses of this path.
+
+    Returns: None
+    """
+
+    def clear(self, path=None):
+        with self.lock:
+            for key in [key for key in self.entries if path is None or key[0][0] == path]:
+                del self.entries[key]
@@ -0,0 +1,119 @@
+import os
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How YOLO and Grounding DINO run on CPU:
+#   torch  eager PyTorch fp32
+#   onnx   YOLO as an exported ONNX Runtime graph; Grounding DINO stays eager, it does not export cleanly
+#   int8   YOLO as a dynamically quantized ONNX graph, Grounding DINO with dynamically quantized linear layers
+BACKENDS = ("torch", "onnx", "int8")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+# Where exported and quantized models are kept between restarts
+MODEL_DIR = os.environ.get("MODEL_DIR", "temp/models")
+
+
+def resolve_backend(backend, device):
+    """
+    Checks a backend and falls back to eager PyTorch on GPUs, which the optimized backends don't target.
+
+    Args:
+        backend (str): One of BACKENDS
+        device (str): "cpu" or "cuda"
+
+    Returns:
+        str: The backend to use
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend != "torch" and device != "cpu":
+        logger.warning("Inference backend needs a CPU, using torch", extra={"backend": backend, "device": device})
+        return "torch"
+    return backend
+
+
+def export_yolo(weights, imgsz, model_dir=MODEL_DIR, quantize=False):
+    """
+    Exports YOLO weights to ONNX, and optionally quantizes the graph to int8.
+    Exports are reused as long as the file exists.
+
+    Args:
+        weights (str): The PyTorch weights, e.g. "yolov8l.pt"
+        imgsz (int): Image size the graph is exported for
+        model_dir (str): Directory the graphs are kept in
+        quantize (bool): Whether to quantize the weights to int8
+
+    Returns:
+        str: Path of the ONNX graph
+    """
+    from ultralytics import YOLO
+
+    name = os.path.splitext(os.path.basename(weights))[0]
+    onnx_path = os.path.join(model_dir, f"{name}-{imgsz}.onnx")
+    int8_path = os.path.join(model_dir, f"{name}-{imgsz}-int8.onnx")
+
+    if not os.path.exists(onnx_path):
+        os.makedirs(model_dir, exist_ok=True)
+        # Dynamic axes let one graph serve every batch size
+        exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        shutil.move(exported, onnx_path)
+        logger.info("Exported YOLO to ONNX", extra={"path": onnx_path})
+
+    if not quantize:
+        return onnx_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(onnx_path, int8_path + ".part", weight_type=QuantType.QUInt8)
+        os.replace(int8_path + ".part", int8_path)
+        logger.info("Quantized YOLO to int8", extra={"path": int8_path})
+    return int8_path
+
+
+def load_yolo(weights, backend, imgsz, model_dir=MODEL_DIR):
+    """
+    Loads YOLO for a backend. ONNX graphs are run by ultralytics through ONNX Runtime,
+    so the model is called and returns results the same way on every backend.
+
+    Args:
+        weights (str): The PyTorch weights, e.g. "yolov8l.pt"
+        backend (str): One of BACKENDS
+        imgsz (int): Image size of the exported graph
+        model_dir (str): Directory the graphs are kept in
+
+    Returns:
+        ultralytics.YOLO: The model
+    """
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(weights)
+    return YOLO(export_yolo(weights, imgsz, model_dir, quantize=backend == "int8"), task="detect")
+
+
+def load_dino(name, backend, device):
+    """
+    Loads Grounding DINO for a backend.
+
+    Args:
+        name (str): The Hugging Face model name
+        backend (str): One of BACKENDS
+        device (str): "cpu" or "cuda"
+
+    Returns:
+        (AutoProcessor, AutoModelForZeroShotObjectDetection): The processor and the model
+    """
+    import torch
+    from transformers import AutoProcessor, AutoModelForZeroShotObjectDetection
+
+    processor = AutoProcessor.from_pretrained(name)
+    model = AutoModelForZeroShotObjectDetection.from_pretrained(name).to(device).eval()
+
+    if backend == "int8":
+        # Most of the compute of the text and vision transformers is in linear layers
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "onnx":
+        logger.info("Grounding DINO has no ONNX export, running it with torch")
+    return processor, model
@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+JOB_DB = "temp/jobs.db"
+
+# Number of jobs that run at the same time, and how many may wait for a worker
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_QUEUE_LIMIT = int(os.environ.get("JOB_QUEUE_LIMIT", 32))
+# Number of seconds a finished job stays available
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 3600))
+# A running job's process refreshes it every JOB_HEARTBEAT seconds. A job that wasn't refreshed
+# for JOB_STALE_AFTER seconds lost its process, e.g. to a restart, and is reported as failed.
+JOB_HEARTBEAT = int(os.environ.get("JOB_HEARTBEAT", 10))
+JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", 60))
+# A running job's progress is written at most every JOB_PROGRESS_INTERVAL seconds
+JOB_PROGRESS_INTERVAL = float(os.environ.get("JOB_PROGRESS_INTERVAL", 2))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Columns stored as JSON
+JSON_FIELDS = ("progress", "results", "response")
+
+
+class jobManager:
+
+    """Class constructor
+    Runs long tasks on a bounded pool of worker threads and keeps their status,
+    progress and results for polling. Jobs are stored in a SQLite database,
+    so any worker process or instance sharing it can answer a poll, and finished jobs
+    survive a restart.
+
+    Args:
+        workers (int): Number of jobs that run at the same time.
+        queue_limit (int): Number of unfinished jobs accepted before new ones are refused.
+        retention (int): Number of seconds a finished job stays available.
+        db_path (str): Path to the SQLite job database.
+
+    Returns: None
+    """
+
+    def __init__(self, workers=JOB_WORKERS, queue_limit=JOB_QUEUE_LIMIT, retention=JOB_RETENTION, db_path=JOB_DB):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.queue_limit = queue_limit
+        self.retention = retention
+        self.db_path = db_path
+        # IDs of the unfinished jobs of this process, kept alive by the heartbeat
+        self.running = set()
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self.__connect__() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    results TEXT,
+                    response TEXT,
+                    status_code INTEGER,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    finished REAL,
+                    heartbeat REAL NOT NULL
+                )"""
+            )
+
+        threading.Thread(target=self.__heartbeat__, name="job-heartbeat", daemon=True).start()
+
+    @contextmanager
+    def __connect__(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    """Submit a task.
+
+    Args:
+        task (str): Name of the task, reported back to the client.
+        func (Callable[[Callable], (dict, int)]): Runs the task. It is called with a progress
+            callback progress(frames_done, frames_total, partial_results) and returns the
+            response and status code of the finished task.
+
+    Returns:
+        Optional[str]: The job ID, or None if too many jobs are waiting.
+    """
+
+    def submit(self, task, func):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.__connect__() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.__sweep__(conn, now)
+                unfinished = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                ).fetchone()[0]
+                if unfinished >= self.queue_limit:
+                    conn.execute("COMMIT")
+                    return None
+
+                conn.execute(
+                    "INSERT INTO jobs (job_id, task, status, progress, created, heartbeat) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, task, QUEUED, json.dumps({"frames_done": 0, "frames_total": None}), now, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        with self.lock:
+            self.running.add(job_id)
+        self.executor.submit(self.__run__, job_id, func)
+        return job_id
+
+    def __run__(self, job_id, func):
+        self.__update__(job_id, status=RUNNING)
+
+        last_write = None
+
+        def progress(frames_done, frames_total=None, partial=None):
+            # Partial results are not stored, writing them after every batch grows with the video.
+            # The results are written once, when the job finishes.
+            nonlocal last_write
+            now = time.monotonic()
+            if last_write is not None and frames_total is None and now - last_write < JOB_PROGRESS_INTERVAL:
+                return
+            last_write = now
+            self.__update__(job_id, progress={"frames_done": frames_done, "frames_total": frames_total})
+
+        try:
+            response, status_code = func(progress)
+            self.__update__(
+                job_id,
+                status=DONE,
+                response=response,
+                status_code=status_code,
+                results=response.get("results"),
+                finished=time.time(),
+            )
+        except Exception as e:
+            self.__update__(job_id, status=FAILED, error=str(e), status_code=500, finished=time.time())
+        finally:
+            with self.lock:
+                self.running.discard(job_id)
+
+    def __update__(self, job_id, **fields):
+        fields["heartbeat"] = time.time()
+        values = [json.dumps(value) if name in JSON_FIELDS else value for name, value in fields.items()]
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.__connect__() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*values, job_id))
+
+    def __heartbeat__(self):
+        # Long steps report no progress, the heartbeat tells pollers the job's process is still alive
+        while True:
+            time.sleep(JOB_HEARTBEAT)
+            with self.lock:
+                job_ids = list(self.running)
+            if not job_ids:
+                continue
+            try:
+                with self.__connect__() as conn:
+                    conn.execute(
+                        f"UPDATE jobs SET heartbeat = ? WHERE job_id IN ({', '.join('?' * len(job_ids))})",
+                        (time.time(), *job_ids),
+                    )
+            except sqlite3.Error:
+                # Retried on the next beat, well before the job counts as stale
+                pass
+
+    """Get the current state of a job.
+
+    Args:
+        job_id (str): The job ID returned by submit.
+
+    Returns:
+        Optional[dict]: A snapshot of the job, or None if it does not exist or has expired.
+    """
+
+    def get(self, job_id):
+        now = time.time()
+        with self.__connect__() as conn:
+            self.__fail_stale__(conn, now)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ? AND (finished IS NULL OR finished >= ?)",
+                (job_id, now - self.retention),
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = {name: row[name] for name in row.keys() if name != "heartbeat"}
+        for name in JSON_FIELDS:
+            if job[name] is not None:
+                job[name] = json.loads(job[name])
+        return job
+
+    def __fail_stale__(self, conn, now):
+        # The process running these jobs is gone; failing them frees their place in the queue
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, status_code = 500, finished = ? "
+            "WHERE status IN (?, ?) AND heartbeat < ?",
+            (FAILED, "The job was interrupted.", now, QUEUED, RUNNING, now - JOB_STALE_AFTER),
+        )
+
+    def __sweep__(self, conn, now):
+        # Called inside a transaction
+        conn.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (now - self.retention,))
+        self.__fail_stale__(conn, now)
@@ -0,0 +1,52 @@
+import os
+import json
+import logging
+import time
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Attributes every log record has; anything else was passed with extra= and is logged as a field
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class jsonFormatter(logging.Formatter):
+
+    """Class constructor
+    Formats log records as one JSON object per line, with the fields passed
+    through extra= next to the message.
+
+    Args: None
+
+    Returns: None
+    """
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL):
+    """
+    Sends the logs of the application to stderr as JSON lines.
+
+    Args:
+        level (str): The lowest level logged, e.g. "DEBUG" or "INFO"
+
+    Returns: None
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(jsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
@@ -0,0 +1,223 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+import requests
+import yt_dlp
+from requests.adapters import HTTPAdapter
+from .concurrencyUtils import singleFlight
+from .metricsUtils import DOWNLOAD_SECONDS, observe
+
+logger = logging.getLogger(__name__)
+
+COOKIES_FILE = "cookies.txt"
+
+# Seconds video metadata is kept when its URLs don't say when they expire, and the number of videos kept
+METADATA_TTL = int(os.environ.get("METADATA_TTL", 3600))
+METADATA_CACHE_SIZE = int(os.environ.get("METADATA_CACHE_SIZE", 256))
+# Metadata is dropped this many seconds before its stream URLs expire, so downloads can finish in time
+EXPIRY_MARGIN = 300
+# Connections kept open per host by the HTTP session
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 16))
+
+EXPIRE_PATTERN = re.compile(r"/expire/(\d+)")
+
+
+def video_key(url):
+    """
+    Identifies a video in the cache: its YouTube ID, or the URL itself for other sites.
+
+    Args:
+        url (str): The video URL
+
+    Returns:
+        str: The key
+    """
+    match = re.search(r"(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})", url or "")
+    return match.group(1) if match else url
+
+
+def url_expiry(url):
+    """
+    Reads when a googlevideo URL expires, from its expire parameter or path segment.
+
+    Args:
+        url (str): A stream or caption URL
+
+    Returns:
+        Optional[int]: Unix time of the expiry, None if the URL doesn't say
+    """
+    expire = parse_qs(urlparse(url).query).get("expire")
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+    match = EXPIRE_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
+
+def info_expiry(info, ttl=METADATA_TTL, margin=EXPIRY_MARGIN):
+    """
+    Finds until when the URLs in video metadata stay valid.
+
+    Args:
+        info (dict): Metadata from extract_info
+        ttl (int): Lifetime of metadata whose URLs don't expire
+        margin (int): Seconds subtracted from the earliest expiry
+
+    Returns:
+        float: Unix time until which the metadata can be used
+    """
+    urls = [fmt.get("url") for fmt in info.get("formats") or []]
+    for tracks in (info.get("subtitles") or {}, info.get("automatic_captions") or {}):
+        urls += [track.get("url") for lang_tracks in tracks.values() for track in lang_tracks]
+
+    expiries = [expiry for expiry in map(url_expiry, filter(None, urls)) if expiry]
+    expires = time.time() + ttl
+    if expiries:
+        expires = min(expires, min(expiries) - margin)
+    return expires
+
+
+class metadataCache:
+
+    """Class constructor
+    Resolves each video with yt-dlp once and shares its metadata (formats, caption tracks,
+    title, duration) between transcript fetching, video download and audio download,
+    until the stream URLs inside it expire.
+
+    Args:
+        ttl (int): Seconds metadata is kept when its URLs don't expire.
+        size (int): Number of videos kept.
+        cookiefile (str): Cookies passed to yt-dlp.
+
+    Returns: None
+    """
+
+    def __init__(self, ttl=METADATA_TTL, size=METADATA_CACHE_SIZE, cookiefile=COOKIES_FILE):
+        self.ttl = ttl
+        self.size = size
+        self.cookiefile = cookiefile
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.flights = singleFlight()
+        self.hits = 0
+        self.misses = 0
+
+        # Keep-alive connections, reused across caption downloads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    """Get the metadata of a video, resolving it only if it is not cached or has expired.
+
+    Args:
+        url (str): The video URL.
+
+    Returns:
+        dict: The sanitized result of extract_info.
+    """
+
+    def get(self, url):
+        key = video_key(url)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Concurrent first requests for a video share one resolution
+        return self.flights.do(key, lambda: self.__resolve__(url, key))
+
+    def __resolve__(self, url, key):
+        ydl_opts = {"cookiefile": self.cookiefile, "quiet": True, "skip_download": True}
+        with observe(DOWNLOAD_SECONDS, kind="metadata"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+        with self.lock:
+            self.entries[key] = (info, info_expiry(info, self.ttl))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        logger.info("Video metadata resolved", extra={"video": key, "title": info.get("title")})
+        return info
+
+    """Drop the metadata of a video, e.g. after its stream URLs were rejected.
+
+    Args:
+        url (str): The video URL.
+
+    Returns: None
+    """
+
+    def invalidate(self, url):
+        with self.lock:
+            self.entries.pop(video_key(url), None)
+
+    """Run yt-dlp's format selection, and optionally the download, on the cached metadata.
+    If the cached stream URLs turn out to be stale, the video is resolved again once.
+
+    Args:
+        url (str): The video URL.
+        ydl_opts (dict): yt-dlp options, e.g. format and outtmpl.
+        download (bool): Whether to download the selected formats.
+
+    Returns:
+        dict: The processed metadata; with download, requested_downloads holds the file paths.
+    """
+
+    def process(self, url, ydl_opts, download=True):
+        options = {"cookiefile": self.cookiefile, **ydl_opts}
+        for attempt in range(2):
+            info = self.get(url)
+            try:
+                with yt_dlp.YoutubeDL(options) as ydl:
+                    # Sanitizing copies the cached metadata, which processing would change
+                    return ydl.process_ie_result(ydl.sanitize_info(info), download=download)
+            except yt_dlp.utils.DownloadError:
+                if attempt:
+                    raise
+                logger.warning("Cached video metadata failed, resolving again", extra={"video": video_key(url)})
+                self.invalidate(url)
+
+    """Find the URL of a video's WebVTT captions, preferring uploaded over automatic ones.
+
+    Args:
+        url (str): The video URL.
+        lang (str): Language code the caption language starts with.
+
+    Returns:
+        Optional[str]: The URL of the captions, None if there are none.
+    """
+
+    def captions(self, url, lang="en"):
+        info = self.get(url)
+        for tracks in (info.get("subtitles"), info.get("automatic_captions")):
+            for track_lang, subs in (tracks or {}).items():
+                if track_lang.startswith(lang):
+                    for sub in subs:
+                        if sub.get("ext") == "vtt":
+                            return sub["url"]
+        return None
+
+    """Download a text resource over the pooled session.
+
+    Args:
+        url (str): The URL.
+        timeout (float): Seconds to wait for the server.
+
+    Returns:
+        requests.Response: The response.
+    """
+
+    def fetch(self, url, timeout=30):
+        with observe(DOWNLOAD_SECONDS, kind="transcript"):
+            return self.session.get(url, timeout=timeout)
+
+    def status(self):
+        with self.lock:
+            return {"videos": len(self.entries), "hits": self.hits, "misses": self.misses}
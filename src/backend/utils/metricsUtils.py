@@ -0,0 +1,127 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# Buckets for durations from milliseconds to the length of a long video scan
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+FRAME_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RATIO_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 4)
+
+# The metrics served by /metrics. Not prometheus_client's global registry, so importing this module
+# a second time under another name (e.g. utils.metricsUtils and backend.utils.metricsUtils) doesn't fail.
+REGISTRY = CollectorRegistry()
+
+DOWNLOAD_SECONDS = Histogram(
+    "vidify_download_seconds", "Time to download or resolve a video, its audio or its transcript",
+    ["kind"], buckets=SECONDS_BUCKETS, registry=REGISTRY,
+)
+FRAME_EXTRACTION_SECONDS = Histogram(
+    "vidify_frame_extraction_seconds", "Time spent decoding and selecting the frames of a video",
+    ["strategy"], buckets=SECONDS_BUCKETS, registry=REGISTRY,
+)
+FRAMES_SELECTED = Histogram(
+    "vidify_frames_selected", "Frames selected from a video", ["strategy"], buckets=FRAME_BUCKETS,
+    registry=REGISTRY,
+)
+INFERENCE_SECONDS = Histogram(
+    "vidify_inference_seconds_per_frame", "Model inference time per frame", ["model"], buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+WHISPER_REAL_TIME_FACTOR = Histogram(
+    "vidify_whisper_real_time_factor", "Transcription time divided by the length of the audio",
+    buckets=RATIO_BUCKETS, registry=REGISTRY,
+)
+TRANSCRIPT_PARSE_SECONDS = Histogram(
+    "vidify_transcript_parse_seconds", "Time to parse and index a transcript file", buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+REQUEST_SECONDS = Histogram(
+    "vidify_request_seconds", "Request latency; streaming responses are measured to their first byte",
+    ["endpoint", "method", "status"], buckets=SECONDS_BUCKETS, registry=REGISTRY,
+)
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """
+    Observes the duration of a block in a histogram.
+
+    Args:
+        histogram (Histogram): The histogram
+        **labels: Its label values
+
+    Returns:
+        None
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+def observe_inference(model, seconds, frames):
+    """
+    Records the per-frame latency of a batched model call.
+
+    Args:
+        model (str): Name of the model
+        seconds (float): Duration of the call
+        frames (int): Number of frames in the batch
+
+    Returns:
+        None
+    """
+    histogram = INFERENCE_SECONDS.labels(model=model)
+    for _ in range(frames):
+        histogram.observe(seconds / frames)
+
+
+def timed_iter(iterator, histogram, **labels):
+    """
+    Measures the time an iterator spends producing its items, without the time its consumer
+    spends between items, and observes the total when it is exhausted or closed.
+
+    Args:
+        iterator (Iterator): The items
+        histogram (Histogram): The histogram
+        **labels: Its label values
+
+    Returns:
+        Iterator: The same items
+    """
+    busy = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                busy += time.perf_counter() - start
+                return
+            busy += time.perf_counter() - start
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+        (histogram.labels(**labels) if labels else histogram).observe(busy)
+
+
+def render():
+    """
+    Renders every metric in the Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set,
+    the metrics of all worker processes are combined.
+
+    Args: None
+
+    Returns:
+        (bytes, str): The metrics and their content type
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,322 @@
+import os
+import queue
+import logging
+import secrets
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+# Unix socket of the node's model server; when set, HTTP workers send inference there instead of loading models
+MODEL_SERVER = os.environ.get("VIDIFY_MODEL_SERVER", "")
+# Without a configured key the server generates one and shares it through "<socket>.key", readable only by its user
+MODEL_SERVER_KEY = os.environ.get("VIDIFY_MODEL_SERVER_KEY", "").encode()
+# Most frames in one shared forward pass, and how long the first request waits for others to join it
+MODEL_SERVER_BATCH = int(os.environ.get("MODEL_SERVER_BATCH", 32))
+MODEL_SERVER_WAIT = float(os.environ.get("MODEL_SERVER_WAIT", 0.01))
+
+
+def load_key(address, create=False):
+    """
+    Returns the key of the model server at address: VIDIFY_MODEL_SERVER_KEY when set, otherwise
+    the key in the file next to the socket.
+
+    Args:
+        address (str): Path of the server's Unix socket
+        create (bool): Generate a new key file, as the server does when it starts
+
+    Returns:
+        bytes: The key
+    """
+    if MODEL_SERVER_KEY:
+        return MODEL_SERVER_KEY
+
+    path = f"{address}.key"
+    if create:
+        key = secrets.token_hex(32).encode()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(key)
+        os.replace(temp_path, path)
+        return key
+
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class batcher:
+
+    """Class constructor
+    Merges concurrent requests into shared calls of a batched function. Requests with
+    different keys (e.g. different Grounding DINO prompts) are never merged.
+
+    Args:
+        func (Callable[[list, ...], list]): Called as func(items, *key), returns one result per item.
+        max_batch (int): Most items in one call.
+        max_wait (float): Seconds the first request waits for others to join its call.
+
+    Returns: None
+    """
+
+    def __init__(self, func, max_batch=MODEL_SERVER_BATCH, max_wait=MODEL_SERVER_WAIT):
+        self.func = func
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        threading.Thread(target=self.__loop__, daemon=True).start()
+
+    """Run func on items, together with the items of concurrent requests.
+
+    Args:
+        items (list): The items, e.g. frames.
+        key (tuple): Further arguments of func; only requests with equal keys share a call.
+
+    Returns:
+        list: The results for the items.
+    """
+
+    def submit(self, items, key=()):
+        request = {"items": items, "key": key, "done": threading.Event(), "result": None, "error": None}
+        self.requests.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def __loop__(self):
+        while True:
+            pending = [self.requests.get()]
+            size = len(pending[0]["items"])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                size += len(request["items"])
+
+            groups = {}
+            for request in pending:
+                groups.setdefault(request["key"], []).append(request)
+            for key, group in groups.items():
+                self.__run__(key, group)
+
+    def __run__(self, key, group):
+        items = [item for request in group for item in request["items"]]
+        try:
+            results = self.func(items, *key)
+            for request in group:
+                request["result"], results = results[:len(request["items"])], results[len(request["items"]):]
+        except Exception as e:
+            for request in group:
+                request["error"] = e
+        for request in group:
+            request["done"].set()
+
+
+class modelServer:
+
+    """Class constructor
+    Serves the models of a node to all of its HTTP workers over a Unix socket, so the
+    models are loaded once per node instead of once per worker.
+
+    Args:
+        handlers (dict): Batched operations {name: func(items, *args)}, e.g. "detect" and "ground".
+        calls (dict): Unbatched operations {name: func(*args)}, each run one call at a time, e.g. "transcribe".
+        address (str): Path of the Unix socket.
+        authkey (bytes): Key clients authenticate with; by default see load_key.
+
+    Returns: None
+    """
+
+    def __init__(self, handlers, calls=None, address=MODEL_SERVER, authkey=None):
+        self.batchers = {name: batcher(func) for name, func in handlers.items()}
+        self.calls = calls or {}
+        self.call_locks = {name: threading.Lock() for name in self.calls}
+        self.address = address
+        self.authkey = authkey
+        self.listener = None
+
+    """Accept connections until the server is closed.
+
+    Args: None
+
+    Returns: None
+    """
+
+    def serve(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        if self.authkey is None:
+            self.authkey = load_key(self.address, create=True)
+        listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        # Only the server's user may connect
+        os.chmod(self.address, 0o600)
+        self.listener = listener
+        logger.info("Model server listening", extra={"address": self.address})
+
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # The listener was closed
+                return
+            except Exception:
+                logger.exception("Rejected a model server connection")
+                continue
+            threading.Thread(target=self.__handle__, args=(connection,), daemon=True).start()
+
+    def close(self):
+        if self.listener:
+            self.listener.close()
+
+    def __handle__(self, connection):
+        with connection:
+            while True:
+                try:
+                    operation, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    if operation in self.batchers:
+                        items, *key = args
+                        result = self.batchers[operation].submit(items, tuple(key))
+                    elif operation in self.calls:
+                        with self.call_locks[operation]:
+                            result = self.calls[operation](*args)
+                    else:
+                        raise ValueError(f"Unknown operation: {operation}")
+                    response = ("ok", result)
+                except Exception as e:
+                    logger.exception("Model server operation failed", extra={"operation": operation})
+                    response = ("error", f"{type(e).__name__}: {e}")
+
+                try:
+                    connection.send(response)
+                except (EOFError, OSError):
+                    return
+
+
+class modelClient:
+
+    """Class constructor
+    Sends inference to the node's model server. Every thread keeps its own connection,
+    so the requests of concurrent jobs can be batched together by the server.
+
+    Args:
+        address (str): Path of the server's Unix socket.
+        authkey (bytes): Key to authenticate with; by default see load_key.
+
+    Returns: None
+    """
+
+    def __init__(self, address=MODEL_SERVER, authkey=None):
+        self.address = address
+        self.authkey = authkey
+        self.local = threading.local()
+
+    """Run an operation on the server.
+
+    Args:
+        operation (str): Name of the operation, e.g. "detect".
+        *args: Its arguments; for batched operations the items come first.
+
+    Returns:
+        Any: The result of the operation.
+    """
+
+    def call(self, operation, *args):
+        # A broken connection, e.g. after a server restart, is reopened once
+        for attempt in range(2):
+            connection = getattr(self.local, "connection", None)
+            try:
+                if connection is None:
+                    # Read on every connect, the key changes when the server restarts
+                    authkey = self.authkey or load_key(self.address)
+                    connection = Client(self.address, family="AF_UNIX", authkey=authkey)
+                    self.local.connection = connection
+                connection.send((operation, args))
+                status, value = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                self.local.connection = None
+                if attempt:
+                    raise ConnectionError(f"Model server at {self.address} is not available: {e}")
+
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+
+class remoteEngine:
+
+    """Class constructor
+    Stands in for whisperEngine in HTTP workers: audio files are transcribed by the model server,
+    which reads them from the shared disk of the node.
+
+    Args:
+        client (modelClient): Client of the model server.
+
+    Returns: None
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def transcribe(self, audio_file, model=None):
+        return self.client.call("transcribe", os.path.abspath(audio_file))
+
+
+def main():
+    """
+    Runs the model server of a node: YOLO, Grounding DINO and Whisper, loaded once
+    and shared by every HTTP worker that sets VIDIFY_MODEL_SERVER to the same socket.
+    Run from src/backend as `python -m utils.modelServer`.
+
+    Args: None
+
+    Returns: None
+    """
+    from .logUtils import configure_logging
+    from .modelUtils import lazyModel, registry, warm_up
+    from .videoUtils import videoUtils
+    from .whisperEngine import whisperEngine, WHISPER_MODEL_NAME
+
+    configure_logging()
+    address = MODEL_SERVER or "/tmp/vidify-models.sock"
+    # The server runs the models itself
+    video_utils = videoUtils(model_server="")
+    engine = whisperEngine()
+
+    def load_whisper():
+        import whisper
+
+        return whisper.load_model(WHISPER_MODEL_NAME, device=video_utils.device)
+
+    whisper_model = lazyModel("whisper", load_whisper)
+    # CLIP and the sentence model stay with the HTTP workers, which build the indexes
+    warm_up(["yolo", "dino", "whisper"])
+
+    server = modelServer(
+        handlers={
+            "detect": video_utils.__detect_batch__,
+            "ground": lambda images, labels, *args: video_utils.__ground_batch__(images, list(labels), *args),
+        },
+        calls={
+            "transcribe": lambda audio_file: engine.transcribe(audio_file, whisper_model),
+            "status": lambda: {name: model.status() for name, model in registry.items()},
+        },
+        address=address,
+    )
+    server.serve()
+
+
+if __name__ == "__main__":
+    main()
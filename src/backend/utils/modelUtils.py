@@ -0,0 +1,259 @@
+import gc
+import os
+import sys
+import logging
+import threading
+import time
+from itertools import chain
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# All lazily loaded models of the process, by name
+registry = {}
+
+# Most memory the loaded models may take together, 0 for no limit. Beyond it the least
+# recently used models are unloaded, and loaded again when they are next needed.
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 0))
+memory_budget = int(MODEL_MEMORY_BUDGET_MB * 2 ** 20)
+budget_lock = threading.Lock()
+
+
+class lazyModel:
+
+    """Class constructor
+    A model that is only loaded when it is first used. Loading is thread-safe: concurrent
+    first users wait for a single load instead of each loading their own copy.
+    Under a memory budget the model may be unloaded while idle and is then loaded again on its next use.
+
+    Args:
+        name (str): Name the model is reported under.
+        loader (Callable[[], Any]): Function that loads and returns the model.
+        unloader (Callable[[Any], None], optional): Releases what dropping the reference doesn't, e.g. processes.
+
+    Returns: None
+    """
+
+    def __init__(self, name, loader, unloader=None):
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.model = None
+        self.load_seconds = None
+        self.size = 0
+        self.last_used = None
+        self.loads = 0
+        self.unloads = 0
+        self.lock = threading.Lock()
+        registry[name] = self
+
+    """Get the model, loading it on first use.
+
+    Args: None
+
+    Returns:
+        Any: The loaded model.
+    """
+
+    def get(self):
+        self.last_used = time.monotonic()
+        model = self.model
+        if model is not None:
+            return model
+
+        with self.lock:
+            if self.model is None:
+                # The size of an earlier load tells how much room to make beforehand
+                make_room(self.size, keep=self)
+                start = time.perf_counter()
+                before = resident_bytes()
+                model = self.loader()
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.size = model_size(model) or max(0, resident_bytes() - before)
+                self.model = model
+                self.loads += 1
+                make_room(0, keep=self)
+            return self.model
+
+    """Unload the model. Callers still holding it keep it alive until they are done.
+
+    Args: None
+
+    Returns:
+        bool: True if the model was loaded.
+    """
+
+    def unload(self):
+        model = self.model
+        if model is None:
+            return False
+        self.model = None
+        self.unloads += 1
+        if self.unloader:
+            self.unloader(model)
+        gc.collect()
+        if "torch" in sys.modules and sys.modules["torch"].cuda.is_available():
+            sys.modules["torch"].cuda.empty_cache()
+        logger.info("Model unloaded", extra={"model": self.name, "size_mb": round(self.size / 2 ** 20, 1)})
+        return True
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def status(self):
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "size_mb": round(self.size / 2 ** 20, 1),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.last_used else None,
+            "loads": self.loads,
+            "unloads": self.unloads,
+        }
+
+
+def model_size(model):
+    """
+    Estimates the memory of a model from its tensors.
+
+    Args:
+        model (Any): A torch module, an object wrapping one in .model (e.g. ultralytics YOLO),
+            an array, or a tuple of these
+
+    Returns:
+        int: Size in bytes, 0 if it cannot be estimated
+    """
+    if isinstance(model, (tuple, list)):
+        return sum(model_size(part) for part in model)
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        try:
+            return sum(t.numel() * t.element_size() for t in chain(model.parameters(), model.buffers()))
+        except TypeError:
+            pass
+    if hasattr(model, "nbytes"):
+        return int(model.nbytes)
+    inner = getattr(model, "model", None)
+    if inner is not None and inner is not model:
+        return model_size(inner)
+    return 0
+
+
+def resident_bytes(pid="self"):
+    """
+    Resident memory of a process, used to size models whose tensors can't be counted.
+
+    Args:
+        pid (int, optional): The process, this one by default
+
+    Returns:
+        int: Size in bytes, 0 where /proc is not available
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def set_memory_budget(megabytes):
+    """
+    Changes the memory budget of the models.
+
+    Args:
+        megabytes (float): The budget, 0 for no limit
+
+    Returns: None
+    """
+    global memory_budget
+    memory_budget = int(megabytes * 2 ** 20)
+    make_room(0)
+
+
+def make_room(needed, keep=None):
+    """
+    Unloads the least recently used models until the loaded ones and `needed` more bytes fit the budget.
+
+    Args:
+        needed (int): Bytes about to be loaded
+        keep (lazyModel, optional): A model that must stay loaded
+
+    Returns: None
+    """
+    with budget_lock:
+        if memory_budget <= 0:
+            return
+
+        resident = sum(model.size for model in registry.values() if model.loaded)
+        idle = sorted(
+            (model for model in registry.values() if model.loaded and model is not keep),
+            key=lambda model: model.last_used or 0,
+        )
+        for model in idle:
+            if resident + needed <= memory_budget:
+                break
+            resident -= model.size
+            model.unload()
+
+        if resident + needed > memory_budget:
+            logger.warning(
+                "Models exceed the memory budget",
+                extra={"resident_mb": round((resident + needed) / 2 ** 20, 1), "budget_mb": memory_budget / 2 ** 20},
+            )
+
+
+def memory_status():
+    """
+    Reports the memory budget and how much of it the loaded models use.
+
+    Args: None
+
+    Returns:
+        dict: {"budget_mb", "resident_mb"}, with a budget of None if there is no limit
+    """
+    resident = sum(model.size for model in registry.values() if model.loaded)
+    return {
+        "budget_mb": round(memory_budget / 2 ** 20, 1) if memory_budget > 0 else None,
+        "resident_mb": round(resident / 2 ** 20, 1),
+    }
+
+
+def warm_up(names):
+    """
+    Loads models in a background thread, so that a worker can serve requests
+    that don't need them while they are loading.
+
+    Args:
+        names ([str]): Names of the models to load, or ["all"]
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    if "all" in names:
+        names = list(registry)
+
+    def load():
+        for name in names:
+            if name in registry:
+                registry[name].get()
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    return thread
+
+
+@contextmanager
+def timed(timings, phase):
+    """
+    Records how long a block of code takes.
+
+    Args:
+        timings (dict): Dictionary the duration in seconds is stored in
+        phase (str): Key the duration is stored under
+
+    Returns: None
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - start, 3)
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import numpy as np
+from .modelUtils import lazyModel
+from .metricsUtils import observe_inference
+
+INDEX_DIR = "temp/cache/transcripts"
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Number of consecutive captions embedded together, so short caption lines keep their context
+WINDOW_CAPTIONS = 3
+# Windows with a lower cosine similarity to the query are never returned
+SEMANTIC_MIN_SCORE = float(os.environ.get("SEMANTIC_MIN_SCORE", 0.35))
+# Number of windows embedded in one forward pass
+SEMANTIC_BATCH_SIZE = int(os.environ.get("SEMANTIC_BATCH_SIZE", 32))
+# Attempts to read an index that another worker is replacing at that moment
+READ_ATTEMPTS = 3
+
+
+class semanticIndex:
+
+    """Class constructor
+    A per-transcript embedding index: every window of WINDOW_CAPTIONS consecutive captions is
+    embedded once with a small sentence-embedding model, and queries are ranked by cosine
+    similarity against the stored matrix. Each transcript is stored as a directory under
+    index_dir/<name> holding a float32 embeddings.npy and the windows' timestamps and texts.
+
+    Args:
+        device (str): Device the embedding model runs on.
+        index_dir (str): Directory in which the indexes are stored.
+        batch_size (int): Number of windows embedded in one forward pass.
+
+    Returns: None
+    """
+
+    def __init__(self, device="cpu", index_dir=INDEX_DIR, batch_size=SEMANTIC_BATCH_SIZE):
+        self.device = device
+        self.index_dir = index_dir
+        self.batch_size = batch_size
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self.model = lazyModel("embedding", self.__load_model__)
+
+    def __load_model__(self):
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(EMBEDDING_MODEL, device=self.device)
+
+    """Embed texts.
+
+    Args:
+        texts ([str]): The texts.
+
+    Returns:
+        np.ndarray: float32 matrix with one L2-normalized row per text.
+    """
+
+    def __embed__(self, texts):
+        start = time.perf_counter()
+        embeddings = self.model.get().encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        observe_inference("embedding", time.perf_counter() - start, len(texts))
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def __transcript_dir__(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def __read__(self, name, embeddings=True):
+        # A rebuild swaps the directory with two renames, a read in between is retried
+        path = self.__transcript_dir__(name)
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                with open(os.path.join(path, "windows.json"), encoding="utf-8") as file:
+                    windows = json.load(file)
+                if not embeddings:
+                    return windows, None
+                return windows, np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.01)
+
+    """Check whether a transcript has been embedded.
+
+    Args:
+        name (str): Name of the transcript, e.g. its video ID.
+        version (float): Modification time of the transcript file; older indexes don't count.
+
+    Returns:
+        bool: True if an up-to-date index exists.
+    """
+
+    def has(self, name, version):
+        try:
+            meta, _ = self.__read__(name, embeddings=False)
+        except (OSError, ValueError):
+            return False
+        return meta["version"] == version and meta["model"] == EMBEDDING_MODEL
+
+    """Embed and store the caption windows of a transcript.
+
+    Args:
+        name (str): Name of the transcript, e.g. its video ID.
+        captions ([(str, str)]): (start timestamp, text) of each caption, in order.
+        version (float): Modification time of the transcript file.
+
+    Returns:
+        int: Number of embedded windows.
+    """
+
+    def build(self, name, captions, version):
+        captions = [(start, text.strip()) for start, text in captions if text.strip()]
+        # One window starts at every caption that has a full window after it
+        count = max(1, len(captions) - WINDOW_CAPTIONS + 1) if captions else 0
+        timestamps = [start for start, _ in captions[:count]]
+        texts = [" ".join(text for _, text in captions[i:i + WINDOW_CAPTIONS]) for i in range(count)]
+
+        embeddings = np.zeros((0, 0), np.float32)
+        if texts:
+            embeddings = np.concatenate([
+                self.__embed__(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)
+            ])
+
+        # Written to a temporary directory and renamed, so readers never see a partial index
+        temp_dir = tempfile.mkdtemp(dir=self.index_dir)
+        np.save(os.path.join(temp_dir, "embeddings.npy"), embeddings)
+        with open(os.path.join(temp_dir, "windows.json"), "w", encoding="utf-8") as file:
+            json.dump({"version": version, "model": EMBEDDING_MODEL, "timestamps": timestamps, "texts": texts}, file)
+
+        # The old index is renamed aside and deleted after the swap, so a concurrent search
+        # finds either index, not a directory that is being deleted
+        target = self.__transcript_dir__(name)
+        aside = f"{target}.{uuid.uuid4().hex}.old"
+        try:
+            os.replace(target, aside)
+        except FileNotFoundError:
+            aside = None
+        try:
+            os.replace(temp_dir, target)
+        except OSError:
+            # Another worker finished indexing the same transcript first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if aside:
+            shutil.rmtree(aside, ignore_errors=True)
+        return len(texts)
+
+    """Rank the caption windows of a transcript against a query.
+    Overlapping windows are not returned twice: of windows sharing captions, only the best one is kept.
+
+    Args:
+        name (str): Name of the transcript, e.g. its video ID.
+        query (str): What the user is looking for, in their own words.
+        top_k (int): Number of windows returned.
+        min_score (float): Windows with a lower cosine similarity are never returned.
+
+    Returns:
+        [(str, str, float)]: (start timestamp, window text, score) of the best windows, best first.
+    """
+
+    def query(self, name, query, top_k=10, min_score=SEMANTIC_MIN_SCORE):
+        windows, embeddings = self.__read__(name)
+        if not len(windows["texts"]) or top_k <= 0:
+            return []
+
+        # One matrix-vector product scores every window
+        scores = np.asarray(embeddings) @ self.__embed__([query])[0]
+
+        # Enough candidates to fill top_k after dropping overlapping windows
+        k = min(len(scores), top_k * WINDOW_CAPTIONS)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        results, taken = [], []
+        for i in candidates:
+            if scores[i] < min_score or len(results) == top_k:
+                break
+            if any(abs(i - j) < WINDOW_CAPTIONS for j in taken):
+                continue
+            taken.append(i)
+            results.append((windows["timestamps"][i], windows["texts"][i], round(float(scores[i]), 4)))
+        return results
@@ -0,0 +1,221 @@
+import os
+import logging
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from .binaryTranscript import BINARY_SUFFIX, convert_vtt, release
+from .semanticIndex import INDEX_DIR as SEMANTIC_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "temp/subtitles"
+CACHE_DB = "temp/transcript_cache.db"
+
+# Size bound for all cached transcripts together and the maximum age of an entry.
+CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_TTL = int(os.environ.get("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600))
+
+# Where a cached transcript came from.
+SOURCE_YOUTUBE = "youtube"
+SOURCE_WHISPER = "whisper"
+
+
+class transcriptCache:
+
+    """Class constructor
+    Transcripts are stored as temp/subtitles/<video_id>.vtt and .vtb. Their metadata lives in a SQLite
+    database, so several worker processes can share one cache.
+
+    Args:
+        cache_dir (str): Directory in which the transcript files are kept.
+        db_path (str): Path to the SQLite metadata database.
+        max_bytes (int): Total size of cached transcripts before the least recently used are evicted.
+        ttl (int): Number of seconds after which an entry expires.
+        semantic_dir (str): Directory of the semantic indexes, which are dropped with their transcript.
+
+    Returns: None
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, db_path=CACHE_DB, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL,
+                 semantic_dir=SEMANTIC_DIR):
+        self.cache_dir = cache_dir
+        self.semantic_dir = semantic_dir
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        with self.__connect__() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def __connect__(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    """Look up the cached transcript of a video.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+
+    Returns:
+        Optional[dict]: {"file": name of the file in cache_dir, "source": "youtube" | "whisper",
+            "created": time it was cached} if the transcript is cached and not expired, else None.
+    """
+
+    def get(self, video_id):
+        if not video_id:
+            return None
+
+        now = time.time()
+        with self.__connect__() as conn:
+            row = conn.execute(
+                "SELECT file, source, created FROM transcripts WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if not row:
+                return None
+
+            file, source, created = row
+            if now - created > self.ttl or not os.path.exists(os.path.join(self.cache_dir, file)):
+                self.__drop__(conn, video_id, file)
+                return None
+
+            conn.execute("UPDATE transcripts SET accessed = ? WHERE video_id = ?", (now, video_id))
+
+        return {"file": file, "source": source, "created": created}
+
+    """Look up when a video's transcript was cached. Read-only: the entry is not marked as used,
+    e.g. when only a cache validator is derived from it.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+
+    Returns:
+        Optional[float]: The time it was cached if the transcript is cached and not expired, else None.
+    """
+
+    def created(self, video_id):
+        if not video_id:
+            return None
+
+        with self.__connect__() as conn:
+            row = conn.execute("SELECT file, created FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        if not row or time.time() - row[1] > self.ttl or not os.path.exists(os.path.join(self.cache_dir, row[0])):
+            return None
+        return row[1]
+
+    """Move a transcript file into the cache and write its binary form next to it.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+        path (str): Path to the freshly written transcript file. The file is moved, not copied.
+        source (str): Where the transcript came from, SOURCE_YOUTUBE or SOURCE_WHISPER.
+
+    Returns:
+        dict: {"file": name of the file in cache_dir, "source": source, "created": time it was cached}
+    """
+
+    def put(self, video_id, path, source):
+        file = f"{video_id}.vtt"
+        target = os.path.join(self.cache_dir, file)
+
+        # os.replace is atomic, so readers never see a partially written transcript.
+        os.replace(path, target)
+        # The binary form is searched instead of the WebVTT file, both count towards max_bytes
+        binary = os.path.splitext(target)[0] + BINARY_SUFFIX
+        convert_vtt(target, binary)
+        size = os.path.getsize(target) + os.path.getsize(binary)
+
+        now = time.time()
+        with self.__connect__() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_id, source, file, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_id, source, file, size, now, now),
+                )
+                self.__evict__(conn, now, keep=video_id)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        return {"file": file, "source": source, "created": now}
+
+    """Remove a video's transcript from the cache.
+
+    Args:
+        video_id (str): The 11-character YouTube video ID.
+
+    Returns: None
+    """
+
+    def remove(self, video_id):
+        with self.__connect__() as conn:
+            row = conn.execute("SELECT file FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+            if row:
+                self.__drop__(conn, video_id, row[0])
+
+    def __drop__(self, conn, video_id, file):
+        conn.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+        # The transcript and its binary form, which this process may have mapped
+        binary = os.path.join(self.cache_dir, os.path.splitext(file)[0] + BINARY_SUFFIX)
+        release(binary)
+        for path in (os.path.join(self.cache_dir, file), binary):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # On Windows another process may still have it mapped; its entry is gone, so it is never read
+                # again and is overwritten when the video is cached again
+                logger.warning("Could not remove a dropped transcript", extra={"path": path})
+        # The transcript's embeddings, see semanticIndex
+        shutil.rmtree(os.path.join(self.semantic_dir, video_id), ignore_errors=True)
+
+    """Drop expired entries, then the least recently used ones until the cache fits in max_bytes.
+
+    Args:
+        conn (sqlite3.Connection): Connection with an open write transaction.
+        now (float): Current time.
+        keep (str): Video ID that must not be evicted (the entry that was just added).
+
+    Returns: None
+    """
+
+    def __evict__(self, conn, now, keep=None):
+        expired = conn.execute(
+            "SELECT video_id, file FROM transcripts WHERE created < ?", (now - self.ttl,)
+        ).fetchall()
+        for video_id, file in expired:
+            self.__drop__(conn, video_id, file)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT video_id, file, size FROM transcripts WHERE video_id != ? ORDER BY accessed ASC", (keep,)
+        ).fetchall()
+        for video_id, file, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.__drop__(conn, video_id, file)
+            total -= size
@@ -0,0 +1,194 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text):
+    """
+    Normalizes text for indexing: strips accents, folds case and drops apostrophes
+    so that "Don't" and "dont" index the same way.
+
+    Args:
+        text (str): Raw caption or query text
+
+    Returns:
+        str: The normalized text
+    """
+    # ASCII text, most captions, has no accents to strip
+    if text.isascii():
+        return text.casefold().replace("'", "")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.casefold().replace("'", "").replace("’", "")
+
+
+def tokenize(text):
+    """
+    Splits text into normalized word tokens.
+
+    Args:
+        text (str): Raw caption or query text
+
+    Returns:
+        [str]: The tokens in order of appearance
+    """
+    return TOKEN_PATTERN.findall(normalize(text))
+
+
+def parse_query(query):
+    """
+    Parses a transcript search query. Alternatives are separated by OR, the clauses of an
+    alternative by AND, and every clause is a phrase of consecutive terms. A term ending
+    with * matches as a prefix.
+
+    Args:
+        query (str): The search query, e.g. "machine learning OR neural net*"
+
+    Returns:
+        [[[str]]]: The terms of every clause of every alternative. A clause without terms is empty.
+    """
+    alternatives = []
+    for alternative in re.split(r"\s+OR\s+", query.strip()):
+        clauses = []
+        for clause in re.split(r"\s+AND\s+", alternative):
+            # Keep the * of prefix terms through tokenization
+            terms = []
+            for word, star in re.findall(r"([^\s*]+)(\*?)", clause):
+                tokens = tokenize(word)
+                if tokens and star:
+                    tokens[-1] += "*"
+                terms.extend(tokens)
+            clauses.append(terms)
+        alternatives.append(clauses)
+    return alternatives
+
+
+def combine(alternatives):
+    """
+    Combines the phrase matches of a parsed query: the clauses of an alternative must start
+    in the same caption, and the matches of all alternatives are merged.
+
+    Args:
+        alternatives ([[{int: int}]]): For every clause of every alternative, the first caption of
+            each match mapped to the last caption the match spans.
+
+    Returns:
+        [(int, int)]: (first, last) caption of every match, in order.
+    """
+    matches = {}
+    for clauses in alternatives:
+        found = None
+        for phrase in clauses:
+            if found is None:
+                found = phrase
+            else:
+                found = {i: max(found[i], phrase[i]) for i in found.keys() & phrase.keys()}
+
+        for first, last in (found or {}).items():
+            matches[first] = max(matches.get(first, first), last)
+    return sorted(matches.items())
+
+
+class transcriptIndex:
+
+    """Class constructor
+    Builds a positional inverted index over a transcript. All captions are treated as one token
+    stream, so phrases that cross caption boundaries are found as well.
+
+    Args:
+        captions ([(str, str)]): (start timestamp, text) for each caption, in order.
+
+    Returns: None
+    """
+
+    def __init__(self, captions):
+        self.starts = []
+        self.texts = []
+        # Caption number of every token position in the stream
+        self.token_caption = []
+        # token -> sorted list of positions in the token stream
+        self.postings = {}
+
+        for i, (start, text) in enumerate(captions):
+            self.starts.append(start)
+            self.texts.append(text.strip())
+            for token in tokenize(text):
+                self.postings.setdefault(token, []).append(len(self.token_caption))
+                self.token_caption.append(i)
+
+        # Sorted vocabulary for prefix lookups
+        self.vocabulary = sorted(self.postings)
+
+    """Positions of a single query term. A trailing * turns the term into a prefix match.
+
+    Args:
+        term (str): A normalized query token, optionally ending with *.
+
+    Returns:
+        [int]: Sorted token positions at which the term occurs.
+    """
+
+    def __positions__(self, term):
+        if not term.endswith("*"):
+            return self.postings.get(term, [])
+
+        prefix = term[:-1]
+        if not prefix:
+            return []
+
+        positions = []
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            positions.extend(self.postings[self.vocabulary[i]])
+            i += 1
+        return sorted(positions)
+
+    """Find a phrase of one or more terms.
+
+    Args:
+        terms ([str]): Consecutive query terms.
+
+    Returns:
+        {int: int}: First caption of each match mapped to the last caption the match spans.
+    """
+
+    def __phrase__(self, terms):
+        postings = [self.__positions__(term) for term in terms]
+        if not all(postings):
+            return {}
+
+        # Start from the rarest term and check the others by their offset from it
+        rarest = min(range(len(terms)), key=lambda k: len(postings[k]))
+        others = [(k, set(postings[k])) for k in range(len(terms)) if k != rarest]
+
+        matches = {}
+        for position in postings[rarest]:
+            start = position - rarest
+            if start < 0 or any(start + k not in positions for k, positions in others):
+                continue
+
+            first = self.token_caption[start]
+            last = self.token_caption[start + len(terms) - 1]
+            matches[first] = max(matches.get(first, first), last)
+        return matches
+
+    """Search the transcript.
+    Words next to each other form a phrase, which may span adjacent captions. Phrases can be
+    combined with AND (all in the same caption) and OR. A word ending with * matches as a prefix.
+    Example: "machine learning OR neural net*"
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        [(str, str)]: (start timestamp, text) of every matching caption, in order. The text of a
+            phrase match spanning several captions is joined together.
+    """
+
+    def search(self, query):
+        matches = combine(
+            [[self.__phrase__(terms) if terms else {} for terms in clauses] for clauses in parse_query(query)]
+        )
+        return [(self.starts[first], " ".join(self.texts[first:last + 1])) for first, last in matches]
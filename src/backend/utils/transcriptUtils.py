@@ -1,72 +1,115 @@
 import yt_dlp
 import os
-import webvtt
+import logging
+import threading
+from collections import OrderedDict
+from .binaryTranscript import binaryTranscript, convert_vtt, BINARY_SUFFIX
+from .semanticIndex import semanticIndex
+from .transcriptCache import CACHE_DIR
+from .concurrencyUtils import workspace, singleFlight
+from .whisperEngine import whisperEngine
+from .metricsUtils import DOWNLOAD_SECONDS, TRANSCRIPT_PARSE_SECONDS, observe
+
+logger = logging.getLogger(__name__)
 
 COOKIES_FILE = "cookies.txt"
 
+# Number of memory-mapped transcripts kept open
+INDEX_CACHE_SIZE = 64
+
 
 class transcriptUtils:
 
     """Class constructor
 
-    Args: None
+    Args:
+        engine (whisperEngine, optional): Transcribes audio in parallel chunks. Chunk length and
+            worker count default to the WHISPER_CHUNK_SECONDS and WHISPER_WORKERS environment variables.
+        metadata (metadataCache, optional): Shared video metadata; without it, audio downloads resolve the video again.
+        semantic (semanticIndex, optional): Caption embeddings for semantic search, stored in temp/cache/transcripts.
+        cache_dir (str): Directory of the transcript files, the cache_dir of the transcriptCache.
 
     Returns: None
     """
 
-    def __init__(self):
-        os.makedirs("temp/audio", exist_ok=True)
-        self.audio_file = "temp/audio/temp_audio.mp3"
-        self.filename = ""
-        os.makedirs("temp/subtitles", exist_ok=True)
-        self.transcript_file = f"temp/subtitles/{self.filename}.vtt"
+    def __init__(self, engine=None, metadata=None, semantic=None, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.engine = engine or whisperEngine()
+        self.metadata = metadata
+        self.semantic = semantic or semanticIndex()
+        self.flights = singleFlight()
+
+        self.indexes = OrderedDict()
+        self.indexes_lock = threading.Lock()
 
     """Download an audio file of the YouTube video to create transcript.
 
     Args:
         yt_url (str): The YouTube video URL.
+        audio_file (str): Path the audio is saved to.
 
     Returns: None
     """
 
-    def __get_audio__(self, yt_url):
+    def __get_audio__(self, yt_url, audio_file):
         ydl_opts = {
             "format": "bestaudio/best",
             "extract_audio": True,
             "audio_format": "mp3",
-            "outtmpl": self.audio_file,
+            "outtmpl": audio_file,
             "noplaylist": True,
             "cookiefile": COOKIES_FILE,
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([yt_url])
+        with observe(DOWNLOAD_SECONDS, kind="audio"):
+            if self.metadata:
+                self.metadata.process(yt_url, ydl_opts, download=True)
+                return
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.download([yt_url])
 
     """Create a transcript if it is not available.
 
     Args:
         yt_url (str): The YouTube video URL.
-        filename (str): title of the video used for the filename of the transcript file.
-        model: openai-whisper model ("small") for transcript creation from audio, initialized on app startup.
+        filename (str): Name of the transcript file in cache_dir, without the .vtt extension.
+        model (lazyModel or whisper model): openai-whisper model for transcript creation from audio. A
+            lazyModel is only loaded if the audio is not split across the engine's worker processes.
 
     Returns:
-        self.transcript_file (str): path to the transcript file.
+        transcript_file (str): path to the transcript file.
     """
 
     def create_transcript(self, yt_url, filename, model):
-        self.__get_audio__(yt_url)
-        if not self.audio_file:
-            return None
+        # The audio is downloaded to a private workspace, so concurrent requests don't overwrite it
+        with workspace() as workdir:
+            audio_file = os.path.join(workdir, "audio.mp3")
+            self.__get_audio__(yt_url, audio_file)
+            if not os.path.exists(audio_file):
+                return None
 
-        result = model.transcribe(self.audio_file)
-        self.filename = filename
+            segments = self.engine.transcribe(audio_file, model)
 
-        if not result:
-            return None
+        transcript_file = os.path.join(self.cache_dir, f"{filename}.vtt")
+        self.__write_vtt__(segments, transcript_file)
+
+        logger.info("Transcript created", extra={"transcript": transcript_file, "segments": len(segments)})
+        return transcript_file
+
+    """Write transcript segments to a WebVTT file.
+
+    Args:
+        segments ([dict]): Segments with start, end (seconds) and text.
+        path (str): Path of the transcript file.
+
+    Returns: None
+    """
 
-        with open(self.transcript_file, "w", encoding="utf-8") as file:
+    def __write_vtt__(self, segments, path):
+        with open(path, "w", encoding="utf-8") as file:
             file.write("WEBVTT\n\n")
-            for i, segment in enumerate(result["segments"]):
+            for segment in segments:
                 start = segment["start"]
                 end = segment["end"]
                 text = segment["text"]
@@ -78,35 +121,99 @@ class transcriptUtils:
                 m_e = int((end % 3600) // 60)
                 s_e = end % 60
 
-                start_vtt = f"{h_s:02}:{m_s:02}:{s_s:.3f}"
-                end_vtt = f"{h_e:02}:{m_e:02}:{s_e:.3f}"
+                start_vtt = f"{h_s:02}:{m_s:02}:{s_s:06.3f}"
+                end_vtt = f"{h_e:02}:{m_e:02}:{s_e:06.3f}"
 
                 file.write(f"{start_vtt} --> {end_vtt}\n{text}\n\n")
 
-        os.remove(self.audio_file)
-        print("Transcript created.")
-        return self.transcript_file
+    """Open the binary form of a transcript, converting the WebVTT file only the first time.
+    The binary file is shared by all worker processes and memory-mapped by each of them.
+    Use the transcript within `with`, see binaryTranscript.
+
+    Args:
+        path (str): Path to the transcript file.
+
+    Returns:
+        binaryTranscript: The transcript.
+    """
+
+    def __get_index__(self, path):
+        version = os.path.getmtime(path)
+        key = (path, version)
+        with self.indexes_lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                return index
+
+        binary_path = os.path.splitext(path)[0] + BINARY_SUFFIX
+        if not os.path.exists(binary_path) or os.path.getmtime(binary_path) < version:
+            with observe(TRANSCRIPT_PARSE_SECONDS):
+                convert_vtt(path, binary_path)
+        index = binaryTranscript(binary_path)
+
+        with self.indexes_lock:
+            self.indexes[key] = index
+            while len(self.indexes) > INDEX_CACHE_SIZE:
+                # Unmapped now rather than when it is collected, so the file can be removed on Windows
+                self.indexes.popitem(last=False)[1].close()
+        return index
 
     """Search the transcript for the keywords.
+    Supports phrases (also across captions), AND/OR of several terms and prefix matches with *.
 
-    Args: None
+    Args:
+        transcript (str): Filename of the transcript in cache_dir.
+        keyword (str): The search query.
 
-    Returns: None
+    Returns:
+        Optional[[(str, str)]]: (start timestamp, caption text) for every match, None if the transcript
+            is not cached (anymore).
     """
 
     def search_transcript(self, transcript, keyword):
         if not transcript or not keyword:
             return []
 
-        transcript = "temp/subtitles/" + transcript
+        try:
+            with self.__get_index__(os.path.join(self.cache_dir, transcript)) as index:
+                return index.search(keyword)
+        except FileNotFoundError:
+            # Evicted by another worker after it was looked up
+            return None
 
-        keyword = keyword.lower()
-        matches = []
+    """Search the transcript by meaning: "automobile" also finds captions about cars.
+    The captions are embedded the first time a transcript is searched this way.
 
-        for caption in webvtt.read(transcript):
-            caption_text = caption.text.lower()
+    Args:
+        transcript (str): Filename of the transcript in cache_dir.
+        query (str): What the user is looking for.
+        top_k (int): Number of results.
 
-            if keyword in caption_text:
-                matches.append((caption.start, caption.text.strip()))
+    Returns:
+        Optional[[(str, str, float)]]: (start timestamp, caption text, score) of the best matches, best first,
+            None if the transcript is not cached (anymore).
+    """
+
+    def semantic_search(self, transcript, query, top_k=10):
+        if not transcript or not query:
+            return []
+
+        path = os.path.join(self.cache_dir, transcript)
+        name = os.path.splitext(transcript)[0]
 
-        return matches
+        def build(version):
+            with self.__get_index__(path) as index:
+                captions = index.captions()
+            self.semantic.build(name, captions, version)
+
+        try:
+            version = os.path.getmtime(path)
+            if not self.semantic.has(name, version):
+                # Concurrent first searches embed the transcript once
+                self.flights.do((name, version), lambda: build(version))
+
+            return self.semantic.query(name, query, top_k)
+        except FileNotFoundError:
+            # Evicted by another worker after it was looked up
+            return None
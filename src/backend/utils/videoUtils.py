@@ -1,106 +1,238 @@
 import os
-import ffmpeg
 import re
-from ultralytics import YOLO
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
 from PIL import Image
-from transformers import AutoProcessor, AutoModelForZeroShotObjectDetection
 import torch
+from .frameUtils import (
+    sample_frames, sample_window, dedup_frames, merge_intervals, batches, prefetch, FRAME_STRATEGY, DEDUP_DISTANCE,
+    FRAME_THRESHOLD, SAMPLE_FPS, SCENE_WIDTH, FRAMES_PER_MINUTE,
+)
+from .frameIndex import frameIndex, CLIP_MODEL
+from .modelUtils import lazyModel
+from .metricsUtils import observe_inference
+from .inferenceUtils import INFERENCE_BACKEND, resolve_backend, load_yolo, load_dino
+from .modelServer import MODEL_SERVER, modelClient
+
+logger = logging.getLogger(__name__)
+
+YOLO_WEIGHTS = "yolov8l.pt"
+DINO_MODEL = "IDEA-Research/grounding-dino-base"
+
+# Number of frames passed to YOLO in one call and the inference image size
+DETECT_BATCH_SIZE = int(os.environ.get("DETECT_BATCH_SIZE", 16))
+DETECT_IMGSZ = int(os.environ.get("DETECT_IMGSZ", 640))
+# Number of frames passed to Grounding DINO in one forward pass
+SEARCH_BATCH_SIZE = int(os.environ.get("SEARCH_BATCH_SIZE", 4))
+# Best CLIP candidates per keyword that Grounding DINO re-checks: at least INDEX_TOP_K frames, or
+# INDEX_TOP_FRACTION of a long video's frames, of those that reach the minimum similarity
+INDEX_TOP_K = int(os.environ.get("INDEX_TOP_K", 8))
+INDEX_TOP_FRACTION = float(os.environ.get("INDEX_TOP_FRACTION", 0.05))
+INDEX_MIN_SCORE = float(os.environ.get("INDEX_MIN_SCORE", 0.2))
+# Lowest score of a Grounding DINO box
+DINO_BOX_THRESHOLD = 0.4
+# Adaptive search: sampling rates of the coarse pass over the whole video and of the refined windows,
+# and the lowest score of a coarse frame whose neighbourhood is refined. The coarse pass keeps boxes
+# down to the borderline score, so a frame with only weaker boxes than the fine pass keeps isn't refined.
+ADAPTIVE_COARSE_FPS = float(os.environ.get("ADAPTIVE_COARSE_FPS", 0.2))
+ADAPTIVE_FINE_FPS = float(os.environ.get("ADAPTIVE_FINE_FPS", 2))
+ADAPTIVE_BORDERLINE = float(os.environ.get("ADAPTIVE_BORDERLINE", 0.25))
 
 
 class videoUtils:
 
     """Class constructor
 
-    Args: None
+    Args:
+        batch_size (int): Number of frames passed to YOLO in one call.
+        imgsz (int): Image size YOLO runs inference at.
+        search_batch_size (int): Number of frames passed to Grounding DINO in one forward pass.
+        frame_strategy (str): How frames are sampled from a video, see frameUtils.STRATEGIES.
+        dedup_distance (int): Most differing hash bits of frames that share one model pass, -1 to disable.
+        backend (str): How the models run on CPU: torch, onnx or int8, see inferenceUtils.BACKENDS.
+        model_server (str): Socket of the node's model server that runs YOLO and Grounding DINO,
+            empty to run them in this process.
+        model_prefix (str): Prefix of the names the models are registered under, so several instances
+            in one process keep their own entries in modelUtils.registry.
 
     Returns: None
     """
 
-    def __init__(self):
-        self.video_file = ""
-        self.frame_dir = ""
-
+    def __init__(self, batch_size=DETECT_BATCH_SIZE, imgsz=DETECT_IMGSZ, search_batch_size=SEARCH_BATCH_SIZE,
+                 frame_strategy=FRAME_STRATEGY, dedup_distance=DEDUP_DISTANCE, backend=INFERENCE_BACKEND,
+                 model_server=MODEL_SERVER, model_prefix=""):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-
-        self.model = YOLO("yolov8l.pt")
+        self.backend = resolve_backend(backend, self.device)
+        # Inference is sent to the model server if there is one, the models here are then never loaded
+        self.client = modelClient(model_server) if model_server else None
+
+        # Models are loaded on first use
+        self.yolo = lazyModel(f"{model_prefix}yolo", self.__load_yolo__)
+        # The YOLO predictor keeps per-call state, so concurrent requests take turns
+        self.yolo_lock = threading.Lock()
         self.conf_thresh = 0.3
+        self.batch_size = batch_size
+        self.imgsz = imgsz
+        self.search_batch_size = search_batch_size
+        self.search_thresh = 0.6
+        self.frame_strategy = frame_strategy
+        self.dedup_distance = dedup_distance
+        # Totals over all scans: frames sampled, and how many of them skipped inference as near-duplicates
+        self.counters = {"frames_selected": 0, "frames_deduplicated": 0}
+        self.counters_lock = threading.Lock()
+
+        self.dino = lazyModel(f"{model_prefix}dino", self.__load_dino__)
+
+        self.frame_index = frameIndex(self.device)
+        self.index_top_k = INDEX_TOP_K
+        self.index_top_fraction = INDEX_TOP_FRACTION
+        self.index_min_score = INDEX_MIN_SCORE
+        self.coarse_fps = ADAPTIVE_COARSE_FPS
+        self.fine_fps = ADAPTIVE_FINE_FPS
+        self.adaptive_borderline = ADAPTIVE_BORDERLINE
+
+    """Fingerprint of the models and settings results are computed with, so that cache
+    validators of the results change with any of them.
+
+    Args: None
+
+    Returns:
+        str: A short hash.
+    """
+
+    def version(self):
+        settings = (
+            YOLO_WEIGHTS, DINO_MODEL, CLIP_MODEL, self.backend, self.imgsz, self.conf_thresh, self.search_thresh,
+            DINO_BOX_THRESHOLD, self.frame_strategy, FRAME_THRESHOLD, SAMPLE_FPS, SCENE_WIDTH, FRAMES_PER_MINUTE,
+            self.dedup_distance, self.index_top_k, self.index_top_fraction, self.index_min_score,
+            self.coarse_fps, self.fine_fps, self.adaptive_borderline,
+        )
+        return hashlib.sha256(repr(settings).encode()).hexdigest()[:16]
+
+    def __load_yolo__(self):
+        return load_yolo(YOLO_WEIGHTS, self.backend, self.imgsz)
+
+    def __load_dino__(self):
+        return load_dino(DINO_MODEL, self.backend, self.device)
+
+    @property
+    def model(self):
+        return self.yolo.get()
 
-        self.DINOprocessor = AutoProcessor.from_pretrained("IDEA-Research/grounding-dino-base")
-        self.DINOmodel = AutoModelForZeroShotObjectDetection.from_pretrained(
-            "IDEA-Research/grounding-dino-base").to(self.device)
+    @property
+    def DINOprocessor(self):
+        return self.dino.get()[0]
 
-    """Extract video frames from a video based on how much they differ.
-    The function selects only the frames that differ from the previous ones by more than 30%.
-    First frame is always selected. Frames are saved to temp/frames directory.
+    @property
+    def DINOmodel(self):
+        return self.dino.get()[1]
+
+    """Extract video frames from a video with the configured sampling strategy.
+    By default the function selects only the frames that differ from the previous ones by more than 30%.
+    First frame is always selected. Frames are streamed from ffmpeg as arrays, nothing is written to disk.
 
     Args:
-        video_file (str): The path to the downloaded YouTube video.
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        stats (dict, optional): Filled with the strategy and the number of frames decoded and selected.
 
-    Returns: None
+    Returns:
+        Iterator[(float, np.ndarray)]: Timestamp in seconds and RGB frame of each selected frame.
     """
 
-    def __get_frames__(self):
-        # Extract frames
-        out = (
-            ffmpeg.input(self.video_file)
-            .output(
-                f"{self.frame_dir}/frame_%03d.jpg",
-                vf="select='eq(n\\,0)+gt(scene\\,0.3)',showinfo",
-                fps_mode="vfr",
-            )
-            .run(capture_stdout=True, capture_stderr=True)
-        )
+    def __get_frames__(self, video_file, stats=None):
+        return sample_frames(video_file, self.frame_strategy, stats=stats)
+
+    """Run YOLO on a batch of frames in one call.
+
+    Args:
+        images ([np.ndarray]): The RGB frames.
+
+    Returns:
+        [[(str, float)]]: (object name, confidence) of every box, for each frame.
+    """
+
+    def __detect_batch__(self, images):
+        if self.client:
+            return self.client.call("detect", images)
+
+        detections = []
+        # YOLO expects BGR arrays
+        images = [np.ascontiguousarray(image[..., ::-1]) for image in images]
+        with self.yolo_lock:
+            start = time.perf_counter()
+            batch_results = self.model(images, imgsz=self.imgsz, verbose=False)
+            observe_inference("yolo", time.perf_counter() - start, len(images))
+        for results in batch_results:
+            detections.append([
+                (self.model.names[int(box.cls[0])], float(box.conf[0])) for box in results.boxes
+            ])
+        return detections
+
+    """Detect objects in the video as it is processed.
+    The function uses YOLOv8 (large).
+
+    Args:
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
 
-        # Rename frames' filenames to include timestamps in seconds
-        p = re.compile(r"pts_time:([\d\.]+)")
-        timestamps = p.findall(out[1].decode("utf-8", errors="ignore"))
+    Returns:
+        Iterator[dict]: {"type": "match", "object", "timestamp"} for every object found in a frame,
+            {"type": "progress", "frames_done"} after every batch of frames,
+            and {"type": "stats", "strategy", "frames_decoded", "frames_selected", "frames_deduplicated"} at the end.
+    """
+
+    def iter_objects(self, video_file):
+        frames_done = 0
+        stats = {}
+
+        # Near-duplicate frames share the detections of the first frame of their run
+        frames = dedup_frames(self.__get_frames__(video_file, stats), self.dedup_distance, stats)
+        # Decoding of the next batch overlaps with inference on the current one
+        for runs, images in prefetch(batches(frames, self.batch_size)):
+            for run, detections in zip(runs, self.__detect_batch__(images)):
+                found = []
+                for obj_name, conf in detections:
+                    if conf >= self.conf_thresh and obj_name not in found:
+                        found.append(obj_name)
+                for timestamp in run:
+                    for obj_name in found:
+                        yield {"type": "match", "object": obj_name, "timestamp": timestamp}
 
-        for i, timestamp in enumerate(timestamps):
-            old = f"{self.frame_dir}/frame_{i:03d}.jpg"
-            new = f"{self.frame_dir}/frame_{float(timestamp):.3f}.jpg"
-            if os.path.exists(old):
-                os.rename(old, new)
+            frames_done += sum(len(run) for run in runs)
+            yield {"type": "progress", "frames_done": frames_done}
+
+        yield self.__stats_event__(stats)
 
     """Find all possible objects in the video to create a table of contents.
     Limited by the pretraining data of the model.
     The function uses YOLOv8 (large).
 
     Args:
-        video_file (str): The path to the downloaded YouTube video.
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        progress (Callable, optional): Called after every batch as
+            progress(frames_done, frames_total, toc_so_far). frames_total is None until the end.
 
     Returns:
         toc ( {obj_name (str), [timestamp (str) ] } ): A dictionary with found objects,
             with timestamps listed for each.
     """
 
-    def find_objects(self, video_file):
-        self.video_file = video_file
-        self.frame_dir = (
-            "temp/frames/" + os.path.splitext(os.path.basename(self.video_file))[0]
-        )
-        os.makedirs(f"{self.frame_dir}", exist_ok=True)
-        self.__get_frames__()
+    def find_objects(self, video_file, progress=None):
         toc = {}
+        frames_done = 0
 
-        # Scan all .jpg frames
-        for filename in sorted(os.listdir(self.frame_dir)):
-            if not filename.endswith(".jpg"):
-                continue
-
-            match = re.match(r"frame_([\d\.]+)\.jpg", filename)
-            if not match:
-                continue  # Skip files like 'frame_001.jpg'
+        for event in self.iter_objects(video_file):
+            if event["type"] == "match":
+                toc.setdefault(event["object"], []).append(event["timestamp"])
+            elif event["type"] == "progress":
+                frames_done = event["frames_done"]
+                if progress:
+                    progress(frames_done, None, toc)
 
-            timestamp = float(match.group(1))
-            frame_path = os.path.join(self.frame_dir, filename)
-
-            results = self.model(frame_path)[0]
-            for box in results.boxes:
-                conf = float(box.conf[0])
-                if conf >= self.conf_thresh:
-                    cls_id = int(box.cls[0])
-                    obj_name = self.model.names[cls_id]
-                    toc.setdefault(obj_name, []).append(timestamp)
+        if progress:
+            progress(frames_done, frames_done, toc)
 
         # Save TOC to JSON
         '''
@@ -111,48 +243,279 @@ class videoUtils:
 
         return toc
 
-    """Search the video for an object.
+    """Run Grounding DINO on a batch of frames with all labels in one prompt.
+
+    Args:
+        images ([np.ndarray]): The RGB frames.
+        labels ([str]): The objects to look for.
+        box_threshold (float): Lowest score of a returned box.
+
+    Returns:
+        [[(str, float)]]: (matched label, score) of every box, for each frame.
+    """
+
+    def __ground_batch__(self, images, labels, box_threshold=DINO_BOX_THRESHOLD):
+        if self.client:
+            return self.client.call("ground", images, tuple(labels), box_threshold)
+
+        start = time.perf_counter()
+        images = [Image.fromarray(image) for image in images]
+        inputs = self.DINOprocessor(
+            images=images, text=[labels] * len(images), return_tensors="pt"
+        ).to(self.device)
+
+        with torch.no_grad():
+            outputs = self.DINOmodel(**inputs)
+
+        results = self.DINOprocessor.post_process_grounded_object_detection(
+            outputs,
+            inputs.input_ids,
+            box_threshold=box_threshold,
+            text_threshold=0.3,
+            target_sizes=[image.size[::-1] for image in images]
+        )
+        observe_inference("dino", time.perf_counter() - start, len(images))
+
+        detections = []
+        for result in results:
+            # Newer transformers versions return the label strings as "text_labels"
+            texts = result.get("text_labels", result["labels"])
+            detections.append([(text, score.item()) for text, score in zip(texts, result["scores"])])
+        return detections
+
+    """Split detections made with a shared prompt back into the keywords they belong to.
+
+    Args:
+        detections ([(str, float)]): (matched label, score) of every box in a frame.
+        keywords ([str]): The keywords.
+        labels ([str]): The labels of the prompt, in the order of the keywords.
+
+    Returns:
+        {str}: Keywords found in the frame with a score above the search threshold.
+    """
+
+    def __match_keywords__(self, detections, keywords, labels):
+        scores = self.__keyword_scores__(detections, keywords, labels)
+        return {keyword for keyword, score in scores.items() if round(score, 3) >= self.search_thresh}
+
+    """Find the best score of each keyword in a frame. A detection counts for a keyword if its
+    text contains the keyword's label as whole words, so "carpet" doesn't count for "car".
+
+    Args:
+        detections ([(str, float)]): (matched label, score) of every box in a frame.
+        keywords ([str]): The keywords.
+        labels ([str]): The labels of the prompt, in the order of the keywords.
+
+    Returns:
+        {str: float}: The highest score of each keyword detected in the frame.
+    """
+
+    def __keyword_scores__(self, detections, keywords, labels):
+        label_words = [tuple(re.findall(r"\w+", label.lower())) for label in labels]
+        scores = {}
+        for text, score in detections:
+            words = tuple(re.findall(r"\w+", text.lower()))
+            for keyword, label in zip(keywords, label_words):
+                # The label is a run of consecutive words of the detection
+                if label and any(words[i:i + len(label)] == label for i in range(len(words) - len(label) + 1)):
+                    scores[keyword] = max(score, scores.get(keyword, 0))
+        return scores
+
+    """Search the video for one or more objects as it is processed.
+    The function uses Grounding DINO open-set object detection model.
+    All keywords are evaluated in the same forward pass.
+
+    Args:
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        keywords ([str]): The objects a user is looking for.
+
+    Returns:
+        Iterator[dict]: {"type": "match", "object", "timestamp"} for every keyword found in a frame,
+            {"type": "progress", "frames_done"} after every batch of frames,
+            and {"type": "stats", "strategy", "frames_decoded", "frames_selected", "frames_deduplicated"} at the end.
+    """
+
+    def iter_search_video(self, video_file, keywords):
+        labels = [keyword.lower().strip() for keyword in keywords]
+        frames_done = 0
+        stats = {}
+
+        frames = dedup_frames(self.__get_frames__(video_file, stats), self.dedup_distance, stats)
+        for runs, images in prefetch(batches(frames, self.search_batch_size)):
+            for run, detections in zip(runs, self.__ground_batch__(images, labels)):
+                matched = self.__match_keywords__(detections, keywords, labels)
+                for timestamp in run:
+                    for keyword in keywords:
+                        if keyword in matched:
+                            yield {"type": "match", "object": keyword, "timestamp": timestamp}
+
+            frames_done += sum(len(run) for run in runs)
+            yield {"type": "progress", "frames_done": frames_done}
+
+        yield self.__stats_event__(stats)
+
+    """Report how many frames the sampling strategy decoded and selected,
+    and how many model passes deduplication saved.
+
+    Args:
+        stats (dict): The statistics filled by __get_frames__ and dedup_frames.
+
+    Returns:
+        dict: {"type": "stats", "strategy", "frames_decoded", "frames_selected", "frames_deduplicated"}
+    """
+
+    def __stats_event__(self, stats):
+        stats.setdefault("frames_deduplicated", 0)
+        with self.counters_lock:
+            self.counters["frames_selected"] += stats.get("frames_selected", 0)
+            self.counters["frames_deduplicated"] += stats["frames_deduplicated"]
+
+        logger.info("Frames sampled", extra=stats)
+        return {"type": "stats", **stats}
+
+    """Get the totals of all scans so far.
+
+    Args: None
+
+    Returns:
+        dict: Frames selected, frames deduplicated, and the share of model passes deduplication saved.
+    """
+
+    def get_counters(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        selected = counters["frames_selected"]
+        counters["inference_saved"] = round(counters["frames_deduplicated"] / selected, 4) if selected else 0.0
+        return counters
+
+    """Search the video for one or more objects.
     The function uses Grounding DINO open-set object detection model.
+    All keywords are evaluated in the same forward pass.
 
     Args:
-        video_file (str): The path to the downloaded YouTube video.
-        search (str): The object a user is looking for.
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        search (str | [str]): The object, or list of objects, a user is looking for.
 
-    Returns: self.results ([str]): A list of timestamps at which an object occurs.
+    Returns: results ([str] | {str: [str]}): A list of timestamps at which the object occurs,
+        or a dictionary mapping each keyword to its timestamps if a list of keywords was given.
     """
 
     def search_video(self, video_file, search):
-        self.video_file = video_file
-        self.frame_dir = (
-            "temp/frames/" + os.path.splitext(os.path.basename(self.video_file))[0]
+        keywords = [search] if isinstance(search, str) else list(search)
+        found = {keyword: [] for keyword in keywords}
+
+        for event in self.iter_search_video(video_file, keywords):
+            if event["type"] == "match":
+                found[event["object"]].append(event["timestamp"])
+
+        return found[search] if isinstance(search, str) else found
+
+    """Search the video for one or more objects, coarse to fine.
+    Grounding DINO first scores frames sampled every few seconds, then only the
+    stretches around coarse frames with a hit or a borderline score are sampled densely.
+    Long stretches without the objects cost a single pass per coarse frame.
+
+    Args:
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        keywords ([str]): The objects a user is looking for.
+        progress (Callable, optional): Called after every batch as progress(frames_done, None, None).
+        stats (dict, optional): Filled with the number of frames scored and of refined windows.
+
+    Returns:
+        {str: [(float, float)]}: (start, end) in seconds of every interval in which each keyword occurs.
+    """
+
+    def adaptive_search_video(self, video_file, keywords, progress=None, stats=None):
+        labels = [keyword.lower().strip() for keyword in keywords]
+        coarse_step = 1 / self.coarse_fps
+        fine_step = 1 / self.fine_fps
+        hits = {keyword: [] for keyword in keywords}
+        frames_done = 0
+
+        def score(frames, box_threshold):
+            nonlocal frames_done
+            flagged = []
+            for timestamps, images in prefetch(batches(frames, self.search_batch_size)):
+                for timestamp, detections in zip(timestamps, self.__ground_batch__(images, labels, box_threshold)):
+                    scores = self.__keyword_scores__(detections, keywords, labels)
+                    for keyword, value in scores.items():
+                        if round(value, 3) >= self.search_thresh:
+                            hits[keyword].append(timestamp)
+                    if any(value >= self.adaptive_borderline for value in scores.values()):
+                        flagged.append(timestamp)
+
+                frames_done += len(timestamps)
+                if progress:
+                    progress(frames_done, None, None)
+            return flagged
+
+        # Boxes below DINO_BOX_THRESHOLD only flag a neighbourhood for the fine pass
+        flagged = score(
+            sample_frames(video_file, "fps", threshold=0, fps=self.coarse_fps, per_minute=0),
+            min(self.adaptive_borderline, DINO_BOX_THRESHOLD),
+        )
+
+        # Everything between a flagged coarse frame and its neighbours is sampled densely
+        windows = merge_intervals([(max(0.0, t - coarse_step), t + coarse_step) for t in flagged])
+        for start, end in windows:
+            score(sample_window(video_file, start, end - start, self.fine_fps), DINO_BOX_THRESHOLD)
+
+        if stats is not None:
+            stats.update(frames_scored=frames_done, windows=len(windows))
+        logger.info("Adaptive search finished", extra={"frames_scored": frames_done, "windows": len(windows)})
+
+        # Hits on neighbouring fine frames form one interval
+        return {
+            keyword: merge_intervals([(t, t) for t in set(times)], max_gap=fine_step * 1.5)
+            for keyword, times in hits.items()
+        }
+
+    """Build the visual index of a video, so later searches don't need the video anymore.
+
+    Args:
+        video_file (str | dict): The path to the downloaded YouTube video, or its stream.
+        video_id (str): The YouTube video ID.
+        progress (Callable, optional): Called after every batch as progress(frames_done, frames_total, None).
+
+    Returns:
+        int: Number of indexed frames.
+    """
+
+    def index_video(self, video_file, video_id, progress=None):
+        stats = {}
+        indexed = self.frame_index.build(video_id, self.__get_frames__(video_file, stats), progress)
+        self.__stats_event__(stats)
+        return indexed
+
+    """Search an indexed video for one or more objects.
+    CLIP ranks all indexed frames against each keyword, and only the best candidates
+    are confirmed with Grounding DINO.
+
+    Args:
+        video_id (str): The YouTube video ID, indexed with index_video.
+        search (str | [str]): The object, or list of objects, a user is looking for.
+
+    Returns: results ([float] | {str: [float]}): Same as search_video.
+    """
+
+    def search_index(self, video_id, search):
+        keywords = [search] if isinstance(search, str) else list(search)
+        labels = [keyword.lower().strip() for keyword in keywords]
+        found = {keyword: [] for keyword in keywords}
+
+        ranked = self.frame_index.query(
+            video_id, labels, self.index_top_k, self.index_min_score, self.index_top_fraction
         )
-        os.makedirs(f"{self.frame_dir}", exist_ok=True)
-        self.__get_frames__()
-
-        self.text_labels = [[search]]
-        self.results = []
-
-        for filename in os.listdir(self.frame_dir):
-            filepath = os.path.join(self.frame_dir, filename)
-            image = Image.open(filepath).convert("RGB")
-            inputs = self.DINOprocessor(images=image, text=self.text_labels, return_tensors="pt").to(self.device)
-
-            with torch.no_grad():
-                outputs = self.DINOmodel(**inputs)
-
-            results = self.DINOprocessor.post_process_grounded_object_detection(
-                outputs,
-                inputs.input_ids,
-                box_threshold=0.4,
-                text_threshold=0.3,
-                target_sizes=[image.size[::-1]]
-            )
-
-            result = results[0]
-            for score in result["scores"]:
-                if round(score.item(), 3) >= 0.600:
-                    match = re.match(r"frame_([\d\.]+)\.jpg", filename)
-                    timestamp = float(match.group(1))
-                    self.results.append(timestamp)
-
-        return self.results
+        candidates = sorted({(number, timestamp) for frames in ranked.values() for number, timestamp, _ in frames})
+
+        if candidates:
+            images = self.frame_index.frames(video_id, [number for number, _ in candidates])
+            timestamps = [timestamp for _, timestamp in candidates]
+            for start in range(0, len(images), self.search_batch_size):
+                batch = images[start:start + self.search_batch_size]
+                detections = self.__ground_batch__(batch, labels)
+                for timestamp, frame_detections in zip(timestamps[start:], detections):
+                    for keyword in self.__match_keywords__(frame_detections, keywords, labels):
+                        found[keyword].append(timestamp)
+
+        return found[search] if isinstance(search, str) else found
@@ -0,0 +1,249 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .metricsUtils import WHISPER_REAL_TIME_FACTOR
+from .modelUtils import lazyModel, make_room, memory_status, resident_bytes
+
+SAMPLE_RATE = 16000
+WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL_NAME", "tiny")
+
+# Target length of an audio chunk and the number of processes transcribing chunks, one per core by default
+WHISPER_CHUNK_SECONDS = int(os.environ.get("WHISPER_CHUNK_SECONDS", 300))
+WHISPER_WORKERS = int(os.environ.get("WHISPER_WORKERS", os.cpu_count() or 1))
+# Every process holds its own copy of the model. Under a memory budget (MODEL_MEMORY_BUDGET_MB) only as many
+# processes start as fit in it at WHISPER_WORKER_MEMORY_MB each, about the resident size of a "tiny" worker.
+WHISPER_WORKER_MEMORY_MB = float(os.environ.get("WHISPER_WORKER_MEMORY_MB", 512))
+# Seconds the worker processes may stay idle before they are stopped and their memory is freed
+WHISPER_POOL_IDLE_SECONDS = int(os.environ.get("WHISPER_POOL_IDLE_SECONDS", 300))
+
+# A chunk boundary is moved to the quietest point within this many seconds of its target
+CUT_SEARCH_SECONDS = 10
+# Length of the windows the loudness is measured over
+ENERGY_WINDOW = SAMPLE_RATE // 50
+
+# Model of a worker process, loaded once by init_worker
+worker_model = None
+
+
+def init_worker(model_name, threads, pids):
+    """
+    Loads the Whisper model in a worker process.
+
+    Args:
+        model_name (str): Name of the Whisper model
+        threads (int): Number of torch threads the worker may use
+        pids (multiprocessing.Queue): The worker reports its process ID here, so its memory can be measured
+
+    Returns: None
+    """
+    global worker_model
+    import torch
+    import whisper
+
+    pids.put(os.getpid())
+    torch.set_num_threads(threads)
+    worker_model = whisper.load_model(model_name, device="cpu")
+
+
+def transcribe_chunk(audio):
+    """
+    Transcribes one chunk of audio in a worker process.
+
+    Args:
+        audio (np.ndarray): 16 kHz mono float32 samples
+
+    Returns:
+        [dict]: Whisper segments with start and end relative to the chunk
+    """
+    result = worker_model.transcribe(audio, fp16=False)
+    return [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+
+
+def find_cut_points(audio, chunk_seconds, search_seconds=CUT_SEARCH_SECONDS):
+    """
+    Splits audio into chunks of about chunk_seconds, cutting at the quietest moment near each
+    boundary so that words are not split between chunks.
+
+    Args:
+        audio (np.ndarray): 16 kHz mono float32 samples
+        chunk_seconds (float): Target chunk length
+        search_seconds (float): How far a cut may move from its target
+
+    Returns:
+        [int]: Sample offsets at which the chunks start; the first is always 0
+    """
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    if len(audio) <= chunk:
+        return [0]
+
+    # Loudness of every window of ENERGY_WINDOW samples
+    windows = len(audio) // ENERGY_WINDOW
+    energy = np.square(audio[:windows * ENERGY_WINDOW].reshape(windows, ENERGY_WINDOW)).mean(axis=1)
+
+    cuts = [0]
+    search = int(search_seconds * SAMPLE_RATE) // ENERGY_WINDOW
+    target = chunk
+    while target < len(audio) - chunk // 4:
+        center = target // ENERGY_WINDOW
+        low = max(cuts[-1] // ENERGY_WINDOW + 1, center - search)
+        high = min(windows, center + search + 1)
+        if low >= high:
+            break
+
+        cut = (low + int(np.argmin(energy[low:high]))) * ENERGY_WINDOW
+        cuts.append(cut)
+        target = cut + chunk
+    return cuts
+
+
+def stitch(chunk_segments, offsets):
+    """
+    Joins the segments of all chunks, shifting each chunk's timestamps by its offset.
+
+    Args:
+        chunk_segments ([[dict]]): Segments of each chunk, relative to the chunk
+        offsets ([int]): Sample offset of each chunk
+
+    Returns:
+        [dict]: Segments with timestamps relative to the whole audio
+    """
+    segments = []
+    for chunk, offset in zip(chunk_segments, offsets):
+        seconds = offset / SAMPLE_RATE
+        for segment in chunk:
+            segments.append({
+                "start": segment["start"] + seconds,
+                "end": segment["end"] + seconds,
+                "text": segment["text"],
+            })
+    return segments
+
+
+class whisperEngine:
+
+    """Class constructor
+    Transcribes long audio by splitting it at silences and transcribing the chunks
+    in parallel on a pool of processes, each with its own copy of the model. The pool
+    is a lazyModel named "whisper_pool", so its processes count towards the memory
+    budget, and it is stopped after idle_seconds without work.
+
+    Args:
+        chunk_seconds (int): Target length of a chunk.
+        workers (int): Number of worker processes; 1 transcribes in the calling process.
+        model_name (str): Whisper model the workers load.
+        idle_seconds (int): Seconds after the last transcription at which the pool is stopped.
+        worker_memory_mb (float): Expected memory of a worker process, which caps the workers under a memory budget.
+
+    Returns: None
+    """
+
+    def __init__(self, chunk_seconds=WHISPER_CHUNK_SECONDS, workers=WHISPER_WORKERS, model_name=WHISPER_MODEL_NAME,
+                 idle_seconds=WHISPER_POOL_IDLE_SECONDS, worker_memory_mb=WHISPER_WORKER_MEMORY_MB):
+        self.chunk_seconds = chunk_seconds
+        self.workers = max(1, workers)
+        self.model_name = model_name
+        self.idle_seconds = idle_seconds
+        self.worker_memory_mb = worker_memory_mb
+        # Process IDs reported by the workers of the current pool
+        self.pids = None
+        self.worker_pids = set()
+        # Registered on first use, so warming up all models doesn't start the pool
+        self.pool = None
+        self.active = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def __pool_workers__(self):
+        budget_mb = memory_status()["budget_mb"]
+        if not budget_mb or self.worker_memory_mb <= 0:
+            return self.workers
+        return max(1, min(self.workers, int(budget_mb // self.worker_memory_mb)))
+
+    def __start_pool__(self):
+        workers = self.__pool_workers__()
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        context = multiprocessing.get_context("spawn")
+        self.pids = context.Queue()
+        self.worker_pids = set()
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self.model_name, threads, self.pids),
+        )
+
+    def __reported_pids__(self):
+        # Workers report once when they start, which may be after the previous call
+        while True:
+            try:
+                self.worker_pids.add(self.pids.get_nowait())
+            except queue.Empty:
+                return self.worker_pids
+
+    def __map__(self, chunks):
+        with self.lock:
+            if self.pool is None:
+                self.pool = lazyModel("whisper_pool", self.__start_pool__, unloader=self.__stop_pool__)
+            self.active += 1
+            if self.timer:
+                self.timer.cancel()
+        try:
+            pool = self.pool.get()
+            # Submitted at once, so the work finishes even if the pool is stopped meanwhile to make room
+            results = list(pool.map(transcribe_chunk, chunks))
+            # The workers hold their models now, the memory of their processes is the pool's size
+            size = sum(resident_bytes(pid) for pid in self.__reported_pids__())
+            if size:
+                self.pool.size = size
+                make_room(0, keep=self.pool)
+            return results
+        finally:
+            with self.lock:
+                self.active -= 1
+                if self.active == 0:
+                    self.timer = threading.Timer(self.idle_seconds, self.__stop_idle__)
+                    self.timer.daemon = True
+                    self.timer.start()
+
+    def __stop_pool__(self, pool):
+        # Running chunks still finish, then the processes exit
+        pool.shutdown(wait=False)
+
+    def __stop_idle__(self):
+        with self.lock:
+            if self.active == 0 and self.pool is not None:
+                self.pool.unload()
+
+    """Transcribe an audio file.
+
+    Args:
+        audio_file (str): Path to the audio file.
+        model (lazyModel or whisper model): openai-whisper model used when the audio fits in one chunk
+            or only one worker is configured. A lazyModel is only loaded then.
+
+    Returns:
+        [dict]: Segments with start, end (seconds) and text.
+    """
+
+    def transcribe(self, audio_file, model):
+        import whisper
+
+        audio = whisper.load_audio(audio_file)
+        start = time.perf_counter()
+        offsets = find_cut_points(audio, self.chunk_seconds)
+
+        if len(offsets) == 1 or self.workers == 1:
+            if isinstance(model, lazyModel):
+                model = model.get()
+            segments = model.transcribe(audio)["segments"]
+        else:
+            chunks = [audio[begin:end] for begin, end in zip(offsets, offsets[1:] + [len(audio)])]
+            segments = stitch(self.__map__(chunks), offsets)
+
+        if len(audio):
+            WHISPER_REAL_TIME_FACTOR.observe((time.perf_counter() - start) / (len(audio) / SAMPLE_RATE))
+        return segments
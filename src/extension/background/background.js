@@ -163,11 +163,56 @@ async function handleTranscriptSearch(videoId, searchTerm) {
     }
 }
 
+const JOB_POLL_INTERVAL_MS = 2000;
+// Polling gives up after this long; a long video scan rarely takes more than a few minutes
+const JOB_TIMEOUT_MS = 15 * 60 * 1000;
+
+/**
+ * Submits a long-running task (table of contents or object search) as a backend job
+ * and polls its status until it finishes, instead of holding one request open.
+ * @param {object} payload - Job parameters: yt_url, task and, for object search, keyword
+ * @returns {object} The finished job
+ * @throws {Error} If the job doesn't finish within JOB_TIMEOUT_MS
+ */
+async function runJob(payload) {
+    const submitResponse = await fetch(API_URL + "/jobs", {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      mode: 'cors',
+      body: JSON.stringify(payload),
+    });
+
+    const submitted = await submitResponse.json();
+    if (!submitResponse.ok) {
+      throw new Error(submitted.message || `Job submission failed with status ${submitResponse.status}`);
+    }
+
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      if (Date.now() > deadline) {
+        throw new Error("The search is taking too long. Please try again later.");
+      }
+
+      const statusResponse = await fetch(API_URL + "/jobs/" + submitted.job_id, { method: 'GET', mode: 'cors' });
+      const job = await statusResponse.json();
+      if (!statusResponse.ok) {
+        throw new Error(job.message || `Job status failed with status ${statusResponse.status}`);
+      }
+
+      console.log(`Job ${job.job_id}: ${job.status}, ${job.progress.frames_done} frames processed`);
+      if (job.status === "done" || job.status === "failed") {
+        return job;
+      }
+    }
+}
+
 /**
- * Handles object search by making an API call to the backend.
+ * Handles object search by running a backend job.
  * @param {string} videoId - YouTube video ID
  * @param {string} searchTerm - Keyword or object to search in the video
- * @param {function} sendResponse - Function to send response back to the caller
  */
 async function handleObjectSearch(videoId, searchTerm) {
     console.log(`videoID: ${videoId}`);
@@ -178,34 +223,15 @@ async function handleObjectSearch(videoId, searchTerm) {
   
     try {
       console.log(`Searching for object: ${searchTerm} in video: ${videoId}`);
-  
-      const apiUrl = API_URL + "/object_search" + "?yt_url=" + videoId + "&keyword=" + searchTerm;
 
-      const response = await fetch(apiUrl, {
-        method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        mode: 'cors',
-      })
+      const job = await runJob({ yt_url: videoId, task: "object_search", keyword: searchTerm });
+      const result = job.response;
 
-  
-      console.log("HTTP Status:", response.status, response.statusText);
-      const rawText = await response.text();
-      console.log("Raw response text:", rawText);
-  
-      let result;
-      try {
-        result = JSON.parse(rawText);
-      } catch (parseError) {
-        throw new Error(`Failed to parse JSON response: ${rawText}`);
-      }
-  
-      if (response.ok) {
+      if (job.status_code === 200) {
         console.log("Object search successful:", result);
         return { status: "success", data: result };
       } else {
-        throw new Error(result.message || `Object search failed with status ${response.status} ${response.statusText}`);
+        throw new Error((result && result.message) || job.error || `Object search failed with status ${job.status_code}`);
       }
     } catch (error) {
       console.error("Object search error:", error);
@@ -214,9 +240,8 @@ async function handleObjectSearch(videoId, searchTerm) {
 }
 
 /**
- * Handles creation of table of contents for object detection with YOLO
+ * Handles creation of table of contents for object detection with YOLO by running a backend job.
  * @param {string} videoId - YouTube video ID
- * @param {function} sendResponse - Function to send response back to the caller
  */
 async function handleToC(videoId) {
   console.log(`videoID: ${videoId}`);
@@ -228,33 +253,14 @@ async function handleToC(videoId) {
   try {
     console.log(`Searching for objects in the video: ${videoId}`);
 
-    const apiUrl = API_URL + "/toc" + "?yt_url=" + videoId;
-
-    const response = await fetch(apiUrl, {
-      method: 'GET',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      mode: 'cors',
-    })
-
-
-    console.log("HTTP Status:", response.status, response.statusText);
-    const rawText = await response.text();
-    console.log("Raw response text:", rawText);
-
-    let result;
-    try {
-      result = JSON.parse(rawText);
-    } catch (parseError) {
-      throw new Error(`Failed to parse JSON response: ${rawText}`);
-    }
+    const job = await runJob({ yt_url: videoId, task: "toc" });
+    const result = job.response;
 
-    if (response.ok) {
+    if (job.status_code === 200) {
       console.log("Table of contents fetch successful:", result);
       return { status: "success", data: result };
     } else {
-      throw new Error(result.message || `Table of contents fetch failed with status ${response.status} ${response.statusText}`);
+      throw new Error((result && result.message) || job.error || `Table of contents fetch failed with status ${job.status_code}`);
     }
   } catch (error) {
     console.error("Table of contents fetch error:", error);
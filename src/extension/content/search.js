@@ -70,6 +70,8 @@ document.addEventListener("DOMContentLoaded", function () {
             if (response && response.status === "success" && response.data) {
                 statusMessage.textContent = "Search complete!";
                 displayResultsInPopup(response.data, videoId);
+            } else if (response && response.status === "error") {
+                statusMessage.textContent = `Search failed: ${response.message || "Unknown error"}`;
             } else {
                 statusMessage.textContent = "No results found.";
             }
@@ -205,6 +207,9 @@ document.addEventListener("DOMContentLoaded", function () {
                 renderTOC(cachedTOC, videoId);
             } else {
                 resultsContainer.innerHTML = "<p>Failed to load detected objects.</p>";
+                if (response && response.status === "error" && response.message) {
+                    statusMessage.textContent = response.message;
+                }
             }
         });
     }
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import pkgutil
+import unittest
+import importlib
+import backend.utils
+
+# app.py imports its helpers as `utils.*`, like when it is run from src/backend. They resolve to the
+# backend.utils modules the other tests import, instead of being loaded a second time under another name.
+sys.modules["utils"] = backend.utils
+for module in pkgutil.iter_modules(backend.utils.__path__):
+    sys.modules[f"utils.{module.name}"] = importlib.import_module(f"backend.utils.{module.name}")
+
+import backend.app  # noqa: E402
+
+VIDEO_URL = "https://www.youtube.com/watch?v=SR__amDl1c8"
+
+
+class stubMetadataCache:
+    """Writes an empty file where yt-dlp would download the video, instead of downloading it."""
+
+    def process(self, url, ydl_opts, download=False):
+        path = ydl_opts["outtmpl"].replace("%(ext)s", "mp4")
+        open(path, "wb").close()
+        return {"requested_downloads": [{"filepath": path}]}
+
+
+class stubTranscriptCache:
+    """Hands out the given cache entries in order, like lookups before and after a transcript is fetched again."""
+
+    def __init__(self, cache_dir, files):
+        self.cache_dir = cache_dir
+        self.files = files
+
+    def get(self, video_id):
+        return {"file": self.files.pop(0), "source": "youtube", "created": 1.0}
+
+    def created(self, video_id):
+        return None
+
+
+class StreamTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.app = backend.app.create_app()
+        self.app.metadata_cache = stubMetadataCache()
+        self.client = self.app.test_client()
+        self.closed = []
+
+        def scan(video_file, matches=50, keyword="person"):
+            # Stands in for videoUtils.iter_objects and iter_search_video
+            try:
+                for i in range(matches):
+                    yield {"type": "match", "object": keyword, "timestamp": float(i)}
+                    yield {"type": "progress", "frames_done": i + 1}
+                yield {"type": "stats", "strategy": "stub", "frames_decoded": matches, "frames_selected": matches}
+            finally:
+                self.closed.append(video_file)
+
+        self.app.video_utils.iter_objects = lambda video_file: scan(video_file, matches=3)
+        self.app.video_utils.iter_search_video = lambda video_file, keywords: scan(video_file, keyword=keywords[0])
+        self.app.video_utils.frame_index.has = lambda video_id: False
+
+    def ndjson(self, response):
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_format_event(self):
+        event = {"type": "match", "object": "cat", "timestamp": 1.5}
+        self.assertEqual(backend.app.format_event(event, "ndjson"), json.dumps(event) + "\n")
+        self.assertEqual(backend.app.format_event(event, "sse"), f"event: match\ndata: {json.dumps(event)}\n\n")
+
+    def test_stream_scan_ndjson(self):
+        response = self.client.get(f"/toc/stream?yt_url={VIDEO_URL}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+
+        events = self.ndjson(response)
+        self.assertEqual(events[0]["type"], "status")
+        self.assertEqual([e["timestamp"] for e in events if e["type"] == "match"], [0.0, 1.0, 2.0])
+        self.assertEqual(
+            events[-1],
+            {
+                "type": "done",
+                "matches": 3,
+                "frames_done": 3,
+                "sampling": {"strategy": "stub", "frames_decoded": 3, "frames_selected": 3},
+            },
+        )
+        self.assertEqual(len(self.closed), 1)
+
+    def test_stream_search_sse(self):
+        response = self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}&keyword=dog&format=sse&max_matches=2")
+        self.assertEqual(response.mimetype, "text/event-stream")
+
+        blocks = response.get_data(as_text=True).strip().split("\n\n")
+        names = [block.splitlines()[0] for block in blocks]
+        self.assertEqual(names.count("event: match"), 2)
+        self.assertEqual(names[-1], "event: done")
+        done = json.loads(blocks[-1].splitlines()[1].removeprefix("data: "))
+        self.assertEqual(done["matches"], 2)
+        self.assertEqual(done["frames_done"], 1)
+
+    def test_early_stop_closes_scan(self):
+        response = self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}&keyword=dog&max_matches=5")
+        events = self.ndjson(response)
+
+        self.assertEqual(sum(e["type"] == "match" for e in events), 5)
+        self.assertEqual(events[-1]["type"], "done")
+        # The scan stopped at the fifth of its 50 matches
+        self.assertEqual(len(self.closed), 1)
+        self.assertEqual(events[-1]["frames_done"], 4)
+
+    def test_disconnect_closes_scan(self):
+        response = self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}&keyword=dog", buffered=False)
+        chunks = iter(response.response)
+        self.assertEqual(json.loads(next(chunks))["type"], "status")
+        self.assertEqual(json.loads(next(chunks))["type"], "match")
+
+        # The client goes away in the middle of the scan
+        response.close()
+        self.assertEqual(len(self.closed), 1)
+
+    def test_index_done_event(self):
+        self.app.video_utils.frame_index.has = lambda video_id: True
+        self.app.video_utils.search_index = lambda video_id, keywords: {"dog": [4.0, 1.0], "cat": [2.0]}
+
+        response = self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}&keyword=dog&keyword=cat")
+        events = self.ndjson(response)
+
+        self.assertEqual(
+            [(e["object"], e["timestamp"]) for e in events[:-1]], [("dog", 1.0), ("cat", 2.0), ("dog", 4.0)]
+        )
+        # The same keys as the done event of a scan
+        self.assertEqual(events[-1], {"type": "done", "matches": 3, "frames_done": None, "sampling": None})
+
+    def evicted_index(self):
+        # The index is evicted by another worker between the check and the search, once
+        calls = []
+
+        def search_index(video_id, keywords):
+            calls.append(video_id)
+            if len(calls) == 1:
+                raise FileNotFoundError("embeddings.npy")
+            return {keywords[0]: [3.0]}
+
+        indexed = []
+        self.app.video_utils.frame_index.has = lambda video_id: len(calls) != 1
+        self.app.video_utils.search_index = search_index
+        self.app.video_utils.index_video = lambda video, video_id, progress=None: indexed.append(video_id)
+        return indexed
+
+    def test_index_evicted_during_stream(self):
+        self.evicted_index()
+        events = self.ndjson(self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}&keyword=dog"))
+
+        # Scanned like a video without an index
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertEqual(events[-1]["matches"], 50)
+        self.assertEqual(len(self.closed), 1)
+
+    def test_index_evicted_during_search(self):
+        indexed = self.evicted_index()
+        response = self.client.get(f"/object_search?yt_url={VIDEO_URL}&keyword=dog")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["results"], [{"object": "dog", "timestamps": 3.0}])
+        self.assertEqual(indexed, ["SR__amDl1c8"])
+
+    def test_toc_etag_follows_settings(self):
+        self.app.video_utils.find_objects = lambda video, progress=None: {"person": [1.0]}
+        response = self.client.get(f"/toc?yt_url={VIDEO_URL}")
+        self.assertEqual(response.status_code, 200)
+        tag = response.headers["ETag"]
+
+        self.app.http_cache.clear()
+        self.assertEqual(self.client.get(f"/toc?yt_url={VIDEO_URL}", headers={"If-None-Match": tag}).status_code, 304)
+
+        # Results computed with other settings get another ETag
+        self.app.video_utils.conf_thresh = 0.5
+        response = self.client.get(f"/toc?yt_url={VIDEO_URL}", headers={"If-None-Match": tag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], tag)
+
+    def test_transcript_evicted_during_search(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        with open(os.path.join(cache_dir, "SR__amDl1c8.vtt"), "w", encoding="utf-8") as file:
+            file.write("WEBVTT\n\n00:00:03.000 --> 00:00:05.000\na dog runs\n\n")
+
+        # The first entry's file was removed by another worker, the second is the transcript fetched again
+        self.app.transcript_cache = stubTranscriptCache(cache_dir, ["evicted.vtt", "SR__amDl1c8.vtt"])
+        self.app.transcript_utils.cache_dir = cache_dir
+        response = self.client.get(f"/transcript_search?yt_url={VIDEO_URL}&keyword=dog")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["text"] for r in response.get_json()["results"]], ["a dog runs"])
+        self.assertEqual(self.app.transcript_cache.files, [])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get("/toc/stream?yt_url=invalid").status_code, 400)
+        self.assertEqual(self.client.get(f"/object_search/stream?yt_url={VIDEO_URL}").status_code, 400)
+        self.assertEqual(self.client.get(f"/toc/stream?yt_url={VIDEO_URL}&format=xml").status_code, 400)
+        self.assertEqual(self.client.get(f"/toc/stream?yt_url={VIDEO_URL}&max_matches=x").status_code, 400)
+        self.assertEqual(self.closed, [])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
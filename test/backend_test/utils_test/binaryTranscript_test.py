@@ -0,0 +1,101 @@
+from backend.utils.binaryTranscript import (
+    binaryTranscript, write_binary, convert_vtt, release, milliseconds, timestamp
+)
+from backend.utils.transcriptIndex import transcriptIndex
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import webvtt
+
+
+class BinaryTranscriptTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cues = [
+            (1000, 4000, "Today we talk about machine"),
+            (4000, 7000, "learning and how a Cat sees"),
+            (7000, 10000, "the world, unlike cats or dogs."),
+            (10000, 13500, "Neural networks don't sleep.\nNot even in a café."),
+            (3723004, 3725000, "ha ha ha"),
+        ]
+        self.path = os.path.join(self.temp_dir, "test.vtb")
+        write_binary(self.path, self.cues)
+        self.transcript = binaryTranscript(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_timestamps(self):
+        self.assertEqual(timestamp(3723004), "01:02:03.004")
+        self.assertEqual(milliseconds("01:02:03.004"), 3723004)
+        self.assertEqual(milliseconds("02:03.500"), 123500)
+
+    def test_read(self):
+        self.assertEqual(len(self.transcript), 5)
+        self.assertEqual(self.transcript.timestamp(4), "01:02:03.004")
+        self.assertEqual(self.transcript.text(3), "Neural networks don't sleep.\nNot even in a café.")
+        self.assertEqual(self.transcript.captions()[0], ("00:00:01.000", "Today we talk about machine"))
+
+    def test_search_matches_positional_index(self):
+        index = transcriptIndex((timestamp(start), text) for start, _, text in self.cues)
+        queries = [
+            "cat", "CAT", "elephant", "machine learning", "cats AND dogs", "cats AND sleep", "cat OR neural",
+            "cat*", "neural net*", "dont", "don't", "cafe", "ha ha", "ha AND ha ha ha", "learning and how a cat",
+        ]
+        for query in queries:
+            self.assertEqual(self.transcript.search(query), index.search(query), query)
+
+        # A phrase spanning captions returns their joined text
+        self.assertEqual(
+            self.transcript.search("machine learning"),
+            [("00:00:01.000", "Today we talk about machine learning and how a Cat sees")],
+        )
+
+    def test_vtt_round_trip(self):
+        vtt = os.path.join(self.temp_dir, "export.vtt")
+        self.transcript.to_vtt(vtt)
+
+        captions = webvtt.read(vtt)
+        self.assertEqual(
+            [(milliseconds(c.start), milliseconds(c.end), c.text) for c in captions], self.cues
+        )
+
+        # Converting the export again gives the same file
+        again = os.path.join(self.temp_dir, "again.vtb")
+        self.assertEqual(convert_vtt(vtt, again), 5)
+        with open(self.path, "rb") as a, open(again, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_empty(self):
+        path = os.path.join(self.temp_dir, "empty.vtb")
+        write_binary(path, [])
+        transcript = binaryTranscript(path)
+        self.assertEqual(len(transcript), 0)
+        self.assertEqual(transcript.search("cat"), [])
+
+    def test_release(self):
+        with self.transcript as transcript:
+            release(self.path)
+            # A search in progress keeps the mapping
+            self.assertEqual(transcript.search("cat")[0][0], "00:00:04.000")
+        self.assertIsNone(self.transcript.buffer)
+
+        # The file can be replaced now, the next use maps the new one
+        write_binary(self.path, self.cues[:2])
+        with self.transcript as transcript:
+            self.assertEqual(len(transcript), 2)
+        write_binary(self.path, self.cues)
+        self.assertIsNone(self.transcript.buffer)
+
+    def test_not_a_transcript(self):
+        path = os.path.join(self.temp_dir, "other.vtb")
+        with open(path, "wb") as file:
+            file.write(b"WEBVTT\n\n" + bytes(32))
+        with self.assertRaises(ValueError):
+            binaryTranscript(path)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,65 @@
+from backend.utils.concurrencyUtils import workspace, singleFlight
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+
+class ConcurrencyUtilsTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def test_workspace(self):
+        with workspace(self.work_dir) as first, workspace(self.work_dir) as second:
+            self.assertNotEqual(first, second)
+            with open(os.path.join(first, "video.mp4"), "w") as file:
+                file.write("data")
+
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+
+    def test_single_flight_coalesces(self):
+        flights = singleFlight()
+        calls = []
+        results = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do(("toc", "abc"), work)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 8)
+
+        # Once finished, the next call runs again
+        flights.do(("toc", "abc"), work)
+        self.assertEqual(len(calls), 2)
+
+    def test_single_flight_error(self):
+        flights = singleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flights.do("key", fail)
+        self.assertEqual(flights.do("key", lambda: 1), 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
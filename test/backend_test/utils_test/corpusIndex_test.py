@@ -0,0 +1,88 @@
+from backend.utils.corpusIndex import corpusIndex, fts_query, passages
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+
+class CorpusIndexTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.corpus = corpusIndex(os.path.join(self.temp_dir, "corpus"), shards=3)
+        self.corpus.add("cars0000000", [
+            ("00:00:00.000", "Today we test a new electric car."),
+            ("00:00:40.000", "The car handles well on the motorway."),
+            ("00:01:20.000", "Charging the car takes an hour."),
+        ], "Electric cars")
+        self.corpus.add("cooking0000", [
+            ("00:00:00.000", "Welcome to the kitchen."),
+            ("00:00:35.000", "We cook pasta with a tomato sauce."),
+        ], "Pasta")
+        self.corpus.add("mixed000000", [
+            ("00:00:00.000", "I drove my car to the market to buy pasta."),
+        ], "Errands")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_fts_query(self):
+        self.assertEqual(fts_query("machine learning OR neural net*"), '("machine learning") OR ("neural" AND "net"*)')
+        self.assertEqual(fts_query("Don't AND stop"), '("don t" AND "stop")')
+        # FTS5 syntax in the input is quoted away
+        self.assertEqual(fts_query('NEAR(a b) "c'), '("near a b c")')
+        self.assertIsNone(fts_query("*** !!"))
+
+    def test_passages(self):
+        captions = [("00:00:00.000", "a"), ("00:00:10.000", "b "), ("00:00:31.000", "c"), ("00:00:40.000", " ")]
+        self.assertEqual(passages(captions), [("00:00:00.000", "a b"), ("00:00:31.000", "c")])
+
+    def test_search_ranks_across_videos(self):
+        results = self.corpus.search("car", k=10)
+        self.assertEqual({r["video_id"] for r in results}, {"cars0000000", "mixed000000"})
+        self.assertEqual([r["score"] for r in results], sorted((r["score"] for r in results), reverse=True))
+
+        # The passage that mentions the car twice ranks first
+        self.assertEqual(results[0]["video_id"], "cars0000000")
+        self.assertEqual(results[0]["title"], "Electric cars")
+        self.assertIn("[car]", results[0]["snippet"])
+
+    def test_search_syntax(self):
+        self.assertEqual([r["video_id"] for r in self.corpus.search("car AND pasta")], ["mixed000000"])
+        self.assertEqual(len(self.corpus.search("tomato sauce OR motorway")), 2)
+        self.assertEqual([r["timestamp"] for r in self.corpus.search("charg*")], ["00:01:20.000"])
+        self.assertEqual(self.corpus.search("sauce tomato"), [])
+        self.assertEqual(self.corpus.search(""), [])
+
+    def test_search_limits(self):
+        self.assertEqual(len(self.corpus.search("the", k=1)), 1)
+        results = self.corpus.search("car OR pasta", video_ids=["cooking0000"])
+        self.assertEqual({r["video_id"] for r in results}, {"cooking0000"})
+
+    def test_add_replaces_and_remove(self):
+        self.corpus.add("cooking0000", [("00:00:00.000", "Now we bake bread.")], "Bread")
+        self.assertEqual(self.corpus.search("pasta", k=10)[0]["video_id"], "mixed000000")
+        self.assertEqual(self.corpus.search("bread")[0]["title"], "Bread")
+
+        self.assertTrue(self.corpus.remove("mixed000000"))
+        self.assertFalse(self.corpus.remove("mixed000000"))
+        self.assertFalse(self.corpus.contains("mixed000000"))
+        self.assertEqual(self.corpus.search("pasta"), [])
+        self.assertEqual(self.corpus.status(), {"videos": 2, "passages": 4, "shards": 3})
+
+    def test_add_vtt(self):
+        path = os.path.join(self.temp_dir, "video.vtt")
+        with open(path, "w") as file:
+            file.write("WEBVTT\n\n00:00:01.000 --> 00:00:03.000\nA café in Paris\n")
+
+        self.assertEqual(self.corpus.add_vtt("paris000000", path), 1)
+        # Accents are folded
+        self.assertEqual(self.corpus.search("cafe")[0]["video_id"], "paris000000")
+
+        # A second instance, e.g. another worker, sees the same corpus
+        other = corpusIndex(self.corpus.corpus_dir, shards=3)
+        self.assertTrue(other.contains("paris000000"))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,139 @@
+from backend.utils.frameIndex import frameIndex
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import shutil
+import tempfile
+from contextlib import closing
+import numpy as np
+
+COLORS = {"red": (255, 0, 0), "green": (0, 255, 0), "blue": (0, 0, 255)}
+
+
+class stubFrameIndex(frameIndex):
+    """Embeds frames as their normalized mean color and queries as the color they name, instead of running CLIP."""
+
+    def __embed_images__(self, images):
+        vectors = np.array([image.reshape(-1, 3).mean(axis=0) for image in images], np.float32) + 1e-3
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def __embed_texts__(self, texts):
+        vectors = np.array([COLORS.get(text, (1, 1, 1)) for text in texts], np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def frames(colors, seconds=1.0):
+    for i, color in enumerate(colors):
+        yield i * seconds, np.full((32, 48, 3), COLORS[color], np.uint8)
+
+
+class FrameIndexTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.temp_dir, "frames")
+        self.db_path = os.path.join(self.temp_dir, "frames.db")
+        self.index = stubFrameIndex(index_dir=self.index_dir, batch_size=2, db_path=self.db_path)
+        self.colors = ["red", "red", "green", "blue", "green", "red", "blue"]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        reports = []
+        self.assertFalse(self.index.has("video"))
+        count = self.index.build("video", frames(self.colors), lambda *args: reports.append(args))
+
+        self.assertEqual(count, 7)
+        self.assertTrue(self.index.has("video"))
+        self.assertEqual(reports[-1], (7, 7, None))
+        # Reported after every batch of two frames
+        self.assertEqual([done for done, _, _ in reports[:-1]], [2, 4, 6, 7])
+        self.assertEqual(sorted(os.listdir(self.index_dir)), ["video"])
+
+        ranked = self.index.query("video", ["green", "blue"], top_k=2, min_score=0.9)
+        self.assertEqual(sorted(number for number, _, _ in ranked["green"]), [2, 4])
+        self.assertEqual(sorted(timestamp for _, timestamp, _ in ranked["blue"]), [3.0, 6.0])
+        for _, _, score in ranked["green"]:
+            self.assertAlmostEqual(score, 1.0, places=3)
+
+        # The stored JPEGs decode to the indexed frames
+        images = self.index.frames("video", [3, 0])
+        self.assertEqual(images[0].shape, (32, 48, 3))
+        np.testing.assert_allclose(images[0].reshape(-1, 3).mean(axis=0), COLORS["blue"], atol=3)
+        np.testing.assert_allclose(images[1].reshape(-1, 3).mean(axis=0), COLORS["red"], atol=3)
+
+        # Another worker process sees the index
+        other = stubFrameIndex(index_dir=self.index_dir, db_path=self.db_path)
+        self.assertTrue(other.has("video"))
+
+    def test_top_k_and_min_score(self):
+        self.index.build("video", frames(self.colors))
+
+        # Fewer frames than asked for
+        self.assertEqual(len(self.index.query("video", ["red"], top_k=100)["red"]), 7)
+        # Frames below the minimum score are dropped
+        self.assertEqual(len(self.index.query("video", ["red"], top_k=7, min_score=0.9)["red"]), 3)
+        # top_k grows with the number of frames
+        self.assertEqual(len(self.index.query("video", ["red"], top_k=1, top_fraction=0.5)["red"]), 4)
+
+    def test_empty_video(self):
+        self.assertEqual(self.index.build("empty", iter([])), 0)
+        self.assertTrue(self.index.has("empty"))
+        self.assertEqual(self.index.query("empty", ["red"], top_k=3), {"red": []})
+
+    def test_lru_eviction(self):
+        self.index.build("first", frames(self.colors))
+        size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(self.index_dir, "first")))
+        # Room for two indexes
+        self.index.max_bytes = size * 5 // 2
+
+        self.index.build("second", frames(self.colors))
+        time.sleep(0.01)
+        self.assertTrue(self.index.has("first"))
+        self.index.build("third", frames(self.colors))
+
+        self.assertTrue(self.index.has("first"))
+        self.assertFalse(self.index.has("second"))
+        self.assertTrue(self.index.has("third"))
+        self.assertFalse(os.path.exists(os.path.join(self.index_dir, "second")))
+
+    def test_created_is_read_only(self):
+        self.assertIsNone(self.index.created("video"))
+        self.index.build("video", frames(self.colors))
+
+        def accessed():
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                return conn.execute("SELECT accessed FROM frame_indexes").fetchone()[0]
+
+        before = accessed()
+        time.sleep(0.01)
+        self.assertIsNotNone(self.index.created("video"))
+        self.assertEqual(accessed(), before)
+
+    def test_partly_removed(self):
+        self.index.build("video", frames(self.colors))
+        # Another worker is removing the index
+        os.remove(os.path.join(self.index_dir, "video", "frames.bin"))
+
+        self.assertFalse(self.index.has("video"))
+        with self.assertRaises(FileNotFoundError):
+            self.index.frames("video", [0])
+
+    def test_expiry(self):
+        self.index.build("video", frames(self.colors))
+        self.index.ttl = 0
+        time.sleep(0.01)
+
+        self.assertFalse(self.index.has("video"))
+        self.assertFalse(os.path.exists(os.path.join(self.index_dir, "video")))
+
+        # Indexed again from scratch
+        self.index.ttl = 3600
+        self.assertEqual(self.index.build("video", frames(self.colors[:2])), 2)
+        self.assertTrue(self.index.has("video"))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
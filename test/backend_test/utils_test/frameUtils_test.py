@@ -0,0 +1,202 @@
+from backend.utils.frameUtils import (
+    stream_frames, sample_frames, sample_window, full_resolution, merge_intervals, dhash, dedup_frames, batches,
+    prefetch,
+)
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import functools
+import subprocess
+import threading
+import pytest
+import numpy as np
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_video(path, duration=2):
+    """Writes a test video with a single scene cut in the middle."""
+    subprocess.check_call([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={duration}",
+        "-f", "lavfi", "-i", f"color=red:size=160x120:rate=10:duration={duration}",
+        "-filter_complex", "[0][1]concat=n=2:v=1",
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart", path,
+    ])
+
+
+class HeaderRecordingHandler(SimpleHTTPRequestHandler):
+    """Serves files and remembers the headers of the requests."""
+    requests = []
+
+    def do_GET(self):
+        HeaderRecordingHandler.requests.append(dict(self.headers))
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+class FrameUtilsTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_file = os.path.join(self.temp_dir, "test.mp4")
+        make_video(self.video_file)
+
+    def test_stream_frames(self):
+        frames = list(stream_frames(self.video_file))
+
+        timestamps = [t for t, _ in frames]
+        self.assertEqual(timestamps[0], 0.0)
+        self.assertIn(2.0, timestamps)
+        for _, frame in frames:
+            self.assertEqual(frame.shape, (120, 160, 3))
+
+        # The second scene is plain red
+        red = dict(frames)[2.0]
+        self.assertGreater(red[..., 0].mean(), 200)
+        self.assertLess(red[..., 1].mean(), 50)
+
+    def test_stop_early(self):
+        frames = stream_frames(self.video_file, select="select=1")
+        next(frames)
+        frames.close()
+
+    def test_sampling_strategies(self):
+        stats = {}
+        frames = list(sample_frames(self.video_file, "fps", fps=2, stats=stats))
+        self.assertEqual([t for t, _ in frames], [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5])
+        self.assertEqual(stats, {"strategy": "fps", "frames_decoded": 40, "frames_selected": 8})
+
+        stats = {}
+        frames = list(sample_frames(self.video_file, "keyframes", stats=stats))
+        self.assertEqual(frames[0][0], 0.0)
+        self.assertEqual(stats["frames_decoded"], stats["frames_selected"])
+        self.assertLess(stats["frames_decoded"], 40)
+
+        stats = {}
+        frames = list(sample_frames(self.video_file, "scene_low", width=80, stats=stats))
+        self.assertEqual([t for t, _ in frames], [0.0, 2.0])
+        # Scored at 80 px, returned at full resolution
+        self.assertEqual(frames[0][1].shape, (120, 160, 3))
+        self.assertTrue(np.array_equal(frames[1][1], dict(stream_frames(self.video_file))[2.0]))
+        # All 40 frames are scored, then the second pass decodes until just after the last selected frame
+        self.assertGreater(stats["frames_decoded"], 40)
+        self.assertLess(stats["frames_decoded"], 80)
+
+        with self.assertRaises(ValueError):
+            next(sample_frames(self.video_file, "unknown"))
+
+    def test_full_resolution_passes(self):
+        frames = list(stream_frames(self.video_file, None))
+        chosen = frames[3::9]
+
+        # One pass per two frames; the passes after the first seek to their frames
+        stats = {}
+        full = list(full_resolution(self.video_file, ((t, None) for t, _ in chosen), stats, pass_frames=2))
+        self.assertEqual([t for t, _ in full], [t for t, _ in chosen])
+        for (_, expected), (_, image) in zip(chosen, full):
+            self.assertTrue(np.array_equal(image, expected))
+        self.assertGreater(stats["frames_decoded"], 0)
+
+    def test_frames_per_minute(self):
+        stats = {}
+        frames = list(sample_frames(self.video_file, "fps", fps=5, per_minute=60, stats=stats))
+        self.assertEqual([t for t, _ in frames], [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(stats["frames_selected"], 4)
+
+    def test_sample_window(self):
+        frames = list(sample_window(self.video_file, 1.5, 1.0, 2))
+        self.assertEqual([t for t, _ in frames], [1.5, 2.0])
+
+        # The second frame is past the scene cut and plain red
+        self.assertGreater(frames[1][1][..., 0].mean(), 200)
+
+    def test_stream_from_url(self):
+        handler = functools.partial(HeaderRecordingHandler, directory=self.temp_dir)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/test.mp4"
+            streamed = list(stream_frames({"url": url, "headers": {"X-Test": "vidify"}}))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        local = list(stream_frames(self.video_file))
+        self.assertEqual([t for t, _ in streamed], [t for t, _ in local])
+        for (_, a), (_, b) in zip(streamed, local):
+            self.assertTrue((a == b).all())
+        self.assertEqual(HeaderRecordingHandler.requests[0].get("X-Test"), "vidify")
+
+    def test_batches_and_prefetch(self):
+        all_frames = list(stream_frames(self.video_file, select="select=1"))
+        batched = list(prefetch(batches(stream_frames(self.video_file, select="select=1"), 16)))
+
+        self.assertEqual([len(b[0]) for b in batched], [16, 16, 8])
+        self.assertEqual(
+            [t for timestamps, _ in batched for t in timestamps],
+            [t for t, _ in all_frames],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+def gradient(flip=False, noise=0):
+    """A horizontal gradient frame, optionally mirrored and with a few changed pixels."""
+    row = np.linspace(0, 255, 64, dtype=np.uint8)
+    image = np.repeat(np.repeat(row[None, :, None], 48, axis=0), 3, axis=2)
+    if flip:
+        image = image[:, ::-1].copy()
+    image[:noise, :noise] = 0
+    return image
+
+
+class DedupTestSuite(unittest.TestCase):
+    def test_dhash(self):
+        self.assertEqual(dhash(gradient()), dhash(gradient(noise=2)))
+        self.assertGreater(bin(dhash(gradient()) ^ dhash(gradient(flip=True))).count("1"), 32)
+
+    def test_dedup_frames(self):
+        frames = [
+            (0.0, gradient()), (1.0, gradient(noise=2)), (2.0, gradient()),
+            (3.0, gradient(flip=True)), (4.0, gradient()),
+        ]
+        stats = {}
+        runs = list(dedup_frames(iter(frames), max_distance=4, stats=stats))
+
+        self.assertEqual([run for run, _ in runs], [[0.0, 1.0, 2.0], [3.0], [4.0]])
+        self.assertIs(runs[0][1], frames[0][1])
+        self.assertEqual(stats, {"frames_deduplicated": 2})
+
+    def test_dedup_disabled(self):
+        frames = [(float(i), gradient()) for i in range(3)]
+        self.assertEqual([run for run, _ in dedup_frames(iter(frames), max_distance=-1)], [[0.0], [1.0], [2.0]])
+
+
+class MergeIntervalsTestSuite(unittest.TestCase):
+    def test_merge_intervals(self):
+        self.assertEqual(merge_intervals([(4, 6), (0, 2), (1, 3)]), [(0, 3), (4, 6)])
+        points = [(t, t) for t in [5.0, 1.0, 1.5, 2.0]]
+        self.assertEqual(merge_intervals(points, max_gap=0.75), [(1.0, 2.0), (5.0, 5.0)])
+        self.assertEqual(merge_intervals([]), [])
+
+
+class PrefetchTestSuite(unittest.TestCase):
+    def test_prefetch_order(self):
+        self.assertEqual(list(prefetch(iter(range(10)), depth=3)), list(range(10)))
+
+    def test_prefetch_error(self):
+        def failing():
+            yield 1
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            list(prefetch(failing()))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
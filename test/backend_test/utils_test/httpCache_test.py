@@ -0,0 +1,130 @@
+from backend.utils.httpCache import httpCache, etag, request_etag, matches, encoding
+from flask import Flask, jsonify, request
+import unittest
+import sys
+import gzip
+import json
+
+
+class HttpCacheTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.app = Flask(__name__)
+        cache = httpCache(cache_control="public, max-age=60", min_bytes=100)
+
+        @self.app.route("/toc")
+        @cache.cached
+        def toc():
+            self.calls += 1
+            if request.args.get("fail"):
+                return jsonify({"message": "Invalid"}), 400
+            size = int(request.args.get("size", 10))
+            return jsonify({"results": [{"timestamp": f"0:{i:02}", "text": "chapter"} for i in range(size)]}), 200
+
+        # Stands in for the version of a cached transcript, shared by every worker
+        self.state = None
+        self.versioned_calls = 0
+
+        @self.app.route("/transcript_search")
+        @cache.cached(version=lambda: self.state)
+        def transcript_search():
+            self.versioned_calls += 1
+            self.state = self.state or "youtube:1"
+            return jsonify({"results": [request.args.get("keyword")]}), 200
+
+        self.cache = cache
+        self.client = self.app.test_client()
+
+    def test_validators(self):
+        self.assertEqual(etag(b"a"), etag(b"a"))
+        self.assertNotEqual(etag(b"a"), etag(b"b"))
+        self.assertTrue(etag(b"a").startswith('W/"'))
+
+        tag = etag(b"a")
+        self.assertTrue(matches(tag, tag))
+        self.assertTrue(matches(f'"other", {tag.removeprefix("W/")}', tag))
+        self.assertTrue(matches("*", tag))
+        self.assertFalse(matches('"other"', tag))
+        self.assertFalse(matches(None, tag))
+
+    def test_encoding(self):
+        self.assertEqual(encoding("gzip, deflate"), "gzip")
+        self.assertEqual(encoding("gzip;q=0, deflate"), None)
+        self.assertEqual(encoding(""), None)
+        self.assertIn(encoding("br, gzip"), ("br", "gzip"))
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get("/toc?size=3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+        self.assertEqual(response.headers["ETag"], etag(response.data))
+        self.assertEqual(len(response.get_json()["results"]), 3)
+
+        response = self.client.get("/toc?size=3", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertIn("ETag", response.headers)
+
+        # Both requests were answered with one computation
+        self.assertEqual(self.calls, 1)
+
+    def test_etag_before_view(self):
+        response = self.client.get("/transcript_search?keyword=cat")
+        tag = response.headers["ETag"]
+        self.assertEqual(tag, request_etag(("/transcript_search", (("keyword", "cat"),)), "youtube:1"))
+
+        # Another worker, without the response in its memory, answers from the version alone
+        other = httpCache()
+        self.app.view_functions["transcript_search"] = other.cached(
+            self.app.view_functions["transcript_search"].__wrapped__, version=lambda: self.state
+        )
+        response = self.client.get("/transcript_search?keyword=cat", headers={"If-None-Match": tag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], tag)
+        self.assertEqual(self.versioned_calls, 1)
+
+        # A new transcript changes the ETag
+        self.state = "whisper:2"
+        response = self.client.get("/transcript_search?keyword=cat", headers={"If-None-Match": tag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], tag)
+        self.assertEqual(self.versioned_calls, 2)
+
+    def test_response_cache_key(self):
+        self.client.get("/toc?size=3&x=1")
+        self.client.get("/toc?x=1&size=3")
+        self.assertEqual(self.calls, 1)
+        self.client.get("/toc?size=4")
+        self.assertEqual(self.calls, 2)
+
+        self.cache.clear("/toc")
+        self.client.get("/toc?size=4")
+        self.assertEqual(self.calls, 3)
+
+    def test_errors_are_not_cached(self):
+        for _ in range(2):
+            response = self.client.get("/toc?fail=1")
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn("ETag", response.headers)
+        self.assertEqual(self.calls, 2)
+
+    def test_compression(self):
+        response = self.client.get("/toc?size=200", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        body = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(body["results"]), 200)
+        self.assertLess(len(response.data), len(json.dumps(body)))
+
+        # The ETag doesn't depend on the coding
+        plain = self.client.get("/toc?size=200")
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(plain.headers["ETag"], response.headers["ETag"])
+
+        # Small responses are not compressed
+        small = self.client.get("/toc?size=1", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", small.headers)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
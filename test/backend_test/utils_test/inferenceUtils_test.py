@@ -0,0 +1,18 @@
+from backend.utils.inferenceUtils import resolve_backend
+import unittest
+import sys
+
+
+class InferenceUtilsTestSuite(unittest.TestCase):
+    def test_resolve_backend(self):
+        self.assertEqual(resolve_backend("int8", "cpu"), "int8")
+        self.assertEqual(resolve_backend("onnx", "cpu"), "onnx")
+        # The optimized backends target CPU nodes
+        self.assertEqual(resolve_backend("int8", "cuda"), "torch")
+
+        with self.assertRaises(ValueError):
+            resolve_backend("tensorrt", "cpu")
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
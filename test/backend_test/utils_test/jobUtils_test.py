@@ -0,0 +1,138 @@
+from backend.utils.jobUtils import jobManager, DONE, FAILED, QUEUED, RUNNING, JOB_STALE_AFTER
+import unittest
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+
+def wait_for(jobs, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+class JobUtilsTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "jobs.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_job_result(self):
+        jobs = jobManager(workers=1, db_path=self.db_path)
+
+        def task(progress):
+            progress(1, None, {"cat": [1.0]})
+            return {"message": "Done.", "results": [1, 2]}, 200
+
+        job_id = jobs.submit("toc", task)
+        job = wait_for(jobs, job_id)
+
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["status_code"], 200)
+        self.assertEqual(job["results"], [1, 2])
+        self.assertEqual(job["progress"], {"frames_done": 1, "frames_total": None})
+
+    def test_progress(self):
+        jobs = jobManager(workers=1, db_path=self.db_path)
+        reported = threading.Event()
+        release = threading.Event()
+
+        def task(progress):
+            progress(3, None, {"cat": [1.0]})
+            # Within the progress interval, not written
+            progress(6, None, {"cat": [1.0, 2.0]})
+            reported.set()
+            release.wait(5)
+            progress(9, 9, {"cat": [1.0, 2.0]})
+            return {"results": [{"object": "cat", "timestamps": [1.0, 2.0]}]}, 200
+
+        job_id = jobs.submit("toc", task)
+        reported.wait(5)
+
+        job = jobs.get(job_id)
+        self.assertEqual(job["status"], RUNNING)
+        self.assertEqual(job["progress"], {"frames_done": 3, "frames_total": None})
+        # Results are only stored when the job finishes
+        self.assertIsNone(job["results"])
+
+        release.set()
+        job = wait_for(jobs, job_id)
+        self.assertEqual(job["progress"], {"frames_done": 9, "frames_total": 9})
+        self.assertEqual(job["results"], [{"object": "cat", "timestamps": [1.0, 2.0]}])
+
+    def test_failed_job(self):
+        jobs = jobManager(workers=1, db_path=self.db_path)
+
+        def task(progress):
+            raise RuntimeError("boom")
+
+        job = wait_for(jobs, jobs.submit("toc", task))
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "boom")
+
+    def test_queue_limit(self):
+        jobs = jobManager(workers=1, queue_limit=1, db_path=self.db_path)
+        release = threading.Event()
+
+        job_id = jobs.submit("toc", lambda progress: (release.wait(5), ({}, 200))[1])
+        self.assertIsNone(jobs.submit("toc", lambda progress: ({}, 200)))
+
+        release.set()
+        wait_for(jobs, job_id)
+        job_id = jobs.submit("toc", lambda progress: ({}, 200))
+        self.assertIsNotNone(job_id)
+        wait_for(jobs, job_id)
+
+    def test_retention(self):
+        jobs = jobManager(workers=1, retention=0, db_path=self.db_path)
+        job_id = jobs.submit("toc", lambda progress: ({}, 200))
+        wait_for(jobs, job_id)
+        time.sleep(0.01)
+
+        self.assertIsNone(jobs.get(job_id))
+        self.assertIsNone(jobs.get("unknown"))
+
+    def test_shared_between_processes(self):
+        jobs = jobManager(workers=1, db_path=self.db_path)
+        job_id = jobs.submit("toc", lambda progress: ({"results": ["chapter"]}, 200))
+        wait_for(jobs, job_id)
+
+        # Another worker process or a restarted one sees the job
+        other = jobManager(workers=1, db_path=self.db_path)
+        job = other.get(job_id)
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["results"], ["chapter"])
+
+    def test_interrupted_job(self):
+        jobs = jobManager(workers=1, queue_limit=1, db_path=self.db_path)
+        release = threading.Event()
+        job_id = jobs.submit("toc", lambda progress: (release.wait(5), ({}, 200))[1])
+        while jobs.get(job_id)["status"] == QUEUED:
+            time.sleep(0.01)
+
+        # The process running the job stopped refreshing it
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ?", (time.time() - JOB_STALE_AFTER - 1,))
+
+        job = jobManager(workers=1, db_path=self.db_path).get(job_id)
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["status_code"], 500)
+        # It no longer counts towards the queue limit
+        other_id = jobs.submit("toc", lambda progress: ({}, 200))
+        self.assertIsNotNone(other_id)
+        release.set()
+        wait_for(jobs, other_id)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
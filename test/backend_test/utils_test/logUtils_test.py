@@ -0,0 +1,31 @@
+from backend.utils.logUtils import jsonFormatter
+import unittest
+import sys
+import json
+import logging
+
+
+class LogUtilsTestSuite(unittest.TestCase):
+    def test_json_format(self):
+        record = logging.LogRecord("vidify", logging.INFO, __file__, 1, "Frames %s", ("sampled",), None)
+        record.frames_selected = 12
+
+        entry = json.loads(jsonFormatter().format(record))
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "vidify")
+        self.assertEqual(entry["message"], "Frames sampled")
+        self.assertEqual(entry["frames_selected"], 12)
+        self.assertNotIn("args", entry)
+
+    def test_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("vidify", logging.ERROR, __file__, 1, "Failed", (), sys.exc_info())
+
+        entry = json.loads(jsonFormatter().format(record))
+        self.assertIn("ValueError: boom", entry["exception"])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
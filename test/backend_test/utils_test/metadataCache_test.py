@@ -0,0 +1,129 @@
+from backend.utils.metadataCache import metadataCache, video_key, url_expiry, info_expiry
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    """Serves files and counts the requests for each path."""
+    counts = {}
+
+    def do_GET(self):
+        CountingHandler.counts[self.path] = CountingHandler.counts.get(self.path, 0) + 1
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetadataCacheTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.temp_dir, "clip.mp4"), "wb") as file:
+            file.write(os.urandom(4096))
+        with open(os.path.join(self.temp_dir, "captions.vtt"), "w") as file:
+            file.write("WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nhello\n")
+
+        CountingHandler.counts = {}
+        handler = functools.partial(CountingHandler, directory=self.temp_dir)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_video_key(self):
+        self.assertEqual(video_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10"), "dQw4w9WgXcQ")
+        self.assertEqual(video_key("https://youtu.be/dQw4w9WgXcQ"), "dQw4w9WgXcQ")
+        self.assertEqual(video_key("http://example.com/clip.mp4"), "http://example.com/clip.mp4")
+
+    def test_url_expiry(self):
+        self.assertEqual(url_expiry("https://r1.googlevideo.com/videoplayback?expire=1700000000&id=1"), 1700000000)
+        self.assertEqual(url_expiry("https://manifest.googlevideo.com/api/manifest/expire/1700000500/ei/x"), 1700000500)
+        self.assertIsNone(url_expiry("https://www.youtube.com/api/timedtext?v=x&lang=en"))
+
+    def test_info_expiry(self):
+        now = time.time()
+        expire = int(now) + 1000
+        info = {
+            "formats": [{"url": f"https://a/videoplayback?expire={expire + 500}"}, {"url": None}],
+            "automatic_captions": {"en": [{"url": f"https://a/timedtext?expire={expire}"}]},
+        }
+        # The earliest URL expiry, less the margin
+        self.assertEqual(info_expiry(info, ttl=3600, margin=100), expire - 100)
+        # Metadata without expiring URLs lives for the ttl
+        self.assertAlmostEqual(info_expiry({"formats": [{"url": "https://a/b"}]}, ttl=60), now + 60, delta=5)
+
+    def test_get_resolves_once(self):
+        cache = metadataCache(cookiefile=None)
+        url = f"{self.base}/clip.mp4"
+
+        first = cache.get(url)
+        self.assertEqual(first["url"], url)
+        requests = CountingHandler.counts.get("/clip.mp4", 0)
+        self.assertGreater(requests, 0)
+
+        self.assertIs(cache.get(url), first)
+        self.assertEqual(CountingHandler.counts["/clip.mp4"], requests)
+        self.assertEqual(cache.status(), {"videos": 1, "hits": 1, "misses": 1})
+
+        cache.invalidate(url)
+        cache.get(url)
+        self.assertGreater(CountingHandler.counts["/clip.mp4"], requests)
+
+    def test_expired_and_evicted(self):
+        cache = metadataCache(ttl=-1, cookiefile=None)
+        url = f"{self.base}/clip.mp4"
+        cache.get(url)
+        cache.get(url)
+        self.assertEqual(cache.status()["misses"], 2)
+
+        cache = metadataCache(size=1, cookiefile=None)
+        cache.entries["other"] = ({}, time.time() + 60)
+        cache.get(url)
+        self.assertEqual(list(cache.entries), [url])
+
+    def test_process_downloads_from_cached_metadata(self):
+        cache = metadataCache(cookiefile=None)
+        url = f"{self.base}/clip.mp4"
+        cache.get(url)
+
+        output = os.path.join(self.temp_dir, "out", "video.%(ext)s")
+        info = cache.process(url, {"outtmpl": output, "format": "worst", "quiet": True}, download=True)
+        path = info["requested_downloads"][0]["filepath"]
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.path.getsize(path), 4096)
+        # The cached metadata is left as it was
+        self.assertNotIn("requested_downloads", cache.get(url))
+
+    def test_captions_and_fetch(self):
+        cache = metadataCache(cookiefile=None)
+        url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        cache.entries[video_key(url)] = ({
+            "subtitles": {"de": [{"ext": "vtt", "url": "https://a/de.vtt"}]},
+            "automatic_captions": {"en-orig": [
+                {"ext": "json3", "url": "https://a/en.json3"},
+                {"ext": "vtt", "url": f"{self.base}/captions.vtt"},
+            ]},
+        }, time.time() + 60)
+
+        caption_url = cache.captions(url)
+        self.assertEqual(caption_url, f"{self.base}/captions.vtt")
+        self.assertIsNone(cache.captions(url, lang="fr"))
+
+        response = cache.fetch(caption_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hello", response.text)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
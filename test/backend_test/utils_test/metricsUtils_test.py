@@ -0,0 +1,53 @@
+from backend.utils.metricsUtils import (
+    DOWNLOAD_SECONDS, INFERENCE_SECONDS, FRAME_EXTRACTION_SECONDS, REGISTRY, observe, observe_inference, timed_iter,
+    render,
+)
+import unittest
+import sys
+import time
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsUtilsTestSuite(unittest.TestCase):
+    def test_observe(self):
+        before = sample("vidify_download_seconds_count", kind="test")
+        with observe(DOWNLOAD_SECONDS, kind="test"):
+            pass
+        self.assertEqual(sample("vidify_download_seconds_count", kind="test"), before + 1)
+
+    def test_observe_inference(self):
+        before = sample("vidify_inference_seconds_per_frame_count", model="test")
+        observe_inference("test", 0.8, 4)
+        self.assertEqual(sample("vidify_inference_seconds_per_frame_count", model="test"), before + 4)
+        self.assertGreaterEqual(sample("vidify_inference_seconds_per_frame_bucket", model="test", le="0.25"), 4)
+
+    def test_timed_iter(self):
+        def produce():
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        before = sample("vidify_frame_extraction_seconds_sum", strategy="test")
+        items = []
+        for item in timed_iter(produce(), FRAME_EXTRACTION_SECONDS, strategy="test"):
+            # Time spent by the consumer is not counted
+            time.sleep(0.05)
+            items.append(item)
+
+        busy = sample("vidify_frame_extraction_seconds_sum", strategy="test") - before
+        self.assertEqual(items, [0, 1, 2])
+        self.assertGreaterEqual(busy, 0.03)
+        self.assertLess(busy, 0.15)
+
+    def test_render(self):
+        INFERENCE_SECONDS.labels(model="render").observe(0.1)
+        data, content_type = render()
+        self.assertIn(b'vidify_inference_seconds_per_frame_count{model="render"}', data)
+        self.assertTrue(content_type.startswith("text/plain"))
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
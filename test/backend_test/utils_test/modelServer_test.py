@@ -0,0 +1,98 @@
+from backend.utils.modelServer import modelServer, modelClient, remoteEngine
+import unittest
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import threading
+import time
+
+
+class ModelServerTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.address = os.path.join(self.temp_dir, "models.sock")
+        self.batch_sizes = []
+
+        def detect(items):
+            self.batch_sizes.append(len(items))
+            time.sleep(0.05)
+            return [item * 2 for item in items]
+
+        def ground(items, labels):
+            return [(item, labels) for item in items]
+
+        def fail(items):
+            raise ValueError("boom")
+
+        self.server = modelServer(
+            handlers={"detect": detect, "ground": ground, "fail": fail},
+            calls={"transcribe": lambda path: [{"start": 0.0, "end": 1.0, "text": path}]},
+            address=self.address,
+        )
+        threading.Thread(target=self.server.serve, daemon=True).start()
+        deadline = time.time() + 5
+        while self.server.listener is None and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_call(self):
+        client = modelClient(self.address)
+        self.assertEqual(client.call("detect", [1, 2, 3]), [2, 4, 6])
+        self.assertEqual(client.call("ground", [1], ("cat", "dog")), [(1, ("cat", "dog"))])
+
+    def test_batches_concurrent_requests(self):
+        client = modelClient(self.address)
+        results = {}
+
+        def work(i):
+            results[i] = client.call("detect", [i, i])
+
+        # The first request occupies the model, the others queue up and share the next pass
+        first = threading.Thread(target=work, args=(0,))
+        first.start()
+        time.sleep(0.02)
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(1, 6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads + [first]:
+            thread.join()
+
+        self.assertEqual(results, {i: [i * 2, i * 2] for i in range(6)})
+        self.assertEqual(sum(self.batch_sizes), 12)
+        self.assertLess(len(self.batch_sizes), 6)
+
+    def test_errors(self):
+        client = modelClient(self.address)
+        with self.assertRaises(RuntimeError):
+            client.call("fail", [1])
+        with self.assertRaises(RuntimeError):
+            client.call("unknown", [1])
+        # The connection is still usable
+        self.assertEqual(client.call("detect", [1]), [2])
+
+    def test_remote_engine(self):
+        engine = remoteEngine(modelClient(self.address))
+        segments = engine.transcribe("audio.mp3")
+        self.assertEqual(segments[0]["text"], os.path.abspath("audio.mp3"))
+
+    def test_private_socket_and_key(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.address).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.address + ".key").st_mode), 0o600)
+        self.assertGreaterEqual(len(open(self.address + ".key", "rb").read()), 64)
+
+    def test_wrong_key(self):
+        with self.assertRaises(Exception):
+            modelClient(self.address, authkey=b"vidify").call("detect", [1])
+
+    def test_unavailable(self):
+        with self.assertRaises(ConnectionError):
+            modelClient(os.path.join(self.temp_dir, "missing.sock")).call("detect", [1])
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,84 @@
+from backend.utils.modelUtils import lazyModel, registry, warm_up, timed, set_memory_budget, memory_status, model_size
+import unittest
+import sys
+import numpy as np
+import time
+import threading
+
+
+class ModelUtilsTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.loads = 0
+
+    def loader(self):
+        self.loads += 1
+        time.sleep(0.05)
+        return object()
+
+    def test_lazy_load(self):
+        model = lazyModel("test_lazy", self.loader)
+        self.assertFalse(model.loaded)
+        self.assertEqual(self.loads, 0)
+
+        first = model.get()
+        self.assertTrue(model.loaded)
+        self.assertIs(model.get(), first)
+        self.assertEqual(self.loads, 1)
+        self.assertIsNotNone(model.status()["load_seconds"])
+
+    def test_concurrent_first_use(self):
+        model = lazyModel("test_concurrent", self.loader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(model.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test_warm_up(self):
+        model = lazyModel("test_warm_up", self.loader)
+        warm_up(["test_warm_up", "unknown"]).join()
+        self.assertTrue(model.loaded)
+
+    def test_memory_budget(self):
+        # Three models of 4 MB, of which two fit in the budget
+        models = [lazyModel(f"test_budget_{i}", lambda: np.zeros(2 ** 22, np.uint8)) for i in range(3)]
+        set_memory_budget(9)
+
+        models[0].get()
+        models[1].get()
+        models[0].get()
+        models[2].get()
+
+        # The least recently used model made room
+        self.assertEqual([model.loaded for model in models], [True, False, True])
+        self.assertEqual(models[1].status()["unloads"], 1)
+        self.assertEqual(models[2].status()["size_mb"], 4.0)
+        self.assertEqual(memory_status(), {"budget_mb": 9.0, "resident_mb": 8.0})
+
+        # Reloaded on demand, with room made before loading since its size is known
+        models[1].get()
+        self.assertEqual([model.loaded for model in models], [False, True, True])
+        self.assertEqual(models[1].status()["loads"], 2)
+
+    def test_model_size(self):
+        self.assertEqual(model_size((np.zeros(10, np.float32), np.zeros(6, np.uint8))), 46)
+        self.assertEqual(model_size(object()), 0)
+
+    def test_timed(self):
+        timings = {}
+        with timed(timings, "phase"):
+            time.sleep(0.01)
+        self.assertGreaterEqual(timings["phase"], 0.01)
+
+    def tearDown(self):
+        set_memory_budget(0)
+        for name in ["test_lazy", "test_concurrent", "test_warm_up", "test_budget_0", "test_budget_1", "test_budget_2"]:
+            registry.pop(name, None)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
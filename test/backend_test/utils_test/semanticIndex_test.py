@@ -0,0 +1,119 @@
+from backend.utils.semanticIndex import semanticIndex
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+# Words the stub model treats as meaning the same
+TOPICS = {"car": 0, "automobile": 0, "vehicle": 0, "drive": 0, "pasta": 1, "cook": 1, "sauce": 1, "guitar": 2}
+
+
+class stubSemanticIndex(semanticIndex):
+    """Embeds texts as normalized counts of their topics instead of running a model."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.embedded = 0
+
+    def __embed__(self, texts):
+        self.embedded += len(texts)
+        vectors = np.zeros((len(texts), 4), np.float32)
+        # Texts without a topic point to a topic of their own
+        vectors[:, 3] = 1e-3
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(".", "").split():
+                if word in TOPICS:
+                    vectors[row, TOPICS[word]] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class SemanticIndexTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = stubSemanticIndex(index_dir=self.temp_dir, batch_size=4)
+        self.captions = [
+            ("00:00:01.000", "Welcome back."),
+            ("00:00:05.000", "Today I drive my car."),
+            ("00:00:09.000", "It is fast."),
+            ("00:00:13.000", "Anyway."),
+            ("00:00:17.000", "Hello there."),
+            ("00:00:21.000", "Now we cook pasta."),
+            ("00:00:25.000", "With a tomato sauce."),
+            ("00:00:29.000", "Goodbye."),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_build(self):
+        self.assertFalse(self.index.has("video", 1.0))
+        self.assertEqual(self.index.build("video", self.captions, 1.0), 6)
+
+        self.assertTrue(self.index.has("video", 1.0))
+        # A changed transcript is embedded again
+        self.assertFalse(self.index.has("video", 2.0))
+
+        embeddings = np.load(os.path.join(self.temp_dir, "video", "embeddings.npy"))
+        self.assertEqual(embeddings.shape, (6, 4))
+        self.assertEqual(embeddings.dtype, np.float32)
+
+    def test_query(self):
+        self.index.build("video", self.captions, 1.0)
+        embedded = self.index.embedded
+
+        results = self.index.query("video", "automobile", top_k=5)
+        # Overlapping windows about the car are returned once
+        self.assertEqual(len(results), 1)
+        timestamp, text, score = results[0]
+        self.assertIn(timestamp, ("00:00:01.000", "00:00:05.000"))
+        self.assertIn("car", text)
+        self.assertGreater(score, 0.9)
+
+        results = self.index.query("video", "sauce OR guitar", top_k=5)
+        self.assertTrue(all("pasta" in text or "sauce" in text for _, text, _ in results))
+        self.assertEqual([s for _, _, s in results], sorted((s for _, _, s in results), reverse=True))
+
+        # Only the queries were embedded, not the captions again
+        self.assertEqual(self.index.embedded, embedded + 2)
+        self.assertEqual(self.index.query("video", "guitar", min_score=0.5), [])
+        self.assertEqual(self.index.query("video", "car", top_k=0), [])
+
+    def test_short_transcripts(self):
+        self.assertEqual(self.index.build("short", self.captions[1:2], 1.0), 1)
+        self.assertEqual(self.index.query("short", "vehicle")[0][1], "Today I drive my car.")
+
+        self.assertEqual(self.index.build("empty", [("00:00:01.000", " ")], 1.0), 0)
+        self.assertEqual(self.index.query("empty", "vehicle"), [])
+
+    def test_rebuild_while_searching(self):
+        self.index.build("video", self.captions, 1.0)
+        errors = []
+        done = threading.Event()
+
+        def search():
+            while not done.is_set():
+                try:
+                    self.assertEqual(self.index.query("video", "vehicle")[0][0], "00:00:01.000")
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for version in range(2, 30):
+            self.index.build("video", self.captions, float(version))
+        done.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(self.index.has("video", 29.0))
+        # The replaced indexes are gone
+        self.assertEqual(os.listdir(self.temp_dir), ["video"])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,103 @@
+from backend.utils.transcriptCache import transcriptCache, SOURCE_YOUTUBE, SOURCE_WHISPER
+from backend.utils.binaryTranscript import binaryTranscript
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import shutil
+import tempfile
+from contextlib import closing
+
+
+class TranscriptCacheTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "subtitles")
+        self.db_path = os.path.join(self.temp_dir, "cache.db")
+        self.semantic_dir = os.path.join(self.temp_dir, "transcripts")
+
+    def write_transcript(self, name, size=100):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("WEBVTT\n\n" + "a" * size)
+        return path
+
+    def test_put_and_get(self):
+        cache = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir)
+        self.assertIsNone(cache.get("W86cTIoMv2U"))
+
+        entry = cache.put("W86cTIoMv2U", self.write_transcript("a.part"), SOURCE_YOUTUBE)
+        self.assertEqual((entry["file"], entry["source"]), ("W86cTIoMv2U.vtt", SOURCE_YOUTUBE))
+        self.assertLessEqual(entry["created"], time.time())
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "W86cTIoMv2U.vtt")))
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "W86cTIoMv2U.vtb")))
+
+        # A second instance (another worker) sees the same entry
+        other = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir)
+        self.assertEqual(other.get("W86cTIoMv2U"), entry)
+
+    def test_lru_eviction(self):
+        cache = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir)
+        cache.put("aaaaaaaaaaa", self.write_transcript("a.part"), SOURCE_YOUTUBE)
+        # Room for two transcripts, counting their binary form
+        entry_size = sum(os.path.getsize(os.path.join(self.cache_dir, f"aaaaaaaaaaa.{ext}")) for ext in ("vtt", "vtb"))
+        self.assertGreater(entry_size, 108)
+        cache.max_bytes = entry_size * 5 // 2
+        time.sleep(0.01)
+        cache.put("bbbbbbbbbbb", self.write_transcript("b.part"), SOURCE_WHISPER)
+        time.sleep(0.01)
+
+        # Touch the older entry so the other one becomes the least recently used
+        self.assertIsNotNone(cache.get("aaaaaaaaaaa"))
+        cache.put("ccccccccccc", self.write_transcript("c.part"), SOURCE_YOUTUBE)
+
+        self.assertIsNotNone(cache.get("aaaaaaaaaaa"))
+        self.assertIsNone(cache.get("bbbbbbbbbbb"))
+        self.assertIsNotNone(cache.get("ccccccccccc"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "bbbbbbbbbbb.vtt")))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "bbbbbbbbbbb.vtb")))
+
+    def test_ttl_expiry(self):
+        cache = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir, ttl=0)
+        cache.put("aaaaaaaaaaa", self.write_transcript("a.part"), SOURCE_YOUTUBE)
+        time.sleep(0.01)
+
+        self.assertIsNone(cache.get("aaaaaaaaaaa"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "aaaaaaaaaaa.vtt")))
+
+    def test_created_is_read_only(self):
+        cache = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir)
+        entry = cache.put("aaaaaaaaaaa", self.write_transcript("a.part"), SOURCE_YOUTUBE)
+
+        def accessed():
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                return conn.execute("SELECT accessed FROM transcripts").fetchone()[0]
+
+        before = accessed()
+        time.sleep(0.01)
+        self.assertEqual(cache.created("aaaaaaaaaaa"), entry["created"])
+        self.assertEqual(accessed(), before)
+        self.assertIsNone(cache.created("bbbbbbbbbbb"))
+
+    def test_remove(self):
+        cache = transcriptCache(self.cache_dir, self.db_path, semantic_dir=self.semantic_dir)
+        cache.put("aaaaaaaaaaa", self.write_transcript("a.part"), SOURCE_YOUTUBE)
+        # The transcript's semantic index
+        os.makedirs(os.path.join(self.semantic_dir, "aaaaaaaaaaa"))
+        transcript = binaryTranscript(os.path.join(self.cache_dir, "aaaaaaaaaaa.vtb"))
+        cache.remove("aaaaaaaaaaa")
+
+        # Unmapped before the file was removed, as Windows requires
+        self.assertIsNone(transcript.buffer)
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "aaaaaaaaaaa.vtb")))
+
+        self.assertIsNone(cache.get("aaaaaaaaaaa"))
+        self.assertFalse(os.path.exists(os.path.join(self.semantic_dir, "aaaaaaaaaaa")))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,46 @@
+from backend.utils.transcriptIndex import transcriptIndex
+import unittest
+import sys
+
+
+class TranscriptIndexTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.captions = [
+            ("00:00:01.000", "Today we talk about machine"),
+            ("00:00:04.000", "learning and how a Cat sees"),
+            ("00:00:07.000", "the world, unlike cats or dogs."),
+            ("00:00:10.000", "Neural networks don't sleep."),
+        ]
+        self.index = transcriptIndex(self.captions)
+
+    def test_single_keyword(self):
+        self.assertEqual(self.index.search("cat"), [self.captions[1]])
+        self.assertEqual(self.index.search("CAT"), [self.captions[1]])
+        self.assertEqual(self.index.search("elephant"), [])
+
+    def test_phrase_across_captions(self):
+        results = self.index.search("machine learning")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], "00:00:01.000")
+        self.assertIn("learning", results[0][1])
+
+    def test_and_or(self):
+        self.assertEqual(self.index.search("cats AND dogs"), [self.captions[2]])
+        self.assertEqual(self.index.search("cats AND sleep"), [])
+        self.assertEqual(
+            self.index.search("cat OR neural"), [self.captions[1], self.captions[3]]
+        )
+
+    def test_prefix(self):
+        self.assertEqual(
+            self.index.search("cat*"), [self.captions[1], self.captions[2]]
+        )
+        self.assertEqual(self.index.search("neural net*"), [self.captions[3]])
+
+    def test_normalization(self):
+        self.assertEqual(self.index.search("dont"), [self.captions[3]])
+        self.assertEqual(self.index.search("don't"), [self.captions[3]])
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -5,9 +5,62 @@ import sys
 import yt_dlp
 import shutil
 import json
+import pytest
+import tempfile
+import subprocess
+import numpy as np
 
 COOKIES_FILE = "cookies.txt"
 
+# Colors the stub YOLO recognises, by their dominant RGB channel
+COLORS = {"red": (255, 0, 0), "green": (0, 255, 0), "blue": (0, 0, 255)}
+
+
+class stubBox:
+    def __init__(self, cls, conf):
+        self.cls = [cls]
+        self.conf = [conf]
+
+
+class stubResults:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class stubYolo:
+
+    """Class constructor
+    Stands in for the ultralytics model: one box of the dominant color of every frame.
+    Records the size of every batch it is called with.
+
+    Args: None
+
+    Returns: None
+    """
+
+    names = {0: "red", 1: "green", 2: "blue"}
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images, imgsz=640, verbose=False):
+        self.batches.append(len(images))
+        # The frames arrive as BGR
+        return [stubResults([stubBox(2 - int(image.reshape(-1, 3).mean(axis=0).argmax()), 0.9)]) for image in images]
+
+
+class stubVideoUtils(videoUtils):
+    """Runs the stub YOLO on generated frames instead of a downloaded video."""
+
+    def __load_yolo__(self):
+        return stubYolo()
+
+    def __get_frames__(self, video_file, stats=None):
+        if stats is not None:
+            stats.update(strategy="stub", frames_decoded=len(video_file), frames_selected=len(video_file))
+        for timestamp, color in video_file:
+            yield timestamp, np.full((16, 16, 3), COLORS[color], np.uint8)
+
 
 class tempTestSuite(unittest.TestCase):
     def setUp(self):
@@ -55,5 +108,141 @@ class tempTestSuite(unittest.TestCase):
             )
 
 
+class BatchedDetectionTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.videoUtils = stubVideoUtils(batch_size=4, dedup_distance=-1, model_server="", backend="torch")
+
+    def video(self, colors):
+        return [(i * 0.5, color) for i, color in enumerate(colors)]
+
+    def test_detect_batch(self):
+        images = [np.full((8, 8, 3), COLORS[color], np.uint8) for color in ("red", "blue", "green")]
+        detections = self.videoUtils.__detect_batch__(images)
+
+        self.assertEqual(detections, [[("red", 0.9)], [("blue", 0.9)], [("green", 0.9)]])
+        self.assertEqual(self.videoUtils.model.batches, [3])
+
+    def test_find_objects_shape(self):
+        colors = ["red", "red", "green", "blue", "red", "green"]
+        toc = self.videoUtils.find_objects(self.video(colors))
+
+        self.assertEqual(toc, {"red": [0.0, 0.5, 2.0], "green": [1.0, 2.5], "blue": [1.5]})
+
+    def test_batch_boundaries(self):
+        # Not a multiple of the batch size, and a final batch of one frame
+        for frames, batches in ((10, [4, 4, 2]), (9, [4, 4, 1]), (4, [4]), (1, [1])):
+            self.videoUtils.yolo.unload()
+            colors = [list(COLORS)[i % 3] for i in range(frames)]
+            reports = []
+            toc = self.videoUtils.find_objects(self.video(colors), lambda *args: reports.append(args))
+
+            self.assertEqual(self.videoUtils.model.batches, batches)
+            # Every frame is detected exactly once
+            self.assertEqual(sum(len(timestamps) for timestamps in toc.values()), frames)
+            self.assertEqual([done for done, _, _ in reports[:-1]], list(np.cumsum(batches)))
+            self.assertEqual(reports[-1][:2], (frames, frames))
+
+    def test_timestamp_order(self):
+        colors = [list(COLORS)[(i * 7) % 3] for i in range(23)]
+        events = list(self.videoUtils.iter_objects(self.video(colors)))
+
+        timestamps = [event["timestamp"] for event in events if event["type"] == "match"]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(len(timestamps), 23)
+        self.assertEqual(events[-1]["type"], "stats")
+
+        for obj, found in self.videoUtils.find_objects(self.video(colors)).items():
+            self.assertEqual(found, sorted(found), obj)
+            self.assertEqual(len(found), len(set(found)), obj)
+
+
+class KeywordMatchingTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.videoUtils = stubVideoUtils(model_server="", backend="torch")
+
+    def scores(self, detections, keywords):
+        labels = [keyword.lower().strip() for keyword in keywords]
+        return self.videoUtils.__keyword_scores__(detections, keywords, labels)
+
+    def test_one_keyword(self):
+        self.assertEqual(self.scores([("car", 0.7), ("car", 0.8)], ["Car"]), {"Car": 0.8})
+        self.assertEqual(self.scores([("red car", 0.7)], ["car"]), {"car": 0.7})
+        # A longer word that contains the label is another object
+        self.assertEqual(self.scores([("carpet", 0.9)], ["car"]), {})
+        self.assertEqual(self.scores([("cart.", 0.9), ("scar", 0.9)], ["car"]), {})
+        self.assertEqual(self.scores([], ["car"]), {})
+
+    def test_several_keywords(self):
+        detections = [("dog", 0.65), ("traffic light", 0.9), ("cat dog", 0.7)]
+        self.assertEqual(
+            self.scores(detections, ["dog", "traffic light", "cat", "bird"]),
+            {"dog": 0.7, "traffic light": 0.9, "cat": 0.7},
+        )
+        self.assertEqual(
+            self.videoUtils.__match_keywords__(detections, ["dog", "cat", "light"], ["dog", "cat", "light"]),
+            {"dog", "cat", "light"},
+        )
+        # Below the search threshold
+        self.assertEqual(self.videoUtils.__match_keywords__([("dog", 0.5)], ["dog"], ["dog"]), set())
+
+    def test_overlapping_keywords(self):
+        keywords = ["car", "carpet", "race car"]
+        self.assertEqual(self.scores([("carpet", 0.8)], keywords), {"carpet": 0.8})
+        self.assertEqual(self.scores([("car", 0.8)], keywords), {"car": 0.8})
+        # A race car is a car, but a car is no race car
+        self.assertEqual(self.scores([("race car", 0.9)], keywords), {"car": 0.9, "race car": 0.9})
+        self.assertEqual(self.scores([("car carpet", 0.75)], keywords), {"car": 0.75, "carpet": 0.75})
+
+
+class stubGroundingUtils(videoUtils):
+    """Grounding DINO stand-in: a bright red frame holds a clear red box (0.7), a dark red frame a faint one (0.3)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.thresholds = []
+
+    def __ground_batch__(self, images, labels, box_threshold=0.4):
+        self.thresholds.append(box_threshold)
+        detections = []
+        for image in images:
+            red = image[..., 0].mean()
+            score = 0.7 if red > 200 else 0.3 if red > 80 else 0.0
+            detections.append([("red", score)] if score and score >= box_threshold else [])
+        return detections
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+class AdaptiveSearchTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_file = os.path.join(self.temp_dir, "test.mp4")
+        # The coarse frames only see the object faintly, it is clearly visible from 14 s to 15 s
+        scenes = [("blue", 6), ("0x800000", 8), ("red", 1), ("blue", 5)]
+        inputs = [arg for color, duration in scenes
+                  for arg in ("-f", "lavfi", "-i", f"color={color}:size=64x48:rate=10:duration={duration}")]
+        subprocess.check_call([
+            "ffmpeg", "-v", "error", "-y", *inputs,
+            "-filter_complex", "".join(f"[{i}]" for i in range(len(scenes))) + f"concat=n={len(scenes)}:v=1",
+            "-pix_fmt", "yuv420p", self.video_file,
+        ])
+        self.videoUtils = stubGroundingUtils(model_server="", backend="torch")
+        self.videoUtils.coarse_fps = 0.2
+        self.videoUtils.fine_fps = 2
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_borderline_frames_are_refined(self):
+        stats = {}
+        intervals = self.videoUtils.adaptive_search_video(self.video_file, ["red"], stats=stats)
+
+        self.assertEqual(intervals, {"red": [(14.0, 14.5)]})
+        self.assertEqual(stats["windows"], 1)
+        # The coarse pass keeps boxes down to the borderline score, the fine pass doesn't
+        self.assertEqual(self.videoUtils.thresholds[0], self.videoUtils.adaptive_borderline)
+        self.assertLess(self.videoUtils.adaptive_borderline, 0.4)
+        self.assertEqual(self.videoUtils.thresholds[-1], 0.4)
+
+
 if __name__ == "__main__":
     unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,113 @@
+from backend.utils.whisperEngine import whisperEngine, find_cut_points, stitch, SAMPLE_RATE
+from backend.utils.modelUtils import registry, memory_status, set_memory_budget
+import unittest
+import os
+import queue
+import sys
+import time
+import numpy as np
+
+
+class stubPool:
+
+    """Class constructor
+    Stands in for the ProcessPoolExecutor: chunks are "transcribed" in the calling process,
+    which also plays the only worker process.
+
+    Args: None
+
+    Returns: None
+    """
+
+    def __init__(self):
+        self.stopped = False
+
+    def map(self, func, chunks):
+        return [[{"start": 0.0, "end": len(chunk) / SAMPLE_RATE, "text": " chunk"}] for chunk in chunks]
+
+    def shutdown(self, wait=True):
+        self.stopped = True
+
+
+class stubPoolEngine(whisperEngine):
+    def __start_pool__(self):
+        # The calling process reports itself, like init_worker does
+        self.pids = queue.Queue()
+        self.pids.put(os.getpid())
+        self.worker_pids = set()
+        self.started = stubPool()
+        return self.started
+
+
+class WhisperEngineTestSuite(unittest.TestCase):
+    def setUp(self):
+        # 100 s of noise with silent gaps at 28-29 s and 62-63 s
+        rng = np.random.default_rng(0)
+        self.audio = rng.uniform(-0.5, 0.5, 100 * SAMPLE_RATE).astype(np.float32)
+        for start in (28, 62):
+            self.audio[start * SAMPLE_RATE:(start + 1) * SAMPLE_RATE] = 0
+
+    def test_short_audio_is_one_chunk(self):
+        self.assertEqual(find_cut_points(self.audio, 120), [0])
+
+    def test_cuts_at_silence(self):
+        cuts = find_cut_points(self.audio, 30, search_seconds=5)
+
+        self.assertEqual(cuts[0], 0)
+        self.assertTrue(28 * SAMPLE_RATE <= cuts[1] < 29 * SAMPLE_RATE)
+        self.assertTrue(62 * SAMPLE_RATE <= cuts[2] < 63 * SAMPLE_RATE)
+        self.assertEqual(cuts, sorted(cuts))
+
+    def test_no_tiny_last_chunk(self):
+        cuts = find_cut_points(self.audio, 45, search_seconds=1)
+        self.assertEqual(len(cuts), 2)
+
+    def test_stitch(self):
+        chunks = [
+            [{"start": 0.0, "end": 2.0, "text": " one"}],
+            [{"start": 1.0, "end": 3.5, "text": " two"}, {"start": 4.0, "end": 5.0, "text": " three"}],
+        ]
+        segments = stitch(chunks, [0, 30 * SAMPLE_RATE])
+
+        self.assertEqual(
+            [(s["start"], s["end"], s["text"]) for s in segments],
+            [(0.0, 2.0, " one"), (31.0, 33.5, " two"), (34.0, 35.0, " three")],
+        )
+
+    def test_pool_counts_towards_memory_and_stops_when_idle(self):
+        engine = stubPoolEngine(workers=2, idle_seconds=0.1)
+        chunks = [self.audio[:SAMPLE_RATE], self.audio[SAMPLE_RATE:3 * SAMPLE_RATE]]
+
+        self.assertEqual(engine.__map__(chunks)[1], [{"start": 0.0, "end": 2.0, "text": " chunk"}])
+        self.assertIs(registry["whisper_pool"], engine.pool)
+        self.assertTrue(engine.pool.loaded)
+        # The workers' resident memory is the pool's size
+        self.assertGreater(engine.pool.size, 0)
+        self.assertGreaterEqual(memory_status()["resident_mb"], round(engine.pool.size / 2 ** 20, 1))
+
+        deadline = time.time() + 5
+        while engine.pool.loaded and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertFalse(engine.pool.loaded)
+        self.assertTrue(engine.started.stopped)
+
+        # The next transcription starts a new pool
+        engine.__map__(chunks)
+        self.assertTrue(engine.pool.loaded)
+        self.assertEqual(engine.pool.status()["loads"], 2)
+        engine.pool.unload()
+
+    def test_workers_fit_memory_budget(self):
+        engine = whisperEngine(workers=8, worker_memory_mb=500)
+        self.assertEqual(engine.__pool_workers__(), 8)
+
+        # Every worker holds a copy of the model, only as many start as fit in the budget
+        set_memory_budget(1200)
+        self.addCleanup(set_memory_budget, 0)
+        self.assertEqual(engine.__pool_workers__(), 2)
+        set_memory_budget(100)
+        self.assertEqual(engine.__pool_workers__(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(testRunner=unittest.TextTestRunner(stream=sys.stdout))
@@ -0,0 +1,126 @@
+"""Synthetic inputs for the benchmarks, generated offline with ffmpeg and numpy."""
+import os
+import random
+import subprocess
+
+# Sources of the scenes of the benchmark video, cycled through; each cut between them is a scene change
+SCENE_SOURCES = ["testsrc2", "color=c=red", "smptebars", "color=c=blue", "rgbtestsrc", "color=c=green"]
+
+WORDS = (
+    "the a video object search frame model caption transcript table contents scene "
+    "person car dog cat bicycle kitchen laptop phone book chair street light tree "
+    "running jumping talking explaining showing pointing cooking driving walking"
+).split()
+
+
+def make_video(path, scenes=12, scene_seconds=5, size="320x240", rate=25):
+    """
+    Writes a video made of plain and patterned scenes with known cuts.
+
+    Args:
+        path (str): Output file
+        scenes (int): Number of scenes
+        scene_seconds (float): Length of each scene
+        size (str): Frame size
+        rate (int): Frames per second
+
+    Returns:
+        [float]: Timestamps of the scene cuts, including 0
+    """
+    args = ["ffmpeg", "-v", "error", "-y"]
+    for i in range(scenes):
+        source = SCENE_SOURCES[i % len(SCENE_SOURCES)]
+        separator = ":" if "=" in source else "="
+        args += ["-f", "lavfi", "-i", f"{source}{separator}size={size}:rate={rate}:duration={scene_seconds}"]
+
+    inputs = "".join(f"[{i}]" for i in range(scenes))
+    args += [
+        "-filter_complex", f"{inputs}concat=n={scenes}:v=1",
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart", path,
+    ]
+    subprocess.check_call(args)
+    return [i * scene_seconds for i in range(scenes)]
+
+
+def make_vtt(path, captions=20000, seed=0):
+    """
+    Writes a WebVTT transcript of random sentences, two seconds per caption.
+
+    Args:
+        path (str): Output file
+        captions (int): Number of captions
+        seed (int): Seed of the sentences
+
+    Returns:
+        int: Number of captions written
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("WEBVTT\n\n")
+        for i in range(captions):
+            start, end = i * 2, i * 2 + 2
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+            file.write(f"{timestamp(start)} --> {timestamp(end)}\n{text}\n\n")
+    return captions
+
+
+def timestamp(seconds):
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}.000"
+
+
+def make_audio(path, seconds=60):
+    """
+    Writes 16 kHz mono audio: a tone that pauses for two seconds every ten,
+    so that the audio can be split at silences.
+
+    Args:
+        path (str): Output file (.wav)
+        seconds (int): Length of the audio
+
+    Returns:
+        float: Length of the audio in seconds
+    """
+    subprocess.check_call([
+        "ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+        "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*lt(mod(t\\,10)\\,8)':s=16000:d={seconds}",
+        "-ac", "1", path,
+    ])
+    return float(seconds)
+
+
+def make_fixtures(fixture_dir, video_scenes=12, captions=20000, audio_seconds=60):
+    """
+    Generates every fixture, reusing files from an earlier run with the same sizes.
+
+    Args:
+        fixture_dir (str): Directory the fixtures are written to
+        video_scenes (int): Number of five-second scenes of the video
+        captions (int): Number of captions of the transcript
+        audio_seconds (int): Length of the audio
+
+    Returns:
+        dict: Paths and sizes of the fixtures
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    video = os.path.join(fixture_dir, f"video_{video_scenes}.mp4")
+    transcript = os.path.join(fixture_dir, f"transcript_{captions}.vtt")
+    audio = os.path.join(fixture_dir, f"audio_{audio_seconds}.wav")
+
+    if not os.path.exists(video):
+        make_video(video + ".part.mp4", video_scenes)
+        os.replace(video + ".part.mp4", video)
+    if not os.path.exists(transcript):
+        make_vtt(transcript + ".part", captions)
+        os.replace(transcript + ".part", transcript)
+    if not os.path.exists(audio):
+        make_audio(audio + ".part.wav", audio_seconds)
+        os.replace(audio + ".part.wav", audio)
+
+    return {
+        "video": video,
+        "scene_cuts": [i * 5 for i in range(video_scenes)],
+        "transcript": transcript,
+        "captions": captions,
+        "audio": audio,
+        "audio_seconds": float(audio_seconds),
+    }
@@ -0,0 +1,100 @@
+"""Model setups of the benchmarks.
+
+"stub" replaces the model calls with cheap color checks, so only the pipeline around the models is
+measured. "real" runs the smallest variant of every model on the backend set with INFERENCE_BACKEND.
+The video classes are created inside functions because videoUtils needs torch, which a stub run of
+the transcript stages does not.
+"""
+import shutil
+import time
+import wave
+
+# Colors the stub detectors recognise, by their dominant RGB channel
+STUB_COLORS = ["red", "green", "blue"]
+
+
+def stub_color(image):
+    """The dominant color of a plain frame, None for patterned frames."""
+    means = image.reshape(-1, 3).mean(axis=0)
+    if means.max() < 100 or means.max() - sorted(means)[1] < 80:
+        return None
+    return STUB_COLORS[int(means.argmax())]
+
+
+def video_utils(models, delay=0.0, **kwargs):
+    """
+    Creates the videoUtils of a model setup.
+
+    Args:
+        models (str): "stub" or "real"
+        delay (float): Seconds a stub model spends per frame, to mimic inference cost
+        **kwargs: Passed to videoUtils
+
+    Returns:
+        videoUtils: The instance
+    """
+    from backend.utils.videoUtils import videoUtils
+    from backend.utils.inferenceUtils import load_yolo, load_dino
+
+    class stubVideoUtils(videoUtils):
+        def __detect_batch__(self, images):
+            time.sleep(delay * len(images))
+            return [[(stub_color(image), 0.9)] if stub_color(image) else [] for image in images]
+
+        def __ground_batch__(self, images, labels, box_threshold=None):
+            time.sleep(delay * len(images))
+            return [[(stub_color(image), 0.9)] if stub_color(image) in labels else [] for image in images]
+
+    class tinyVideoUtils(videoUtils):
+        def __load_yolo__(self):
+            return load_yolo("yolov8n.pt", self.backend, self.imgsz)
+
+        def __load_dino__(self):
+            return load_dino("IDEA-Research/grounding-dino-tiny", self.backend, self.device)
+
+    return (stubVideoUtils if models == "stub" else tinyVideoUtils)(**kwargs)
+
+
+class stubEngine:
+
+    """Class constructor
+    Stands in for whisperEngine: one segment for every five seconds of audio.
+
+    Args: None
+
+    Returns: None
+    """
+
+    def transcribe(self, audio_file, model):
+        with wave.open(audio_file) as audio:
+            seconds = audio.getnframes() / audio.getframerate()
+        return [
+            {"start": float(start), "end": float(min(start + 5, seconds)), "text": " benchmark"}
+            for start in range(0, int(seconds), 5)
+        ]
+
+
+def transcript_utils(models, audio):
+    """
+    Creates the transcriptUtils of a model setup, with the audio download replaced by a copy of a fixture.
+
+    Args:
+        models (str): "stub" or "real"
+        audio (str): Path of the audio fixture
+
+    Returns:
+        (transcriptUtils, Any): The instance and the Whisper model passed to create_transcript
+    """
+    from backend.utils.transcriptUtils import transcriptUtils
+    from backend.utils.whisperEngine import whisperEngine
+
+    class offlineTranscriptUtils(transcriptUtils):
+        def __get_audio__(self, yt_url, audio_file):
+            shutil.copyfile(audio, audio_file)
+
+    if models == "stub":
+        return offlineTranscriptUtils(engine=stubEngine()), None
+
+    import whisper
+
+    return offlineTranscriptUtils(engine=whisperEngine(model_name="tiny")), whisper.load_model("tiny", device="cpu")
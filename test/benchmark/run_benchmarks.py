@@ -0,0 +1,266 @@
+"""Offline benchmarks of the backend pipeline stages.
+
+Every stage runs in its own process on synthetic fixtures, so its peak RSS is not inflated by
+the stages before it. Results are compared with a saved baseline to catch regressions.
+
+Usage, from the repository root:
+    python test/benchmark/run_benchmarks.py                      # stub models
+    python test/benchmark/run_benchmarks.py --models stub,real   # also the smallest real models
+    python test/benchmark/run_benchmarks.py --save-baseline      # record the current results
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import make_fixtures  # noqa: E402
+import models as model_setups  # noqa: E402
+
+BENCH_DIR = os.path.join(ROOT, "temp", "benchmark")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+# A stage regresses if its throughput drops, or its peak RSS grows, by more than this share
+TOLERANCE = 0.2
+
+STRATEGIES = ("scene", "keyframes", "fps", "scene_low")
+QUERIES = ["object", "search frame", "\"table contents\"", "run*", "dog OR cat", "kitchen AND laptop"]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its finished children, in MB."""
+    scale = 1 if platform.system() == "Darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own / 2 ** 20, 1), round(children / 2 ** 20, 1)
+
+
+def bench_get_frames(fixtures, models):
+    results = []
+    for strategy in STRATEGIES:
+        video_utils = model_setups.video_utils("stub", frame_strategy=strategy)
+        stats = {}
+        start = time.perf_counter()
+        for _ in video_utils.__get_frames__(fixtures["video"], stats):
+            pass
+        seconds = time.perf_counter() - start
+        results.append({
+            "name": f"get_frames[{strategy}]",
+            "seconds": seconds,
+            "units": stats["frames_decoded"],
+            "unit": "frames",
+            "frames_selected": stats["frames_selected"],
+        })
+    return results
+
+
+def bench_find_objects(fixtures, models):
+    video_utils = model_setups.video_utils(models)
+    # Load the model before timing
+    if models == "real":
+        video_utils.model
+    events = []
+    start = time.perf_counter()
+    for event in video_utils.iter_objects(fixtures["video"]):
+        events.append(event)
+    seconds = time.perf_counter() - start
+
+    stats = events[-1]
+    return [{
+        "name": f"find_objects[{models}]",
+        "seconds": seconds,
+        "units": stats["frames_selected"],
+        "unit": "frames",
+        "frames_deduplicated": stats["frames_deduplicated"],
+        "matches": sum(event["type"] == "match" for event in events),
+    }]
+
+
+def bench_search_video(fixtures, models):
+    video_utils = model_setups.video_utils(models)
+    keywords = ["red", "blue"]
+    if models == "real":
+        video_utils.DINOmodel
+    events = []
+    start = time.perf_counter()
+    for event in video_utils.iter_search_video(fixtures["video"], keywords):
+        events.append(event)
+    seconds = time.perf_counter() - start
+
+    stats = events[-1]
+    return [{
+        "name": f"search_video[{models}]",
+        "seconds": seconds,
+        "units": stats["frames_selected"],
+        "unit": "frames",
+        "matches": sum(event["type"] == "match" for event in events),
+    }]
+
+
+def bench_search_transcript(fixtures, models):
+    from backend.utils.transcriptUtils import transcriptUtils
+
+    os.makedirs("temp/subtitles", exist_ok=True)
+    shutil.copyfile(fixtures["transcript"], "temp/subtitles/benchmark.vtt")
+    transcript_utils = transcriptUtils(engine=model_setups.stubEngine())
+
+    # The first search converts the transcript to its binary form, later ones search it in place
+    start = time.perf_counter()
+    transcript_utils.search_transcript("benchmark.vtt", QUERIES[0])
+    cold = time.perf_counter() - start
+
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            transcript_utils.search_transcript("benchmark.vtt", query)
+    warm = time.perf_counter() - start
+
+    return [
+        {"name": "search_transcript[index]", "seconds": cold, "units": fixtures["captions"], "unit": "captions"},
+        {"name": "search_transcript[query]", "seconds": warm, "units": rounds * len(QUERIES), "unit": "queries"},
+    ]
+
+
+def bench_create_transcript(fixtures, models):
+    transcript_utils, whisper_model = model_setups.transcript_utils(models, fixtures["audio"])
+
+    start = time.perf_counter()
+    path = transcript_utils.create_transcript("offline", f"benchmark.{models}", whisper_model)
+    seconds = time.perf_counter() - start
+    os.remove(path)
+
+    return [{
+        "name": f"create_transcript[{models}]",
+        "seconds": seconds,
+        "units": fixtures["audio_seconds"],
+        "unit": "audio-seconds",
+    }]
+
+
+# Stages and whether they depend on the model setup
+STAGES = {
+    "get_frames": (bench_get_frames, False),
+    "find_objects": (bench_find_objects, True),
+    "search_video": (bench_search_video, True),
+    "search_transcript": (bench_search_transcript, False),
+    "create_transcript": (bench_create_transcript, True),
+}
+
+
+def run_stage(stage, models, fixtures, work_dir, results):
+    """Runs one stage in a child process and sends back its measurements."""
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    try:
+        measurements = STAGES[stage][0](fixtures, models)
+    except ImportError as e:
+        results.put({"stage": stage, "models": models, "skipped": f"missing dependency: {e.name}"})
+        return
+
+    rss, children_rss = peak_rss_mb()
+    for measurement in measurements:
+        measurement["throughput"] = round(measurement["units"] / measurement["seconds"], 2)
+        measurement["seconds"] = round(measurement["seconds"], 4)
+        measurement["peak_rss_mb"] = rss
+        measurement["children_peak_rss_mb"] = children_rss
+    results.put({"stage": stage, "models": models, "measurements": measurements})
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compares results with a baseline.
+
+    Args:
+        current (dict): Measurements by name
+        baseline (dict): Measurements by name of an earlier run
+        tolerance (float): Allowed relative loss of throughput or growth of peak RSS
+
+    Returns:
+        [str]: A description of every regression
+    """
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']} -> {result['throughput']} {result['unit']}/s")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--models", default="stub", help="comma-separated model setups: stub, real")
+    parser.add_argument("--scenes", type=int, default=12, help="number of five-second scenes of the video")
+    parser.add_argument("--captions", type=int, default=20000, help="number of captions of the transcript")
+    parser.add_argument("--audio-seconds", type=int, default=60, help="length of the audio")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative regression")
+    args = parser.parse_args()
+
+    fixtures = make_fixtures(os.path.join(BENCH_DIR, "fixtures"), args.scenes, args.captions, args.audio_seconds)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    current = {}
+    for stage in args.stages.split(","):
+        for models in args.models.split(",") if STAGES[stage][1] else ["stub"]:
+            process = context.Process(
+                target=run_stage, args=(stage, models, fixtures, os.path.join(BENCH_DIR, "work"), results)
+            )
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{stage} [{models}]: failed with exit code {process.exitcode}")
+                continue
+
+            result = results.get()
+            if "skipped" in result:
+                print(f"{stage} [{models}]: skipped, {result['skipped']}")
+                continue
+            for measurement in result["measurements"]:
+                current[measurement["name"]] = measurement
+                print(
+                    f"{measurement['name']:<28} {measurement['throughput']:>12} {measurement['unit']}/s"
+                    f"  {measurement['seconds']:>9} s  peak RSS {measurement['peak_rss_mb']} MB"
+                )
+
+    with open(os.path.join(BENCH_DIR, "latest.json"), "w") as file:
+        json.dump(current, file, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare(current, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print(f"No regressions against {args.baseline}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(current)
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())